@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Admission Control
+Expensive routes (the analysis routes can each hold a thread for a minute
+on a cold cache, exports stream the whole deal store, cost simulations and
+placements run CPU-bound over the deal store) get a concurrency
+limit per route template with a bounded FIFO queue in front of it:
+
+- up to `limit` requests of a route run at once, up to `queue` more wait
+- a request arriving to a full queue, or still queued after
+  ADMISSION_QUEUE_TIMEOUT_SECONDS, gets an immediate 503 with Retry-After
+  (estimated from the route's recent service time and its queue)
+- every other route (deals pages, health, metrics, live feed) is never
+  queued, so a burst of analyses cannot starve them
+
+Limits are per process; with uvicorn --workers each worker has its own.
+"""
+
+import asyncio
+import json
+import math
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config import ADMISSION_LIMITS, ADMISSION_QUEUE_TIMEOUT_SECONDS
+from metrics import ADMISSION_ACTIVE, ADMISSION_QUEUED, ADMISSION_SHED, ADMISSION_WAIT_SECONDS
+
+# Route template -> class in ADMISSION_LIMITS
+LIMITED_ROUTES = {
+    "/api/mainnet/analysis": "analysis",
+    "/api/testnet/analysis": "analysis",
+    "/api/unified/{network}/analysis": "analysis",
+    "/api/mainnet/market": "analysis",
+    "/api/advisor/market-analysis": "analysis",
+    "/api/{network}/deals/export": "export",
+    "/api/{network}/simulate/storage-cost": "simulation",
+    "/api/{network}/placement": "simulation",
+}
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class RouteLimiter:
+    """Concurrency limit with a bounded FIFO queue, for one route template (single event loop)"""
+
+    def __init__(self, route: str, limit: int, queue: int, timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.route = route
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        # Moving average of admitted requests' duration, for Retry-After
+        self.service_seconds = 1.0
+        self._active_gauge = ADMISSION_ACTIVE.labels(route)
+        self._queued_gauge = ADMISSION_QUEUED.labels(route)
+        self._wait = ADMISSION_WAIT_SECONDS.labels(route)
+
+    async def acquire(self) -> Optional[str]:
+        """None once admitted (call release() when done), else the reason to shed"""
+        if self.active < self.limit and not self.waiters:
+            self._admit()
+            return None
+        if len(self.waiters) >= self.queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self._queued_gauge.inc()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait([waiter], timeout=self.timeout)
+        except asyncio.CancelledError:
+            if not self._leave(waiter):
+                self.release()
+            raise
+        if self._leave(waiter):
+            return "queue_timeout"
+        self._wait.observe(time.perf_counter() - start)
+        return None
+
+    def _admit(self):
+        self.active += 1
+        self._active_gauge.inc()
+
+    def _leave(self, waiter: asyncio.Future) -> bool:
+        """Stop waiting; True if the slot was not handed over yet"""
+        if waiter.done():
+            return False
+        waiter.cancel()
+        self.waiters.remove(waiter)
+        self._queued_gauge.dec()
+        return True
+
+    def release(self, seconds: Optional[float] = None):
+        if seconds is not None:
+            self.service_seconds += 0.2 * (seconds - self.service_seconds)
+        self.active -= 1
+        self._active_gauge.dec()
+        # Hand the slot to the oldest waiter
+        if self.waiters:
+            waiter = self.waiters.popleft()
+            self._queued_gauge.dec()
+            self._admit()
+            waiter.set_result(None)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained"""
+        backlog = (len(self.waiters) + self.active) / max(self.limit, 1)
+        return min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(backlog * self.service_seconds)))
+
+
+def _pattern(template: str) -> re.Pattern:
+    return re.compile("^" + re.sub(r"\\{[^/]+?\\}", "[^/]+", re.escape(template)) + "$")
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying RouteLimiter to LIMITED_ROUTES"""
+
+    def __init__(self, app, routes: Dict[str, str] = LIMITED_ROUTES,
+                 limits: Dict[str, Tuple[int, int]] = ADMISSION_LIMITS):
+        self.app = app
+        self.routes: List[Tuple[re.Pattern, RouteLimiter]] = [
+            (_pattern(template), RouteLimiter(template, *limits[route_class]))
+            for template, route_class in routes.items()
+        ]
+
+    def limiter_for(self, path: str) -> Optional[RouteLimiter]:
+        for pattern, limiter in self.routes:
+            if pattern.match(path):
+                return limiter
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiter_for(scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await limiter.acquire()
+        if reason is not None:
+            ADMISSION_SHED.labels(limiter.route, reason).inc()
+            await self._shed(send, limiter, reason)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start)
+
+    @staticmethod
+    async def _shed(send, limiter: RouteLimiter, reason: str):
+        body = json.dumps({"detail": f"{limiter.route} is at capacity ({reason}), retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(limiter.retry_after()).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Hot-Path Micro-Benchmarks
+Time and allocation profile of the analytics functions that bound
+throughput at scale, on synthetic data from 1e3 up to 1e7 deals and
+multi-year daily-metrics frames:
+
+    deal analytics     _analyze_filfox_deals, _analyze_deals, _analyze_testnet_deals,
+                       DealBatch.analytics
+    deal conversion    DealBatch(deals), DealBatch.to_records (the routes' response loop)
+    selection          selector.select_best_deals
+    price candles      PriceSeries.record (ingest), hourly/daily chart queries
+    cost simulation    simulate_storage_cost, 100k trials x 3 replicas (price sample cached per snapshot)
+    replica placement  optimize_placement, 5 providers with a client-overlap cap (cached per snapshot)
+    daily metrics      _analyze_for_users (aggregator and advisor), forecast_prices
+
+Time is the median per call over repeated runs; allocations are the
+tracemalloc peak of one extra call. Functions that take per-deal dicts are
+capped at --max-dict-deals (a 1e7-dict page needs several GB just to build).
+
+With --baseline, exits non-zero when any case is slower (or allocates
+more) than the baseline by more than --threshold.
+
+Usage:
+    python benchmarks/bench_hotpaths.py --deals 1000 100000 10000000
+    python benchmarks/bench_hotpaths.py --baseline benchmarks/results/hotpaths-<commit>.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+from synthetic import (SERVICE_DIR, make_daily_metrics, make_deal_batch, make_filfox_deals,
+                       make_market_deals)
+
+from data_aggregator import FilecoinDealDataAggregator
+from deal_batch import DealBatch
+from forecast import forecast_prices
+from price_series import PriceSeries, candle_records
+from placement import optimize_placement
+from selector import select_best_deals
+from simulator import simulate_storage_cost
+from testnet_aggregator import TestnetDealDataAggregator
+from unified_aggregator import UnifiedFilecoinAggregator
+from user_storage_advisor import FilecoinStorageAdvisor
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+mainnet = FilecoinDealDataAggregator()
+unified = UnifiedFilecoinAggregator("mainnet")
+testnet = TestnetDealDataAggregator()
+advisor = FilecoinStorageAdvisor()
+
+# name -> (input kind, function under test)
+CASES: Dict[str, tuple] = {
+    "data_aggregator._analyze_filfox_deals": ("dicts", mainnet._analyze_filfox_deals),
+    "unified_aggregator._analyze_deals": ("dicts", unified._analyze_deals),
+    "testnet_aggregator._analyze_testnet_deals": ("dicts", testnet._analyze_testnet_deals),
+    "DealBatch(deals)": ("dicts", lambda deals: DealBatch(deals, network="mainnet")),
+    "DealBatch.analytics": ("batch", lambda batch: batch.analytics()),
+    "DealBatch.to_records": ("batch", lambda batch: batch.to_records()),
+    "PriceSeries.record": ("batch", lambda batch: PriceSeries("mainnet").record(batch)),
+    "PriceSeries.candles(hour)": ("series", lambda series: candle_records(series.candles("hour"))),
+    "PriceSeries.candles(day)": ("series", lambda series: candle_records(series.candles("day"))),
+    "simulator.simulate_storage_cost": ("batch", lambda batch: simulate_storage_cost(batch, 10, 365, 3, 100_000,
+                                                                                     lookback_days=0, seed=0)),
+    "placement.optimize_placement": ("batch", lambda batch: optimize_placement(batch, 5, 10, 365, lookback_days=0,
+                                                                              max_client_overlap=0.2)),
+    "selector.select_best_deals": ("market", lambda deals: select_best_deals(deals, {"verified": True, "limit": 20})),
+    "data_aggregator._analyze_for_users": ("days", mainnet._analyze_for_users),
+    "user_storage_advisor._analyze_for_users": ("days", advisor._analyze_for_users),
+    "forecast.forecast_prices": ("days", lambda frame: forecast_prices(frame["date"].to_numpy(),
+                                                                       frame["deal_storage_cost_fil"].to_numpy())),
+}
+
+# to_records materialises one dict per deal, so it shares the dict cap
+RECORD_BOUND = {"DealBatch.to_records"}
+
+
+def measure(fn: Callable, arg: Any, min_seconds: float, min_runs: int = 3) -> Dict[str, float]:
+    samples: List[float] = []
+    started = time.perf_counter()
+    while len(samples) < min_runs or time.perf_counter() - started < min_seconds:
+        gc.collect()
+        t = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - t)
+
+    gc.collect()
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"runs": len(samples), "median_ms": statistics.median(samples) * 1000,
+            "min_ms": min(samples) * 1000, "peak_alloc_mb": peak / 2**20}
+
+
+def run(args) -> List[Dict[str, Any]]:
+    selected = {name: case for name, case in CASES.items() if not args.only or any(o in name for o in args.only)}
+    results = []
+
+    def record(name: str, size: int, arg: Any):
+        stats = measure(selected[name][1], arg, args.min_seconds)
+        stats.update(case=name, size=size)
+        results.append(stats)
+        if not args.json:
+            print(f"{name:<44} {size:>10,} {stats['median_ms']:>12.3f} {stats['peak_alloc_mb']:>12.2f}", flush=True)
+
+    if not args.json:
+        print(f"{'case':<44} {'size':>10} {'median ms':>12} {'peak MB':>12}")
+    for size in args.deals:
+        kinds = {kind for kind, _ in selected.values()}
+        inputs: Dict[str, Any] = {}
+        if kinds & {"batch", "series"}:
+            inputs["batch"] = make_deal_batch(size)
+        if "series" in kinds:
+            inputs["series"] = PriceSeries("mainnet")
+            inputs["series"].record(inputs["batch"])
+        if size <= args.max_dict_deals:
+            if "dicts" in kinds:
+                inputs["dicts"] = make_filfox_deals(size)
+            if "market" in kinds:
+                inputs["market"] = make_market_deals(size)
+        for name, (kind, _) in selected.items():
+            if kind == "days" or kind not in inputs:
+                continue
+            if name in RECORD_BOUND and size > args.max_dict_deals:
+                continue
+            record(name, size, inputs[kind])
+        inputs.clear()
+        gc.collect()
+
+    for days in args.days:
+        frame = make_daily_metrics(days)
+        for name, (kind, _) in selected.items():
+            if kind == "days":
+                record(name, days, frame)
+    return results
+
+
+def regressions(results: List[Dict], baseline: Dict, threshold: float) -> List[str]:
+    previous = {(r["case"], r["size"]): r for r in baseline["results"]}
+    problems = []
+    for r in results:
+        before = previous.get((r["case"], r["size"]))
+        if before is None:
+            continue
+        for key in ("median_ms", "peak_alloc_mb"):
+            # Ignore noise on very small figures
+            floor = 0.05 if key == "median_ms" else 0.1
+            if r[key] > max(before[key], floor) * (1 + threshold):
+                problems.append(f"{r['case']} @ {r['size']:,}: {key} {before[key]:.3f} -> {r[key]:.3f} "
+                                f"(+{(r[key] / before[key] - 1) * 100:.0f}%)")
+    return problems
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analytics hot-path micro-benchmarks')
+    parser.add_argument('--deals', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--days', type=int, nargs='+', default=[365, 3 * 365, 5 * 365],
+                        help='Daily-metrics frame lengths')
+    parser.add_argument('--max-dict-deals', type=int, default=1_000_000,
+                        help='Largest size for cases that take per-deal dicts')
+    parser.add_argument('--only', nargs='*', help='Run only cases whose name contains one of these')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='Minimum timing per case')
+    parser.add_argument('--baseline', default=None, help='Previous results JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown / growth (0.25 = 25%%)')
+    parser.add_argument('--out', default=None, help='Results file (default: benchmarks/results/hotpaths-<commit>.json)')
+    parser.add_argument('--json', action='store_true', help='Output in JSON format')
+    args = parser.parse_args()
+
+    report = {
+        "meta": {"commit": _commit(), "recorded_at": datetime.now(timezone.utc).isoformat(),
+                 "python": sys.version.split()[0]},
+        "results": run(args),
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"hotpaths-{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    problems = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = regressions(report["results"], json.load(f), args.threshold)
+    if args.json:
+        print(json.dumps({**report, "regressions": problems}, indent=2))
+    else:
+        print(f"\nSaved results to {out}")
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
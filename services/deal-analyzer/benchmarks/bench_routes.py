@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Route Benchmark
+Drives the analyzer's HTTP routes under concurrent load against the
+upstream stand-in (recorded fixtures or synthetic data), so results are
+reproducible offline. Both the stand-in and the analyzer run as separate
+processes; background services that poll upstream are disabled.
+
+Reports per route: throughput, p50/p95/p99 latency, error count and the
+analyzer's peak RSS (including CPU worker processes), plus the call sites
+the event-loop watchdog caught blocking the loop. Results are saved as a
+JSON baseline that later runs can be compared against; in CI,
+--fail-on-new-blocking exits non-zero when a site not in the baseline
+blocks the loop.
+
+Usage:
+    python benchmarks/bench_routes.py --concurrency 1 16 64 --duration 10
+    python benchmarks/bench_routes.py --compare benchmarks/results/<commit>.json
+    python benchmarks/bench_routes.py --compare benchmarks/results/<commit>.json --fail-on-new-blocking
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import aiohttp
+import numpy as np
+
+from synthetic import SERVICE_DIR
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+ADMIN_TOKEN = "bench"
+
+ROUTES = [
+    "/api/mainnet/deals",
+    "/api/mainnet/market",
+    "/api/mainnet/analysis",
+    "/api/testnet/analysis",
+    "/api/unified/mainnet/analysis",
+    "/api/unified/testnet/analysis",
+    "/api/advisor/market-analysis",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError as e:
+            # Any HTTP answer (even 404) means the server is up
+            if isinstance(e, urllib.error.HTTPError):
+                return
+            time.sleep(0.05)
+    raise TimeoutError(f"{url} did not come up")
+
+
+def _rss_bytes(pid: int) -> int:
+    """RSS of pid plus its descendants, from /proc (Linux)"""
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+class RssSampler:
+    """Tracks peak RSS of a process tree in a background thread"""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self.peak = _rss_bytes(self.pid)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes(self.pid))
+
+
+class Services:
+    """Stand-in + analyzer subprocesses for the duration of a run"""
+
+    def __init__(self, standin_args: List[str], workers: int):
+        self.standin_args = standin_args
+        self.workers = workers
+        self.processes: List[subprocess.Popen] = []
+
+    def __enter__(self):
+        standin_port, analyzer_port = _free_port(), _free_port()
+        standin_url = f"http://127.0.0.1:{standin_port}"
+        self.processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, "standin_server.py"), "--port", str(standin_port),
+             *self.standin_args], stdout=subprocess.DEVNULL))
+        _wait_ready(f"{standin_url}/")
+
+        env = {**os.environ, "UPSTREAM_STANDIN_URL": standin_url, "LIVE_FEED_ENABLED": "false",
+               "CHECKPOINT_DIR": "", "SHARED_SNAPSHOT_DIR": "", "REDIS_URL": "",
+               "CPU_WORKER_PROCESSES": str(self.workers), "ADMIN_TOKEN": ADMIN_TOKEN,
+               "LOOP_WATCHDOG_ENABLED": "true"}
+        self.analyzer = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(analyzer_port), "--log-level", "warning"],
+            cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.processes.append(self.analyzer)
+        self.base_url = f"http://127.0.0.1:{analyzer_port}"
+        _wait_ready(f"{self.base_url}/api/health")
+        return self
+
+    def blocking_sites(self) -> Dict[str, int]:
+        """Event-loop stalls per call site seen by the analyzer's watchdog so far"""
+        request = urllib.request.Request(f"{self.base_url}/api/admin/blocking",
+                                         headers={"Authorization": f"Bearer {ADMIN_TOKEN}"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.load(response)["sites"]
+
+    def __exit__(self, *exc):
+        for process in reversed(self.processes):
+            process.terminate()
+            process.wait()
+
+
+async def _drive(url: str, concurrency: int, duration: float, max_requests: Optional[int]) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    issued = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(session: aiohttp.ClientSession):
+        nonlocal errors, issued
+        while time.perf_counter() < deadline and (max_requests is None or issued < max_requests):
+            issued += 1
+            start = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def run(args) -> Dict:
+    standin_args = ["--latency-ms", str(args.upstream_latency_ms), "--error-rate", str(args.upstream_error_rate),
+                    "--seed", "0"]
+    results = []
+    with Services(standin_args, args.cpu_workers) as services:
+        for route in args.routes:
+            url = services.base_url + route
+            # Warm-up: first hits populate caches and the worker pool
+            asyncio.run(_drive(url, 1, 60, args.warmup))
+            for concurrency in args.concurrency:
+                with RssSampler(services.analyzer.pid) as rss:
+                    stats = asyncio.run(_drive(url, concurrency, args.duration, args.max_requests))
+                stats.update(route=route, concurrency=concurrency, peak_rss_mb=rss.peak / 2**20)
+                results.append(stats)
+                if not args.json:
+                    print(f"{route:<34} c={concurrency:<4} {stats['throughput_rps']:>9.1f} rps  "
+                          f"p50 {stats['p50_ms']:>8.1f}  p95 {stats['p95_ms']:>8.1f}  p99 {stats['p99_ms']:>8.1f} ms  "
+                          f"err {stats['errors']:<4} rss {stats['peak_rss_mb']:>7.1f} MB", flush=True)
+        blocking = services.blocking_sites()
+    if not args.json:
+        print("\nEvent-loop stalls by call site:")
+        for site, count in blocking.items():
+            print(f"  {site:<60} {count}")
+    return {"meta": _meta(args), "results": results, "blocking": blocking}
+
+
+def _meta(args) -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "duration_s": args.duration,
+        "upstream_latency_ms": args.upstream_latency_ms,
+        "upstream_error_rate": args.upstream_error_rate,
+        "cpu_workers": args.cpu_workers,
+    }
+
+
+def new_blocking_sites(current: Dict, baseline: Dict) -> List[str]:
+    """Call sites that blocked the event loop in this run but not in the baseline"""
+    # "unknown": stalls that ended before the watchdog captured a stack
+    return sorted(set(current.get("blocking", {})) - set(baseline.get("blocking", {})) - {"unknown"})
+
+
+def compare(current: Dict, baseline: Dict):
+    """Print throughput / p95 / RSS changes per (route, concurrency) versus a baseline run"""
+    previous = {(r["route"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline['meta']['commit']} ({baseline['meta']['recorded_at']}):")
+    print(f"{'route':<34} {'c':>4} {'rps Δ%':>8} {'p95 Δ%':>8} {'rss Δ%':>8}")
+    for r in current["results"]:
+        before = previous.get((r["route"], r["concurrency"]))
+        if before is None:
+            continue
+        delta = lambda key: (r[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+        print(f"{r['route']:<34} {r['concurrency']:>4} {delta('throughput_rps'):>+8.1f} "
+              f"{delta('p95_ms'):>+8.1f} {delta('peak_rss_mb'):>+8.1f}")
+    for site in new_blocking_sites(current, baseline):
+        print(f"NEW event-loop blocking site: {site}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyzer route benchmark against recorded upstreams')
+    parser.add_argument('--routes', nargs='+', default=ROUTES)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per (route, concurrency)')
+    parser.add_argument('--max-requests', type=int, default=None, help='Stop a case after this many requests')
+    parser.add_argument('--warmup', type=int, default=3, help='Sequential warm-up requests per route')
+    parser.add_argument('--upstream-latency-ms', type=float, default=0)
+    parser.add_argument('--upstream-error-rate', type=float, default=0)
+    parser.add_argument('--cpu-workers', type=int, default=2, help='CPU_WORKER_PROCESSES for the analyzer')
+    parser.add_argument('--out', default=None, help='Baseline file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', default=None, help='Baseline JSON to diff against')
+    parser.add_argument('--fail-on-new-blocking', action='store_true',
+                        help='Exit 1 when a call site not in the --compare baseline (or any, without one) '
+                             'blocks the event loop')
+    parser.add_argument('--json', action='store_true', help='Output in JSON format')
+    args = parser.parse_args()
+
+    report = run(args)
+    out = args.out or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"\nSaved baseline to {out}")
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        compare(report, baseline)
+    if args.fail_on_new_blocking and new_blocking_sites(report, baseline):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
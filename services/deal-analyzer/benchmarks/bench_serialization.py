@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Serialisation Benchmark
+Compares the default FastAPI response path (pydantic models + jsonable_encoder
++ JSONResponse) with the opt-in fast path (DealBatch records + FastJSONResponse)
+
+Usage:
+    python benchmarks/bench_serialization.py --sizes 100 1000 10000
+"""
+
+import argparse
+import json
+import time
+
+from synthetic import make_filfox_deals
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from deal_batch import DealBatch
+from fast_json import FastJSONResponse
+from main import AnalysisResponse, DealInfo
+
+MARKET_INSIGHTS = {
+    "daily_new_deals": 96963,
+    "verified_deals_percentage": 99.1,
+    "average_piece_size_gb": 31.2,
+    "average_storage_price": 0.0,
+    "market_activity_level": "High"
+}
+
+
+def current_path(raw_deals) -> bytes:
+    """What /api/*/analysis does without ?fast=true"""
+    batch = DealBatch(raw_deals, network="mainnet")
+    deals = [DealInfo(**record) for record in batch.to_records(with_times=False)]
+    model = AnalysisResponse(
+        timestamp="2025-01-01T00:00:00",
+        network="mainnet",
+        market_insights=MARKET_INSIGHTS,
+        network_health=None,
+        recommendations=[],
+        deals=deals
+    )
+    return JSONResponse(jsonable_encoder(model)).body
+
+
+def fast_path(raw_deals) -> bytes:
+    """What /api/*/analysis does with ?fast=true"""
+    batch = DealBatch(raw_deals, network="mainnet")
+    response = {
+        "timestamp": "2025-01-01T00:00:00",
+        "network": "mainnet",
+        "market_insights": MARKET_INSIGHTS,
+        "network_health": None,
+        "recommendations": [],
+        "deals": batch.to_records(with_times=False)
+    }
+    return FastJSONResponse(response).body
+
+
+def measure(fn, raw_deals, min_seconds: float) -> dict:
+    runs = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    while True:
+        total_bytes += len(fn(raw_deals))
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+    return {
+        "runs": runs,
+        "ms_per_response": elapsed / runs * 1000,
+        "deals_per_second": len(raw_deals) * runs / elapsed,
+        "bytes_per_response": total_bytes // runs
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deal response serialisation benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--min-seconds', type=float, default=1.0, help='Minimum run time per case')
+    parser.add_argument('--json', action='store_true', help='Output in JSON format')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        raw_deals = make_filfox_deals(size)
+        # Both paths must produce the same document
+        assert json.loads(current_path(raw_deals)) == json.loads(fast_path(raw_deals))
+        current = measure(current_path, raw_deals, args.min_seconds)
+        fast = measure(fast_path, raw_deals, args.min_seconds)
+        results.append({
+            "deals": size,
+            "current": current,
+            "fast": fast,
+            "speedup": current["ms_per_response"] / fast["ms_per_response"]
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'deals':>8} {'current ms':>12} {'fast ms':>10} {'current deals/s':>16} {'fast deals/s':>14} {'speedup':>8}")
+    for r in results:
+        print(f"{r['deals']:>8} {r['current']['ms_per_response']:>12.2f} {r['fast']['ms_per_response']:>10.2f} "
+              f"{r['current']['deals_per_second']:>16,.0f} {r['fast']['deals_per_second']:>14,.0f} {r['speedup']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures what a restart or scale-up costs before the service is useful:
+- `import main` wall time, with an -X importtime profile of the slowest modules
+- time to first response: uvicorn launch until /api/health answers 200
+- `user_storage_advisor.py --help` (the CLI should not pay for pandas)
+
+Each figure is the median of --runs fresh interpreters and is checked
+against a budget; the script exits non-zero when a budget is exceeded.
+Background services that would reach the network are disabled.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from synthetic import SERVICE_DIR
+
+# Seconds, median over runs
+BUDGETS = {
+    "import_main": 1.0,
+    "time_to_first_response": 2.0,
+    "cli_help": 0.5,
+}
+
+OFFLINE_ENV = {
+    "LIVE_FEED_ENABLED": "false",
+    "CPU_WORKER_PROCESSES": "0",
+    "CHECKPOINT_DIR": "",
+    "SHARED_SNAPSHOT_DIR": "",
+    "REDIS_URL": "",
+}
+
+
+def _env() -> dict:
+    return {**os.environ, **OFFLINE_ENV}
+
+
+def time_command(args) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=SERVICE_DIR, env=_env(), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def import_main_seconds() -> float:
+    """Wall time of `import main` net of interpreter startup"""
+    return time_command(["-c", "import main"]) - time_command(["-c", "pass"])
+
+
+def import_profile(top: int, max_depth: int = 2) -> list:
+    """Slowest modules (cumulative µs) imported by main, from -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=SERVICE_DIR,
+                            env=_env(), check=True, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:   self |   cumulative | <2 spaces per nesting level>name"
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth <= max_depth:
+            rows.append({"module": name.strip(), "depth": depth, "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:top]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_response(timeout: float = 30.0) -> float:
+    """Seconds from launching uvicorn until /api/health returns 200"""
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                               "--log-level", "warning"], cwd=SERVICE_DIR, env=_env(),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("deal-analyzer did not answer /api/health in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deal analyzer startup benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per measurement')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    parser.add_argument('--json', action='store_true', help='Output in JSON format')
+    args = parser.parse_args()
+
+    measures = {
+        "import_main": import_main_seconds,
+        "time_to_first_response": time_to_first_response,
+        "cli_help": lambda: time_command(["user_storage_advisor.py", "--help"]),
+    }
+    results = {}
+    for name, measure in measures.items():
+        samples = [measure() for _ in range(args.runs)]
+        median = statistics.median(samples)
+        results[name] = {"median_s": median, "budget_s": BUDGETS[name], "within_budget": median <= BUDGETS[name]}
+    profile = import_profile(args.top)
+    ok = all(r["within_budget"] for r in results.values())
+
+    if args.json:
+        print(json.dumps({"results": results, "import_profile": profile, "ok": ok}, indent=2))
+    else:
+        print(f"{'measure':<24} {'median s':>9} {'budget s':>9}")
+        for name, r in results.items():
+            flag = "" if r["within_budget"] else "  OVER BUDGET"
+            print(f"{name:<24} {r['median_s']:>9.3f} {r['budget_s']:>9.3f}{flag}")
+        print("\nSlowest imports under main (cumulative):")
+        for row in profile:
+            print(f"  {'  ' * row['depth']}{row['module']:<40} {row['cumulative_ms']:>8.1f} ms")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Upstream Recorder
+Captures real responses from every upstream the analyzer calls into a
+fixtures directory that standin_server.py replays:
+
+    filfox-<network>-deal-list.json   Filfox /deal/list pages
+    filecoin_daily_metrics.parquet    data portal daily metrics
+    dune-results.json                 Dune execution results (needs a Dune API key)
+    rpc-calibration.json              Lotus JSON-RPC results by method
+    manifest.json                     what was recorded, when and from where
+
+Sources that fail are reported and skipped; the stand-in then falls back
+to synthetic data for them.
+
+Usage:
+    python benchmarks/record_upstreams.py --limit 100
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from standin_server import FIXTURES_DIR
+
+import config
+
+RPC_METHODS = ("Filecoin.StateNetworkName", "Filecoin.ChainHead")
+DEFAULT_DUNE_API_KEY = "yUFhkcCEsErWy5fZ8XQLt8tsKlSG4I0q"
+DUNE_QUERY_ID = 3302707
+
+
+def record_filfox(out: str, limit: int) -> dict:
+    urls = {"mainnet": config.FILFOX_API_URL, "calibration": config.CALIBRATION_FILFOX_API_URL,
+            "testnet": config.TESTNET_FILFOX_API_URL}
+    recorded = {}
+    for network, base in urls.items():
+        response = requests.get(f"{base}/deal/list", params={"limit": limit}, timeout=30)
+        response.raise_for_status()
+        _write_json(out, f"filfox-{network}-deal-list.json", response.json())
+        recorded[network] = f"{base}/deal/list"
+    return recorded
+
+
+def record_parquet(out: str) -> dict:
+    response = requests.get(config.DAILY_METRICS_PARQUET_URL, timeout=120)
+    response.raise_for_status()
+    with open(os.path.join(out, "filecoin_daily_metrics.parquet"), "wb") as f:
+        f.write(response.content)
+    return {"url": config.DAILY_METRICS_PARQUET_URL, "bytes": len(response.content),
+            "etag": response.headers.get("ETag")}
+
+
+def record_dune(out: str, api_key: str) -> dict:
+    headers = {"x-dune-api-key": api_key, "Content-Type": "application/json"}
+    response = requests.post(f"{config.DUNE_API_URL}/query/{DUNE_QUERY_ID}/execute", headers=headers, timeout=30)
+    response.raise_for_status()
+    execution_id = response.json()["execution_id"]
+    for _ in range(60):
+        state = requests.get(f"{config.DUNE_API_URL}/execution/{execution_id}/status",
+                             headers=headers, timeout=30).json()["state"]
+        if state == "QUERY_STATE_COMPLETED":
+            break
+        if state.startswith("QUERY_STATE_FAILED"):
+            raise RuntimeError(f"Dune execution {execution_id} failed")
+        time.sleep(2)
+    results = requests.get(f"{config.DUNE_API_URL}/execution/{execution_id}/results",
+                           headers=headers, timeout=60).json()
+    _write_json(out, "dune-results.json", results)
+    return {"query_id": DUNE_QUERY_ID, "rows": len(results["result"]["rows"])}
+
+
+def record_rpc(out: str) -> dict:
+    results = {}
+    for method in RPC_METHODS:
+        response = requests.post(config.CALIBRATION_RPC_URL, timeout=15, json={
+            "jsonrpc": "2.0", "method": method, "params": [], "id": 1})
+        response.raise_for_status()
+        results[method] = response.json()["result"]
+    _write_json(out, "rpc-calibration.json", results)
+    return {"url": config.CALIBRATION_RPC_URL, "methods": list(results)}
+
+
+def _write_json(out: str, name: str, data):
+    with open(os.path.join(out, name), "w") as f:
+        json.dump(data, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record upstream responses for the stand-in server')
+    parser.add_argument('--out', default=FIXTURES_DIR, help='Fixtures directory')
+    parser.add_argument('--limit', type=int, default=100, help='Deals per Filfox page')
+    parser.add_argument('--dune-api-key', default=os.getenv('DUNE_API_KEY', DEFAULT_DUNE_API_KEY))
+    args = parser.parse_args()
+
+    if config.UPSTREAM_STANDIN_URL:
+        sys.exit("UPSTREAM_STANDIN_URL is set; unset it to record from the real upstreams")
+    os.makedirs(args.out, exist_ok=True)
+
+    recorders = {
+        "filfox": lambda: record_filfox(args.out, args.limit),
+        "portal": lambda: record_parquet(args.out),
+        "dune": lambda: record_dune(args.out, args.dune_api_key),
+        "rpc": lambda: record_rpc(args.out),
+    }
+    manifest = {"recorded_at": datetime.now(timezone.utc).isoformat(), "sources": {}}
+    for source, record in recorders.items():
+        try:
+            manifest["sources"][source] = record()
+            print(f"✓ {source}")
+        except Exception as e:
+            manifest["sources"][source] = {"error": str(e)}
+            print(f"✗ {source}: {e} (stand-in will use synthetic data)")
+    _write_json(args.out, "manifest.json", manifest)
+    print(f"Fixtures written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Upstream Stand-in Server
+Local replacement for every upstream the analyzer calls, so benchmarks and
+load tests run without network access:
+
+    /filfox/<network>/api/v1/deal/list        Filfox deal pages (honours ?limit=, ?page=&pageSize=)
+    /portal/filecoin_daily_metrics.parquet    data portal daily metrics
+    /dune/api/v1/query/<id>/execute           Dune execute -> status -> results flow
+    /dune/api/v1/execution/<id>/status
+    /dune/api/v1/execution/<id>/results
+    /rpc/<network>/rpc/v1                     Lotus JSON-RPC (StateNetworkName, ChainHead)
+
+Responses come from fixtures captured by record_upstreams.py when present,
+otherwise from the synthetic generators. Latency (with jitter) and error
+injection are configurable globally and per source.
+
+Point the analyzer at it with UPSTREAM_STANDIN_URL=http://127.0.0.1:<port>.
+
+Usage:
+    python benchmarks/standin_server.py --port 8765 --latency-ms 50 --error-rate 0.01
+    python benchmarks/standin_server.py --source-latency-ms dune=2000 --source-error-rate rpc=0.5
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from synthetic import make_daily_metrics, make_filfox_deals, make_parquet_bytes
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SOURCES = ("filfox", "portal", "dune", "rpc")
+CHAIN_HEAD_HEIGHT = 4_300_000
+
+
+def _synthetic_dune_rows(days: int = 30) -> list:
+    """Dune daily rows (newest first) with the columns the aggregators read"""
+    df = make_daily_metrics(days).iloc[::-1]
+    rng = random.Random(0)
+    return [{
+        "date": row.date.strftime("%Y-%m-%d 00:00:00.000 UTC"),
+        "deals": int(row.deals),
+        "verified_deals": int(row.verified_deals),
+        "deal_ends": int(row.deals * 0.8),
+        "active_deals": 30_000_000 + i * 1000,
+        "data_on_active_deals_pibs": float(row.data_on_active_deals_pibs),
+        "unique_data_on_active_deals_pibs": float(row.data_on_active_deals_pibs) * 0.6,
+        "providers_with_active_deals": 2_000 + rng.randint(0, 50),
+        "clients_with_active_deals": 5_000 + rng.randint(0, 100),
+        "mean_deal_duration_days": 520.0,
+        "deal_storage_cost_fil": float(row.deal_storage_cost_fil),
+        "fil_plus_bytes_share": 0.97,
+        "network_utilization_ratio": 0.3,
+        "average_piece_replication_factor": 4.2,
+    } for i, row in enumerate(df.itertuples())]
+
+
+class Fixtures:
+    """Recorded responses, falling back to synthetic data per source"""
+
+    def __init__(self, directory: str = FIXTURES_DIR):
+        self.directory = directory
+        self.deal_pages = {network: self._json(f"filfox-{network}-deal-list.json")
+                           or {"totalCount": 1000, "deals": make_filfox_deals(1000, seed=i)}
+                           for i, network in enumerate(("mainnet", "calibration", "testnet"))}
+        self.parquet = self._bytes("filecoin_daily_metrics.parquet") or make_parquet_bytes(3 * 365)
+        self.parquet_etag = '"%s"' % hashlib.sha1(self.parquet).hexdigest()
+        self.dune_results = self._json("dune-results.json") or {
+            "execution_id": "standin", "state": "QUERY_STATE_COMPLETED",
+            "result": {"rows": _synthetic_dune_rows()}}
+        self.rpc = self._json("rpc-calibration.json") or {
+            "Filecoin.StateNetworkName": "calibrationnet",
+            "Filecoin.ChainHead": {"Height": CHAIN_HEAD_HEIGHT, "Timestamp": int(time.time()),
+                                   "Cids": [{"/": "bafy2bzacestandin"}]},
+        }
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _bytes(self, name: str) -> Optional[bytes]:
+        if not os.path.exists(self._path(name)):
+            return None
+        with open(self._path(name), "rb") as f:
+            return f.read()
+
+    def _json(self, name: str) -> Optional[Any]:
+        data = self._bytes(name)
+        return json.loads(data) if data is not None else None
+
+
+class FaultInjection:
+    """Latency and error settings, global with optional per-source overrides"""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 error_status: int = 503, source_latency_ms: Optional[Dict[str, float]] = None,
+                 source_error_rate: Optional[Dict[str, float]] = None, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.source_latency_ms = source_latency_ms or {}
+        self.source_error_rate = source_error_rate or {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self, source: str) -> Optional[int]:
+        """Sleep for the source's latency; return an error status to send instead, if any"""
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+            fail = self._random.random() < self.source_error_rate.get(source, self.error_rate)
+        delay = max(0.0, self.source_latency_ms.get(source, self.latency_ms) + jitter) / 1000
+        if delay:
+            time.sleep(delay)
+        return self.error_status if fail else None
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    fixtures: Fixtures
+    faults: FaultInjection
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        source = url.path.strip("/").split("/", 1)[0]
+        if source not in SOURCES:
+            return self._send(404, {"error": f"unknown upstream {url.path}"})
+        status = self.faults.apply(source)
+        if status is not None:
+            return self._send(status, {"error": "injected failure"})
+        try:
+            status, payload, headers = getattr(self, f"_{source}")(method, url, body)
+        except KeyError as e:
+            status, payload, headers = 404, {"error": f"not found: {e}"}, {}
+        self._send(status, payload, headers)
+
+    def _filfox(self, method: str, url, body: bytes) -> Tuple[int, Any, Dict[str, str]]:
+        match = re.fullmatch(r"/filfox/(\w+)/api/v1/deal/list", url.path)
+        if method != "GET" or not match:
+            raise KeyError(url.path)
+        page = self.fixtures.deal_pages[match.group(1)]
+        query = parse_qs(url.query)
+        size = int(query.get("pageSize", query.get("limit", ["20"]))[0])
+        start = int(query.get("page", ["0"])[0]) * size
+        return 200, {"totalCount": page.get("totalCount", len(page["deals"])),
+                     "deals": page["deals"][start:start + size]}, {}
+
+    def _portal(self, method: str, url, body: bytes) -> Tuple[int, Any, Dict[str, str]]:
+        if not url.path.endswith(".parquet"):
+            raise KeyError(url.path)
+        return 200, self.fixtures.parquet, {"Content-Type": "application/octet-stream",
+                                            "ETag": self.fixtures.parquet_etag}
+
+    def _dune(self, method: str, url, body: bytes) -> Tuple[int, Any, Dict[str, str]]:
+        path = url.path[len("/dune/api/v1"):]
+        if method == "POST" and re.fullmatch(r"/query/\d+/execute", path):
+            return 200, {"execution_id": "standin", "state": "QUERY_STATE_PENDING"}, {}
+        if path.endswith("/status"):
+            return 200, {"execution_id": "standin", "state": "QUERY_STATE_COMPLETED"}, {}
+        if path.endswith("/results"):
+            return 200, self.fixtures.dune_results, {}
+        raise KeyError(url.path)
+
+    def _rpc(self, method: str, url, body: bytes) -> Tuple[int, Any, Dict[str, str]]:
+        request = json.loads(body or b"{}")
+        if request.get("method") not in self.fixtures.rpc:
+            return 200, {"jsonrpc": "2.0", "id": request.get("id"),
+                         "error": {"code": -32601, "message": "method not found"}}, {}
+        return 200, {"jsonrpc": "2.0", "id": request.get("id"), "result": self.fixtures.rpc[request["method"]]}, {}
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_standin(port: int = 0, fixtures_dir: str = FIXTURES_DIR,
+                  faults: Optional[FaultInjection] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve in a daemon thread; returns (server, base URL). Call server.shutdown() to stop."""
+    handler = type("Handler", (StandinHandler,), {
+        "fixtures": Fixtures(fixtures_dir),
+        "faults": faults or FaultInjection(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _per_source(values) -> Dict[str, float]:
+    result = {}
+    for item in values or []:
+        source, _, value = item.partition("=")
+        if source not in SOURCES:
+            raise SystemExit(f"Unknown source {source!r}; expected one of {', '.join(SOURCES)}")
+        result[source] = float(value)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the analyzer upstreams')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Directory written by record_upstreams.py')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests answered with --error-status')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--source-latency-ms', nargs='*', metavar='SOURCE=MS', help='e.g. dune=2000 filfox=150')
+    parser.add_argument('--source-error-rate', nargs='*', metavar='SOURCE=RATE', help='e.g. rpc=0.5')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    faults = FaultInjection(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status,
+                            _per_source(args.source_latency_ms), _per_source(args.source_error_rate), args.seed)
+    server, url = start_standin(args.port, args.fixtures, faults)
+    print(f"Upstream stand-in listening on {url}")
+    print(f"Run the analyzer with UPSTREAM_STANDIN_URL={url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
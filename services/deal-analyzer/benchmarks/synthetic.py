@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generators
+Filfox-shaped deal pages for benchmarks that must run without network access
+"""
+
+import os
+import sys
+from typing import Dict, List, Any
+
+import numpy as np
+
+# Benchmarks import the service modules from the parent directory
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+PIECE_SIZES = np.array([2**k for k in range(20, 37)], dtype=np.int64)  # 1 MiB .. 64 GiB
+
+
+def _deal_columns(n: int, seed: int, start_id: int, head_epoch: int) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    ids = start_id + n - np.arange(n, dtype=np.int64)
+    start_epochs = head_epoch - rng.integers(-2_880, 2_880 * 30, n)
+    durations = rng.integers(180 * 2_880, 540 * 2_880, n)
+    return {
+        "ids": ids,
+        "start_epochs": start_epochs,
+        "end_epochs": start_epochs + durations,
+        "verified": rng.random(n) < 0.9,
+        "piece_sizes": rng.choice(PIECE_SIZES, n),
+        "prices": np.where(rng.random(n) < 0.8, 0, rng.integers(1, 10**9, n)),
+        "providers": rng.integers(1_000, 4_000, n),
+        "clients": rng.integers(10_000, 12_000, n),
+    }
+
+
+def make_filfox_deals(n: int, seed: int = 0, start_id: int = 80_000_000,
+                      head_epoch: int = 4_300_000) -> List[Dict[str, Any]]:
+    """Generate n deals shaped like Filfox /deal/list entries, newest first"""
+    c = _deal_columns(n, seed, start_id, head_epoch)
+    return [
+        {
+            "id": int(c["ids"][i]),
+            "provider": f"f0{c['providers'][i]}",
+            "client": f"f0{c['clients'][i]}",
+            "pieceSize": int(c["piece_sizes"][i]),
+            "verifiedDeal": bool(c["verified"][i]),
+            "stroagePrice": str(c["prices"][i]),
+            "startEpoch": int(c["start_epochs"][i]),
+            "endEpoch": int(c["end_epochs"][i]),
+            "height": int(c["start_epochs"][i] - 2_880),
+        }
+        for i in range(n)
+    ]
+
+
+def make_deal_batch(n: int, seed: int = 0, start_id: int = 80_000_000, head_epoch: int = 4_300_000):
+    """Same deals as make_filfox_deals, built straight into a DealBatch (no per-deal dicts)"""
+    from deal_batch import DealBatch
+
+    c = _deal_columns(n, seed, start_id, head_epoch)
+    as_strings = lambda prefix, values: np.array([f"{prefix}{v}" for v in values.tolist()], dtype=object)
+    return DealBatch.from_columns(
+        "mainnet",
+        ids=c["ids"],
+        piece_sizes=c["piece_sizes"],
+        verified=c["verified"],
+        start_epochs=c["start_epochs"],
+        end_epochs=c["end_epochs"],
+        providers=as_strings("f0", c["providers"]),
+        clients=as_strings("f0", c["clients"]),
+        storage_prices=as_strings("", c["prices"]),
+    )
+
+
+def make_market_deals(n: int, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """n deals shaped like StateMarketDeals entries ({deal_id: {"Proposal", "State"}}), for selector.py"""
+    c = _deal_columns(n, seed, 80_000_000, 4_300_000)
+    return {
+        str(c["ids"][i]): {
+            "Proposal": {
+                "PieceSize": int(c["piece_sizes"][i]),
+                "VerifiedDeal": bool(c["verified"][i]),
+                "Client": f"f0{c['clients'][i]}",
+                "Provider": f"f0{c['providers'][i]}",
+                "StartEpoch": int(c["start_epochs"][i]),
+                "EndEpoch": int(c["end_epochs"][i]),
+                "StoragePricePerEpoch": str(c["prices"][i]),
+            },
+            "State": {"SectorStartEpoch": int(c["start_epochs"][i]), "LastUpdatedEpoch": -1, "SlashEpoch": -1},
+        }
+        for i in range(n)
+    }
+
+
+def make_daily_metrics(days: int, seed: int = 0, end_date=None):
+    """Daily-metrics frame shaped like filecoin_daily_metrics.parquet, ending today"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.now().normalize() if end_date is None else pd.Timestamp(end_date)
+    dates = pd.date_range(end=end, periods=days, freq="D")
+    deals = rng.integers(40_000, 140_000, days)
+    verified = (deals * rng.uniform(0.85, 1.0, days)).astype(np.int64)
+    # Random walk around ~1.7e-6 FIL so trends exist
+    cost = np.abs(1.7e-6 * np.exp(np.cumsum(rng.normal(0, 0.02, days))))
+    return pd.DataFrame({
+        "date": dates,
+        "deals": deals,
+        "verified_deals": verified,
+        "regular_deals": deals - verified,
+        "unique_piece_cids": (deals * rng.uniform(0.3, 0.9, days)).astype(np.int64),
+        "onboarded_data_pibs": rng.uniform(1.0, 6.0, days),
+        "data_on_active_deals_pibs": np.linspace(200.0, 1100.0, days),
+        "unique_data_onboarded_ratio": rng.uniform(0.2, 0.95, days),
+        "deal_storage_cost_fil": cost,
+    })
+
+
+def make_parquet_bytes(days: int, seed: int = 0) -> bytes:
+    """make_daily_metrics() encoded as parquet, as the data portal serves it"""
+    import io
+
+    buffer = io.BytesIO()
+    make_daily_metrics(days, seed=seed).to_parquet(buffer, index=False)
+    return buffer.getvalue()
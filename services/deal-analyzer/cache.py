@@ -10,12 +10,39 @@ class SimpleCache:
     def get(self, key):
         with self.lock:
             entry = self.data.get(key)
-            if entry and (time.time() - entry['time'] < self.ttl):
+            if entry and time.time() < entry['expires']:
                 return entry['value']
             if key in self.data:
                 del self.data[key]
             return None
 
-    def set(self, key, value):
+    def set(self, key, value, ttl=None):
+        """Store value; ttl overrides the cache-wide default for this entry"""
         with self.lock:
-            self.data[key] = {'value': value, 'time': time.time()} 
\ No newline at end of file
+            now = time.time()
+            self.data[key] = {'value': value, 'time': now, 'expires': now + (self.ttl if ttl is None else ttl)}
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self.lock:
+            if key is None:
+                self.data.clear()
+            else:
+                self.data.pop(key, None)
+
+    def entries(self):
+        """Live (key, value, expires) triples, e.g. for checkpointing"""
+        now = time.time()
+        with self.lock:
+            return [(k, e['value'], e['expires']) for k, e in self.data.items() if e['expires'] > now]
+
+    def restore(self, entries):
+        """Reload triples from entries(), keeping each one's original expiry; returns how many were live"""
+        now = time.time()
+        restored = 0
+        with self.lock:
+            for key, value, expires in entries:
+                if expires > now:
+                    self.data[key] = {'value': value, 'time': now, 'expires': expires}
+                    restored += 1
+        return restored
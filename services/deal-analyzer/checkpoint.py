@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Warm-Start Checkpoint
+Periodically saves the analyzer's in-memory state to CHECKPOINT_DIR and
+restores it on startup, before the first request is served, so a restart
+does not send every first request to Filfox, the data portal and Dune.
+
+Saved state:
+- deal stores (Arrow IPC, same format as the shared snapshots)
+- result cache (route results: metrics windows, Dune rows, ...) at each
+  result's full TTL, read back from L2 where L1 already dropped it
+- unified aggregator sources (chain head, deal page, Dune metrics, parquet window)
+- the live feeds' latest insights event
+
+Provider reputation is intentionally not saved: ReputationScorer holds no
+process state (each selection or placement builds its own scorer, which
+returns a constant score), so there is nothing to lose on restart.
+
+Cache entries keep their original expiry, so nothing stale is served after
+a restore; entries that expired while the service was down are dropped.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import zstandard as zstd
+
+from config import CHECKPOINT_DIR, CHECKPOINT_SECONDS
+from deal_store import DealStore
+from fast_json import dumps, loads
+from snapshot_store import SharedSnapshots, shared_snapshots
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "state.json.zst"
+CHECKPOINT_VERSION = 1
+
+
+def _encodable(entries) -> List[List[Any]]:
+    """Cache triples that survive JSON encoding (anything else is refetched after restart)"""
+    kept = []
+    for key, value, expires in entries:
+        try:
+            dumps(value)
+        except TypeError:
+            continue
+        kept.append([list(key) if isinstance(key, tuple) else key, value, expires])
+    return kept
+
+
+def _decoded_entries(entries) -> List[tuple]:
+    return [(tuple(key) if isinstance(key, list) else key, value, expires) for key, value, expires in entries]
+
+
+class Checkpointer:
+    """Saves and restores warm-start state for the running app"""
+
+    def __init__(self, directory: str, stores: Dict[str, DealStore], result_cache, feeds: Dict[str, Any]):
+        self.snapshots = SharedSnapshots(directory)
+        self.stores = stores
+        self.result_cache = result_cache
+        self.feeds = feeds
+        self.restore_report: Dict[str, Any] = {"restored": False}
+        self._task: Optional[asyncio.Task] = None
+
+    def save(self):
+        from unified_aggregator import active_unified_aggregators
+
+        # With shared snapshots every worker holds the same state; let the refresher write it
+        if shared_snapshots is not None and not shared_snapshots.is_refresher:
+            return
+        started = time.perf_counter()
+        for key, store in self.stores.items():
+            self.snapshots.publish_store(key, store)
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "saved_at": time.time(),
+            "result_cache": _encodable(self.result_cache.entries()),
+            "unified": {network: _encodable(aggregator.cache_entries())
+                        for network, aggregator in active_unified_aggregators().items()},
+            "insights": {network: feed.last_insights["data"]
+                         for network, feed in self.feeds.items() if feed.last_insights is not None},
+        }
+        self.snapshots.write_blob(STATE_FILE, zstd.ZstdCompressor(level=3).compress(dumps(state)),
+                                  str(CHECKPOINT_VERSION))
+        logger.info(f"Saved warm-start checkpoint in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def restore(self) -> Dict[str, Any]:
+        """Load the last checkpoint, if any; returns (and keeps) a small report"""
+        from unified_aggregator import get_unified_aggregator
+
+        started = time.perf_counter()
+        deals = {}
+        for key, store in self.stores.items():
+            loaded = self.snapshots.load_store(key)
+            if loaded is not None:
+                store.replace(*loaded)
+                deals[key] = len(store)
+
+        blob = self.snapshots.read_blob(STATE_FILE)
+        state = loads(zstd.ZstdDecompressor().decompress(blob[0])) if blob is not None else None
+        if state is None or state.get("version") != CHECKPOINT_VERSION:
+            state = {}
+        cached_results = self.result_cache.restore(_decoded_entries(state.get("result_cache", [])))
+        unified_sources = sum(get_unified_aggregator(network).restore_cache(_decoded_entries(entries))
+                              for network, entries in state.get("unified", {}).items())
+        insights = [network for network in state.get("insights", {}) if network in self.feeds]
+        for network in insights:
+            self.feeds[network].publish_insights(state["insights"][network])
+
+        # Only what was actually loaded counts: a checkpoint whose entries all expired restores nothing
+        self.restore_report = {
+            "restored": bool(sum(deals.values()) or cached_results or unified_sources or insights),
+            "restore_ms": round((time.perf_counter() - started) * 1000, 1),
+            "checkpoint_age_seconds": round(time.time() - state["saved_at"], 1) if "saved_at" in state else None,
+            "deals": deals,
+            "cached_results": cached_results,
+            "unified_sources": unified_sources,
+            "insights": insights,
+        }
+        logger.info(f"Warm-start restore: {self.restore_report}")
+        return self.restore_report
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the periodic loop and write a final checkpoint"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await asyncio.to_thread(self.save)
+        except Exception as e:
+            logger.error(f"Final checkpoint failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(CHECKPOINT_SECONDS)
+            try:
+                await asyncio.to_thread(self.save)
+            except Exception as e:
+                logger.error(f"Checkpoint failed: {e}")
+
+
+def create_checkpointer(stores, result_cache, feeds) -> Optional[Checkpointer]:
+    """Checkpointer for CHECKPOINT_DIR, or None when checkpointing is disabled"""
+    if not CHECKPOINT_DIR:
+        return None
+    return Checkpointer(CHECKPOINT_DIR, stores, result_cache, feeds)
@@ -33,4 +33,136 @@ BOOST_GRAPHQL_TESTNET_FALLBACKS = [
 ]
 
 DEFAULT_NETWORK = os.getenv('DEFAULT_NETWORK', 'mainnet')
-CACHE_TTL = int(os.getenv('CACHE_TTL', '600'))  # seconds 
\ No newline at end of file
+CACHE_TTL = int(os.getenv('CACHE_TTL', '600'))  # seconds 
+
+# Filecoin chain timing (per network genesis, 30s epochs)
+EPOCH_DURATION_SECONDS = 30
+FILECOIN_GENESIS_TIMESTAMPS = {
+    "mainnet": 1598306400,      # 2020-08-24T22:00:00Z
+    "calibration": 1667326380,  # 2022-11-01T18:13:00Z (calibnet reset)
+}
+# Testnet routes are served from calibration
+FILECOIN_GENESIS_TIMESTAMPS["testnet"] = FILECOIN_GENESIS_TIMESTAMPS["calibration"]
+
+# In-memory deal store (columnar, per network)
+DEAL_STORE_CHUNK_SIZE = int(os.getenv('DEAL_STORE_CHUNK_SIZE', '10000'))  # rows per export/scan chunk
+DEAL_STORE_MAX_DEALS = int(os.getenv('DEAL_STORE_MAX_DEALS', '1000000'))  # newest deals kept per network (0 = unbounded)
+# Cursor pages below what the store holds fetch older upstream pages of this size, at most this many per request
+DEAL_BACKFILL_PAGE_SIZE = int(os.getenv('DEAL_BACKFILL_PAGE_SIZE', '100'))
+DEAL_BACKFILL_MAX_PAGES = int(os.getenv('DEAL_BACKFILL_MAX_PAGES', '20'))
+
+# HTTP response compression (zstd/gzip when negotiated)
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+
+# Live deal feed (one ingestion loop per network, fanned out over SSE)
+LIVE_FEED_ENABLED = os.getenv('LIVE_FEED_ENABLED', 'true').lower() == 'true'
+LIVE_FEED_POLL_SECONDS = int(os.getenv('LIVE_FEED_POLL_SECONDS', '30'))  # one Filfox poll per epoch
+LIVE_FEED_INSIGHTS_SECONDS = int(os.getenv('LIVE_FEED_INSIGHTS_SECONDS', '600'))
+LIVE_FEED_QUEUE_SIZE = int(os.getenv('LIVE_FEED_QUEUE_SIZE', '100'))  # events buffered per subscriber
+LIVE_FEED_KEEPALIVE_SECONDS = 15
+
+# Unified aggregator memoisation: how long each sub-source stays fresh (seconds)
+UNIFIED_SOURCE_TTLS = {
+    "network_info": 300,
+    "deals": 30,             # new deals every epoch
+    "network_metrics": 3600, # Dune / chain metrics
+    "historical": 3600,      # parquet is published daily
+}
+UNIFIED_ERROR_TTL = 30  # retry failed sources after this long instead of on every request
+
+# CPU-bound work (parquet decoding, daily-metrics analytics) runs in a process pool
+# 0 disables the pool and runs that work in a thread instead
+CPU_WORKER_PROCESSES = int(os.getenv('CPU_WORKER_PROCESSES', str(min(2, os.cpu_count() or 1))))
+
+# Multi-worker deployments: workers share one refresher's snapshots through this directory
+# (empty = disabled, each worker fetches for itself)
+SHARED_SNAPSHOT_DIR = os.getenv('SHARED_SNAPSHOT_DIR', '')
+SHARED_SNAPSHOT_SYNC_SECONDS = float(os.getenv('SHARED_SNAPSHOT_SYNC_SECONDS', '2'))
+SHARED_PARQUET_MAX_AGE = int(os.getenv('SHARED_PARQUET_MAX_AGE', '3600'))  # parquet is published daily
+
+# Two-tier result cache: in-process L1 + Redis L2 shared by replicas
+# REDIS_URL: redis://host:6379/0, "local" for an in-process stand-in, empty for L1 only
+REDIS_URL = os.getenv('REDIS_URL', '')
+RESULT_CACHE_TTLS = {
+    "market": 3600,    # parquet-backed, published daily
+    "advisor": 3600,
+    "analysis": 60,    # includes the latest Filfox deals
+    "unified": 60,
+}
+RESULT_CACHE_L1_TTL = int(os.getenv('RESULT_CACHE_L1_TTL', '30'))  # keeps replicas close to L2
+# Recompute lock expiry; the holder renews it every third of this while computing, so it only
+# bounds how long a crashed replica blocks the others
+RESULT_CACHE_LOCK_SECONDS = int(os.getenv('RESULT_CACHE_LOCK_SECONDS', '60'))
+# How long a replica waits for another's recomputation before computing itself
+RESULT_CACHE_WAIT_SECONDS = int(os.getenv('RESULT_CACHE_WAIT_SECONDS', '120'))
+
+# Warm-start checkpoint: in-memory state saved periodically and restored before serving
+# Absolute path, e.g. /var/lib/deal-analyzer/checkpoint on a persistent volume (empty, the default, disables it)
+CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR', '')
+CHECKPOINT_SECONDS = int(os.getenv('CHECKPOINT_SECONDS', '300'))
+
+# Upstream endpoints. UPSTREAM_STANDIN_URL points every source at one local stand-in
+# (benchmarks/standin_server.py) for offline benchmarks; each URL can also be overridden alone.
+UPSTREAM_STANDIN_URL = os.getenv('UPSTREAM_STANDIN_URL', '').rstrip('/')
+
+
+def _upstream(env_name, default, standin_path):
+    if os.getenv(env_name):
+        return os.getenv(env_name)
+    if UPSTREAM_STANDIN_URL:
+        return UPSTREAM_STANDIN_URL + standin_path
+    return default
+
+
+FILFOX_API_URL = _upstream('FILFOX_API_URL', 'https://filfox.info/api/v1', '/filfox/mainnet/api/v1')
+CALIBRATION_FILFOX_API_URL = _upstream('CALIBRATION_FILFOX_API_URL', 'https://calibration.filfox.info/api/v1',
+                                       '/filfox/calibration/api/v1')
+TESTNET_FILFOX_API_URL = _upstream('TESTNET_FILFOX_API_URL', 'https://testnet.filfox.info/api/v1',
+                                   '/filfox/testnet/api/v1')
+CALIBRATION_EXPLORER_URL = _upstream('CALIBRATION_EXPLORER_URL', 'https://calibration.filfox.info',
+                                     '/filfox/calibration')
+DAILY_METRICS_PARQUET_URL = _upstream('DAILY_METRICS_PARQUET_URL',
+                                      'https://data.filecoindataportal.xyz/filecoin_daily_metrics.parquet',
+                                      '/portal/filecoin_daily_metrics.parquet')
+DUNE_API_URL = _upstream('DUNE_API_URL', 'https://api.dune.com/api/v1', '/dune/api/v1')
+CALIBRATION_RPC_URL = _upstream('CALIBRATION_RPC_URL', 'https://api.zondax.ch/fil/node/calibration/rpc/v1',
+                                '/rpc/calibration/rpc/v1')
+TESTNET_RPC_URL = _upstream('TESTNET_RPC_URL', 'https://api.zondax.ch/fil/node/testnet/rpc/v1',
+                            '/rpc/testnet/rpc/v1')
+
+# Prometheus metrics at /metrics (set PROMETHEUS_MULTIPROC_DIR as well when running several workers)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv('EVENT_LOOP_LAG_INTERVAL_SECONDS', '0.5'))
+
+# Event-loop watchdog: stalls longer than this are counted per call site and logged with the loop thread's stack
+LOOP_WATCHDOG_ENABLED = os.getenv('LOOP_WATCHDOG_ENABLED', 'true').lower() == 'true'
+LOOP_BLOCK_THRESHOLD_SECONDS = float(os.getenv('LOOP_BLOCK_THRESHOLD_SECONDS', '0.1'))
+
+# Request tracing (fetch / decompress / parse / analyse / serialise spans), exported as OTLP/JSON.
+# ?debug_timing=1 always traces that request and returns the breakdown.
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0'))  # fraction of requests exported
+TRACE_OTLP_ENDPOINT = os.getenv('TRACE_OTLP_ENDPOINT', '')  # e.g. http://localhost:4318/v1/traces
+TRACE_EXPORT_FILE = os.getenv('TRACE_EXPORT_FILE', '')  # append one OTLP/JSON export per line
+
+# Advisor price forecast (forecast.py): days ahead, trailing days the trend is fitted on, band coverage
+FORECAST_HORIZON_DAYS = int(os.getenv('FORECAST_HORIZON_DAYS', '30'))
+FORECAST_TREND_DAYS = int(os.getenv('FORECAST_TREND_DAYS', '365'))
+FORECAST_CONFIDENCE = float(os.getenv('FORECAST_CONFIDENCE', '0.9'))
+
+# Monte Carlo cost simulation (simulator.py): most trials x replicas one request may simulate
+SIMULATION_MAX_DRAWS = int(os.getenv('SIMULATION_MAX_DRAWS', '2000000'))
+
+# Admission control for expensive routes (see admission.py): per route template, requests running at once and
+# requests allowed to wait; beyond that, or after waiting ADMISSION_QUEUE_TIMEOUT_SECONDS, the reply is 503
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+ADMISSION_LIMITS = {
+    "analysis": (int(os.getenv('ADMISSION_ANALYSIS_CONCURRENCY', '2')), int(os.getenv('ADMISSION_ANALYSIS_QUEUE', '8'))),
+    "export": (int(os.getenv('ADMISSION_EXPORT_CONCURRENCY', '2')), int(os.getenv('ADMISSION_EXPORT_QUEUE', '4'))),
+    "simulation": (int(os.getenv('ADMISSION_SIMULATION_CONCURRENCY', '2')),
+                   int(os.getenv('ADMISSION_SIMULATION_QUEUE', '8'))),
+}
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_SECONDS', '15'))
+
+# Admin endpoints (/api/admin/*: profiler, allocation snapshots) need this bearer token; empty disables them
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', '60'))
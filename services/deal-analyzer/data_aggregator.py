@@ -1,13 +1,23 @@
-import requests
 import json
-import pandas as pd
+import hashlib
 import io
 import time
 import re
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, TYPE_CHECKING
 import logging
 
+if TYPE_CHECKING:
+    import pandas as pd  # imported lazily where used
+
+import upstream
+from forecast import apply_forecast, cached_forecast
+from metrics import parse_timer
+from tracing import span, traced
+from workers import run_cpu_bound_sync
+from snapshot_store import shared_fetch
+from config import SHARED_PARQUET_MAX_AGE, FILFOX_API_URL, DAILY_METRICS_PARQUET_URL, DUNE_API_URL
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,22 +33,26 @@ class FilecoinDealDataAggregator:
     """
     
     def __init__(self):
-        self.filfox_base_url = "https://filfox.info/api/v1"
-        self.parquet_url = "https://data.filecoindataportal.xyz/filecoin_daily_metrics.parquet"
+        self.filfox_base_url = FILFOX_API_URL
+        self.parquet_url = DAILY_METRICS_PARQUET_URL
         self.dune_api_key = "yUFhkcCEsErWy5fZ8XQLt8tsKlSG4I0q"
         self.dune_query_id = 3302707
         
-    def get_recent_deals_from_filfox(self, limit: int = 100) -> Dict[str, Any]:
+    @traced("source", "filfox")
+    def get_recent_deals_from_filfox(self, limit: int = 100, page: int = 0) -> Dict[str, Any]:
         """
         Fetch recent deals from Filfox API with enhanced analytics
+        (page > 0: older deals, `limit` per page, newest first)
         """
         try:
             url = f"{self.filfox_base_url}/deal/list"
             params = {"limit": limit}
+            if page:
+                params.update({"page": page, "pageSize": limit})
             
-            response = requests.get(url, params=params, timeout=15)
+            response = upstream.get(url, params=params, timeout=15)
             response.raise_for_status()
-            data = response.json()
+            data = upstream.parse_json(response)
             
             deals = data.get("deals", [])
 
@@ -69,6 +83,7 @@ class FilecoinDealDataAggregator:
             logger.error(f"Error fetching from Filfox: {e}")
             return {"error": str(e)}
     
+    @traced("analyse")
     def _analyze_filfox_deals(self, deals: List[Dict]) -> Dict[str, Any]:
         """Analyze Filfox deals data for insights"""
         if not deals:
@@ -109,39 +124,66 @@ class FilecoinDealDataAggregator:
             }
         }
     
+    @traced("source", "parquet")
     def get_historical_metrics_from_parquet(self, days: int = 30) -> Dict[str, Any]:
         """
         Fetch historical deal metrics from Filecoin Data Portal Parquet
         """
         try:
-            response = requests.get(self.parquet_url, timeout=30)
-            response.raise_for_status()
-            
-            df = pd.read_parquet(io.BytesIO(response.content))
-            df["date"] = pd.to_datetime(df["date"])
-            
-            # Filter for recent days
-            cutoff_date = datetime.now() - timedelta(days=days)
-            recent_df = df[df["date"] >= cutoff_date].copy()
-            
-            if recent_df.empty:
-                return {"error": "No recent data available"}
-            
-            # Calculate key metrics for users
-            analysis = self._analyze_for_users(recent_df)
-            
-            return {
-                "source": "filecoin_data_portal",
-                "timestamp": datetime.now().isoformat(),
-                "analysis_period_days": days,
-                "market_insights": analysis,
-                "recommendations": self._generate_recommendations(analysis)
-            }
+            content, data_version = self.fetch_parquet()
+            # Decoding and analysis go to the CPU worker pool when one is running
+            return run_cpu_bound_sync(self.analyze_parquet, content, days, data_version)
             
         except Exception as e:
             return {"error": f"Failed to fetch market data: {e}"}
     
-    def _analyze_for_users(self, df: pd.DataFrame):
+    def fetch_parquet(self):
+        """Daily metrics parquet as (content, data_version), downloaded once per host when workers share snapshots"""
+        return shared_fetch("daily_metrics.parquet", self._download_parquet, SHARED_PARQUET_MAX_AGE)
+    
+    def _download_parquet(self):
+        response = upstream.get(self.parquet_url, timeout=30)
+        response.raise_for_status()
+        # Identifies this parquet snapshot (used for HTTP ETags)
+        data_version = (response.headers.get("ETag") or response.headers.get("Last-Modified")
+                        or hashlib.sha1(response.content).hexdigest())
+        return response.content, data_version
+    
+    @traced("analyse")
+    def analyze_parquet(self, content: bytes, days: int, data_version: str) -> Dict[str, Any]:
+        """CPU-bound stage: decode the parquet and analyse the last `days` days"""
+        import pandas as pd  # deferred: only the parquet stages need it
+        
+        with parse_timer("parquet", "parquet"), span("parse", "parquet", format="parquet"):
+            df = pd.read_parquet(io.BytesIO(content))
+        df["date"] = pd.to_datetime(df["date"])
+        
+        # Filter for recent days
+        cutoff_date = datetime.now() - timedelta(days=days)
+        recent_df = df[df["date"] >= cutoff_date].copy()
+        
+        if recent_df.empty:
+            return {"error": "No recent data available"}
+        
+        # Calculate key metrics for users
+        analysis = self._analyze_for_users(recent_df)
+        
+        # Forecast from the full history, fitted once per parquet version
+        if "deal_storage_cost_fil" in df.columns:
+            forecast = cached_forecast(data_version, df["date"].to_numpy(), df["deal_storage_cost_fil"].to_numpy())
+            if forecast is not None:
+                apply_forecast(analysis["pricing"], forecast)
+        
+        return {
+            "source": "filecoin_data_portal",
+            "timestamp": datetime.now().isoformat(),
+            "data_version": data_version,
+            "analysis_period_days": days,
+            "market_insights": analysis,
+            "recommendations": self._generate_recommendations(analysis)
+        }
+    
+    def _analyze_for_users(self, df: "pd.DataFrame"):
         """Analyze data from a user's perspective"""
         
         # Get latest data
@@ -267,6 +309,7 @@ class FilecoinDealDataAggregator:
         
         return recommendations
     
+    @traced("source", "dune")
     def get_network_metrics_from_dune(self) -> Dict[str, Any]:
         """
         Fetch comprehensive network metrics from Dune Analytics
@@ -278,27 +321,28 @@ class FilecoinDealDataAggregator:
             }
             
             # Start execution
-            start_url = f"https://api.dune.com/api/v1/query/{self.dune_query_id}/execute"
-            resp = requests.post(start_url, headers=headers, timeout=30)
+            start_url = f"{DUNE_API_URL}/query/{self.dune_query_id}/execute"
+            resp = upstream.post(start_url, headers=headers, timeout=30)
             resp.raise_for_status()
-            execution_id = resp.json()["execution_id"]
+            execution_id = upstream.parse_json(resp)["execution_id"]
             
             # Poll for completion
             max_attempts = 30
             for attempt in range(max_attempts):
-                status_url = f"https://api.dune.com/api/v1/execution/{execution_id}/status"
-                status = requests.get(status_url, headers=headers).json()
+                status_url = f"{DUNE_API_URL}/execution/{execution_id}/status"
+                status = upstream.parse_json(upstream.get(status_url, headers=headers))
                 
                 if status["state"] == "QUERY_STATE_COMPLETED":
                     break
                 elif status["state"].startswith("QUERY_STATE_FAILED"):
                     raise Exception("Dune query failed")
                 
-                time.sleep(2)
+                with span("wait", "dune"):
+                    time.sleep(2)
             
             # Fetch results
-            results_url = f"https://api.dune.com/api/v1/execution/{execution_id}/results"
-            results = requests.get(results_url, headers=headers).json()
+            results_url = f"{DUNE_API_URL}/execution/{execution_id}/results"
+            results = upstream.parse_json(upstream.get(results_url, headers=headers))
             rows = results["result"]["rows"]
             
             if not rows:
@@ -371,6 +415,7 @@ class FilecoinDealDataAggregator:
         
         return results
     
+    @traced("analyse")
     def _generate_insights(self, sources: Dict[str, Any]) -> Dict[str, Any]:
         """Generate insights from combined data sources"""
         insights = {
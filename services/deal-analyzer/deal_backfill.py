@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Deal Store Backfill
+Cursor pages are answered from the deal store, which on its own only holds
+the newest deals the routes and the live feed have fetched. When a cursor
+reaches below what the store covers, the backfill fetches the next older
+upstream pages (Filfox lists deals newest first by page number) and
+ingests them until the page can be served.
+
+Coverage is tracked as `floor`: every upstream deal with an id between
+floor and the newest id seen when the walk started is in the store (page k
+only ever shifts towards older deals as new ones arrive, so consecutive
+pages overlap rather than leave gaps). Deals below the floor that are in
+the store from elsewhere are not served until the walk reaches them.
+
+Once the store trims to DEAL_STORE_MAX_DEALS, the walk stops at the
+store's `evicted_below`: pages older than that would be trimmed again on
+ingest, so cursors end there as if the upstream had no older deals.
+"""
+
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from config import DEAL_BACKFILL_MAX_PAGES, DEAL_BACKFILL_PAGE_SIZE
+from deal_batch import DealBatch
+from deal_store import DealStore
+
+
+class BackfillError(RuntimeError):
+    """Raised when the upstream page needed for a cursor page cannot be fetched"""
+
+
+class DealBackfill:
+    """Walks older upstream deal pages into one DealStore on demand"""
+
+    def __init__(self, store: DealStore, fetch_page: Callable[[int, int], Dict[str, Any]],
+                 page_size: int = DEAL_BACKFILL_PAGE_SIZE, max_pages: int = DEAL_BACKFILL_MAX_PAGES):
+        self.store = store
+        # fetch_page(page, page_size) -> aggregator result with "deals" (or "error")
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.next_page = 0
+        self.floor: Optional[int] = None
+        self.exhausted = False
+        self._lock = Lock()
+
+    def _covered_below(self, before_id: int) -> int:
+        """Stored deals with floor <= id < before_id"""
+        if self.exhausted:
+            return int(np.searchsorted(self.store.snapshot().ids, before_id, side="left"))
+        if self.floor is None or self.floor >= before_id:
+            return 0
+        ids = self.store.snapshot().ids
+        return int(np.searchsorted(ids, before_id, side="left") - np.searchsorted(ids, self.floor, side="left"))
+
+    def _at_retention_limit(self) -> bool:
+        """True once the walk has reached ids the store no longer keeps"""
+        evicted_below = self.store.evicted_below
+        return evicted_below is not None and self.floor is not None and self.floor <= evicted_below
+
+    def page_before(self, before_id: int, limit: int) -> Tuple[DealBatch, bool]:
+        """
+        Up to `limit` deals with id < before_id, newest first, fetching older
+        upstream pages as needed (blocking; at most max_pages per call).
+        Returns (page, more): more is False once the upstream has no older
+        deals, or the store's retention limit is reached.
+        """
+        evicted_below = self.store.evicted_below
+        if evicted_below is not None and before_id <= evicted_below:
+            return self.store.page_before(before_id, 0), False
+        with self._lock:
+            fetched = 0
+            while not self.exhausted and self._covered_below(before_id) < limit:
+                if fetched == self.max_pages or self._at_retention_limit():
+                    break
+                result = self.fetch_page(self.next_page, self.page_size)
+                if "error" in result:
+                    raise BackfillError(f"Failed to fetch {self.store.network} deal page {self.next_page}: "
+                                        f"{result['error']}")
+                deals = result.get("deals", [])
+                self.store.ingest(deals)
+                ids = [d["id"] for d in deals if d.get("id") is not None]
+                if ids:
+                    self.floor = min(ids) if self.floor is None else min(self.floor, min(ids))
+                if len(deals) < self.page_size:
+                    self.exhausted = True
+                self.next_page += 1
+                fetched += 1
+
+            page = self.store.page_before(before_id, limit)
+            if not self.exhausted:
+                page = page.take(page.ids >= (before_id if self.floor is None else self.floor))
+            finished = self.exhausted or self._at_retention_limit()
+            return page, not (finished and len(page) < limit)
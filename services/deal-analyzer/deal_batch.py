@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Columnar Deal Batches
+Holds a page of Filfox deals as NumPy columns so epoch/time conversion and
+status classification run as single vectorised steps per network
+"""
+
+import time
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+
+from config import EPOCH_DURATION_SECONDS, FILECOIN_GENESIS_TIMESTAMPS
+
+# Deal status codes (index into DEAL_STATUS_LABELS)
+STATUS_PENDING = 0
+STATUS_ACTIVE = 1
+STATUS_EXPIRED = 2
+STATUS_UNKNOWN = 3  # start or end epoch missing
+DEAL_STATUS_LABELS = np.array(["Pending", "Active", "Expired", "Unknown"], dtype=object)
+
+# Stored for a missing start/end epoch (the chain's own "unset" value); serialised as null
+MISSING_EPOCH = -1
+
+SECONDS_PER_DAY = 24 * 60 * 60
+GIB = 1024 ** 3
+
+
+def genesis_timestamp(network: str) -> int:
+    """Genesis unix timestamp for a network name ("mainnet", "calibration", "testnet", ...)"""
+    if network in FILECOIN_GENESIS_TIMESTAMPS:
+        return FILECOIN_GENESIS_TIMESTAMPS[network]
+    # Anything that isn't mainnet ("testnet/calibration", ...) is served from calibration
+    return FILECOIN_GENESIS_TIMESTAMPS["calibration"]
+
+
+def current_epoch(network: str, now: Optional[float] = None) -> int:
+    """Approximate current chain epoch for a network"""
+    now = int(time.time() if now is None else now)
+    return (now - genesis_timestamp(network)) // EPOCH_DURATION_SECONDS
+
+
+def epochs_to_timestamps(epochs: np.ndarray, network: str) -> np.ndarray:
+    """Map an array of epochs to unix timestamps (int64 seconds)"""
+    return genesis_timestamp(network) + np.asarray(epochs, dtype=np.int64) * EPOCH_DURATION_SECONDS
+
+
+def classify_status(start_epochs: np.ndarray, end_epochs: np.ndarray, at_epoch: int) -> np.ndarray:
+    """Vectorised Pending/Active/Expired classification (Unknown without epochs), returned as status codes"""
+    codes = np.full(len(start_epochs), STATUS_ACTIVE, dtype=np.int8)
+    # Same precedence as the per-deal check: not started yet wins over past the end
+    codes[at_epoch > end_epochs] = STATUS_EXPIRED
+    codes[at_epoch < start_epochs] = STATUS_PENDING
+    codes[(start_epochs == MISSING_EPOCH) | (end_epochs == MISSING_EPOCH)] = STATUS_UNKNOWN
+    return codes
+
+
+def _epoch(deal: Dict[str, Any], key: str) -> int:
+    value = deal.get(key)
+    return MISSING_EPOCH if value is None else value
+
+
+def _object_array(values: List[Any]) -> np.ndarray:
+    """1-D object array (np.array would try to build a 2-D array from equal-length strings)"""
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def factorize(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """np.unique(values, return_inverse=True) for object columns; hashes each value once instead of sorting them all"""
+    table: Dict[Any, int] = {}
+    codes = np.fromiter((table.setdefault(v, len(table)) for v in values.tolist()), dtype=np.int64, count=len(values))
+    uniques = _object_array(list(table))
+    order = np.argsort(uniques, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return uniques[order], rank[codes]
+
+
+def _nullable(values: np.ndarray, missing: np.ndarray) -> List[Any]:
+    """values as a list, with None where `missing`"""
+    if not missing.any():
+        return values.tolist()
+    return np.where(missing, None, values.astype(object)).tolist()
+
+
+def format_iso_timestamps(timestamps: np.ndarray) -> np.ndarray:
+    """Format unix timestamps as ISO-8601 UTC strings ("...+00:00") in one pass"""
+    iso = np.datetime_as_string(np.asarray(timestamps, dtype="datetime64[s]"), unit="s")
+    return np.char.add(iso, "+00:00")
+
+
+class DealBatch:
+    """
+    A page of deals in columnar form.
+
+    Numeric fields are NumPy arrays; string fields are NumPy object arrays so
+    batches can be sliced, filtered and concatenated without Python loops.
+    Timestamps and statuses are computed for the whole batch at once and
+    ISO strings are only produced in to_records(), i.e. at serialisation time.
+    """
+
+    COLUMNS = ("ids", "piece_sizes", "verified", "start_epochs", "end_epochs",
+               "providers", "clients", "storage_prices")
+
+    def __init__(self, deals: List[Dict[str, Any]], network: str = "mainnet"):
+        n = len(deals)
+        self.network = network
+        self.ids = np.fromiter((d.get('id', 0) for d in deals), dtype=np.int64, count=n)
+        self.piece_sizes = np.fromiter((d.get('pieceSize', 0) for d in deals), dtype=np.int64, count=n)
+        self.verified = np.fromiter((bool(d.get('verifiedDeal', False)) for d in deals), dtype=bool, count=n)
+        self.start_epochs = np.fromiter((_epoch(d, 'startEpoch') for d in deals), dtype=np.int64, count=n)
+        self.end_epochs = np.fromiter((_epoch(d, 'endEpoch') for d in deals), dtype=np.int64, count=n)
+        self.providers = _object_array([d.get('provider', '') for d in deals])
+        self.clients = _object_array([d.get('client', '') for d in deals])
+        # Filfox spells this field "stroagePrice"
+        self.storage_prices = _object_array([d.get('stroagePrice') for d in deals])
+
+    @classmethod
+    def from_columns(cls, network: str, **columns: np.ndarray) -> "DealBatch":
+        """Build a batch directly from column arrays (no per-deal dicts)"""
+        batch = cls.__new__(cls)
+        batch.network = network
+        for name in cls.COLUMNS:
+            setattr(batch, name, columns[name])
+        return batch
+
+    @classmethod
+    def concat(cls, batches: List["DealBatch"], network: str) -> "DealBatch":
+        if not batches:
+            return cls([], network=network)
+        return cls.from_columns(network, **{
+            name: np.concatenate([getattr(b, name) for b in batches]) for name in cls.COLUMNS
+        })
+
+    def take(self, index: Any) -> "DealBatch":
+        """Select rows by slice, boolean mask or index array"""
+        return self.from_columns(self.network, **{name: getattr(self, name)[index] for name in self.COLUMNS})
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def has_epochs(self) -> np.ndarray:
+        """True where both the start and end epoch are known"""
+        return (self.start_epochs != MISSING_EPOCH) & (self.end_epochs != MISSING_EPOCH)
+
+    @property
+    def duration_days(self) -> np.ndarray:
+        """Deal duration in days (NaN without both epochs)"""
+        days = (self.end_epochs - self.start_epochs) * EPOCH_DURATION_SECONDS / SECONDS_PER_DAY
+        return np.where(self.has_epochs, days, np.nan)
+
+    def start_timestamps(self) -> np.ndarray:
+        return epochs_to_timestamps(self.start_epochs, self.network)
+
+    def end_timestamps(self) -> np.ndarray:
+        return epochs_to_timestamps(self.end_epochs, self.network)
+
+    def price_per_gib_epoch(self) -> np.ndarray:
+        """Storage price per GiB per epoch (attoFIL): 0 for unpriced deals, NaN without a piece size"""
+        price = np.array([float(p) if p else 0.0 for p in self.storage_prices.tolist()], dtype=np.float64)
+        per_gib = np.full(len(self), np.nan)
+        np.divide(price, self.piece_sizes / GIB, out=per_gib, where=self.piece_sizes > 0)
+        return per_gib
+
+    def status_codes(self, at_epoch: Optional[int] = None) -> np.ndarray:
+        if at_epoch is None:
+            at_epoch = current_epoch(self.network)
+        return classify_status(self.start_epochs, self.end_epochs, at_epoch)
+
+    def analytics(self) -> Dict[str, Any]:
+        """Vectorised equivalent of FilecoinDealDataAggregator._analyze_filfox_deals"""
+        n = len(self)
+        if not n:
+            return {}
+
+        verified_count = int(self.verified.sum())
+        total_size_gb = float(self.piece_sizes.sum()) / (1024**3)
+
+        priced = [p for p in self.storage_prices.tolist() if p and p != '0']
+        prices = np.array(priced, dtype=np.float64)
+        # Like the per-deal analysis: epoch 0 counts as unset too
+        has_epochs = (self.start_epochs > 0) & (self.end_epochs > 0)
+        durations = self.duration_days[has_epochs]
+
+        return {
+            "verified_deals_count": verified_count,
+            "verified_deals_percentage": (verified_count / n) * 100,
+            "total_size_gb": total_size_gb,
+            "average_piece_size_gb": total_size_gb / n,
+            "average_storage_price": float(prices.mean()) if len(prices) else 0,
+            "average_deal_duration_days": float(durations.mean()) if len(durations) else 0,
+            "price_range": {
+                "min": float(prices.min()) if len(prices) else 0,
+                "max": float(prices.max()) if len(prices) else 0
+            },
+            "duration_range": {
+                "min": float(durations.min()) if len(durations) else 0,
+                "max": float(durations.max()) if len(durations) else 0
+            }
+        }
+
+    def to_records(self, with_times: bool = True, at_epoch: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Serialise to the API deal dicts (the only place ISO strings are formatted)"""
+        ids = self.ids.tolist()
+        piece_sizes = self.piece_sizes.tolist()
+        verified = self.verified.tolist()
+        start_epochs = _nullable(self.start_epochs, self.start_epochs == MISSING_EPOCH)
+        end_epochs = _nullable(self.end_epochs, self.end_epochs == MISSING_EPOCH)
+        durations = _nullable(self.duration_days, ~self.has_epochs)
+        providers = self.providers.tolist()
+        clients = self.clients.tolist()
+        storage_prices = self.storage_prices.tolist()
+
+        records = [
+            {
+                "id": ids[i],
+                "provider": providers[i],
+                "client": clients[i],
+                "piece_size": piece_sizes[i],
+                "verified_deal": verified[i],
+                "storage_price": storage_prices[i],
+                "start_epoch": start_epochs[i],
+                "end_epoch": end_epochs[i],
+                "duration_days": durations[i],
+            }
+            for i in range(len(ids))
+        ]
+        if not with_times:
+            return records
+
+        start_times = _nullable(format_iso_timestamps(self.start_timestamps()), self.start_epochs == MISSING_EPOCH)
+        end_times = _nullable(format_iso_timestamps(self.end_timestamps()), self.end_epochs == MISSING_EPOCH)
+        statuses = DEAL_STATUS_LABELS[self.status_codes(at_epoch)].tolist()
+        for i, record in enumerate(records):
+            record["start_time"] = start_times[i]
+            record["end_time"] = end_times[i]
+            record["status"] = statuses[i]
+        return records
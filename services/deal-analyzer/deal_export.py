@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Bulk Deal Export
+Encoders that turn DealStore.scan() chunks into NDJSON, CSV or Arrow IPC
+byte chunks for StreamingResponse. Every encoder is a generator, so only
+one chunk is materialised at a time and the ASGI server's send() provides
+backpressure to the scan.
+"""
+
+import csv
+import io
+from typing import Iterable, Iterator
+
+from deal_batch import DealBatch, DEAL_STATUS_LABELS, MISSING_EPOCH
+from fast_json import dumps
+
+EXPORT_FIELDS = ["id", "provider", "client", "piece_size", "verified_deal", "storage_price",
+                 "start_epoch", "end_epoch", "duration_days", "start_time", "end_time", "status"]
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def iter_ndjson(chunks: Iterable[DealBatch]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield b"".join(dumps(record) + b"\n" for record in chunk.to_records())
+
+
+def iter_csv(chunks: Iterable[DealBatch]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(chunk.to_records())
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_arrow(chunks: Iterable[DealBatch]) -> Iterator[bytes]:
+    """Arrow IPC stream; one record batch per chunk with native timestamp columns"""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("provider", pa.string()),
+        ("client", pa.string()),
+        ("piece_size", pa.int64()),
+        ("verified_deal", pa.bool_()),
+        ("storage_price", pa.string()),
+        ("start_epoch", pa.int64()),
+        ("end_epoch", pa.int64()),
+        ("duration_days", pa.float64()),
+        ("start_time", pa.timestamp("s", tz="UTC")),
+        ("end_time", pa.timestamp("s", tz="UTC")),
+        ("status", pa.string()),
+    ])
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    for chunk in chunks:
+        # Missing epochs (and their times / durations) become nulls
+        no_start, no_end = chunk.start_epochs == MISSING_EPOCH, chunk.end_epochs == MISSING_EPOCH
+        timestamp = pa.timestamp("s", tz="UTC")
+        writer.write_batch(pa.record_batch([
+            chunk.ids,
+            pa.array(chunk.providers, type=pa.string()),
+            pa.array(chunk.clients, type=pa.string()),
+            chunk.piece_sizes,
+            chunk.verified,
+            pa.array(chunk.storage_prices, type=pa.string()),
+            pa.array(chunk.start_epochs, mask=no_start),
+            pa.array(chunk.end_epochs, mask=no_end),
+            pa.array(chunk.duration_days, mask=no_start | no_end),
+            pa.array(chunk.start_timestamps(), type=timestamp, mask=no_start),
+            pa.array(chunk.end_timestamps(), type=timestamp, mask=no_end),
+            pa.array(DEAL_STATUS_LABELS[chunk.status_codes()], type=pa.string()),
+        ], schema=schema))
+        yield drain()
+    writer.close()
+    yield drain()
+
+
+EXPORT_ENCODERS = {
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+    "arrow": iter_arrow,
+}
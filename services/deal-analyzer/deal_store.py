@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Columnar Deal Store
+Accumulates every deal the analyzer ingests, per network, as one DealBatch
+sorted by deal id. Each ingest swaps in a new immutable batch, so readers
+(exports, pagination) work on a consistent snapshot without holding locks.
+
+Snapshots are views over column buffers with spare capacity: deals newer
+than the newest stored id (nearly every ingest) are written past the end
+of the current view, which no reader can see, so an ingest costs O(new
+deals) amortised. Older ids are merged into fresh buffers.
+
+With DEAL_STORE_MAX_DEALS set, every ingest trims the oldest ids beyond
+the cap. A trim only moves the start of the view, so it is O(trimmed
+deals). The smallest id kept after the first trim is `evicted_below`:
+older deals may be missing, and cursor backfill stops there.
+
+The version is derived from the set of stored ids (an order-independent
+hash, updated incrementally), not counted per ingest: worker processes
+that ingest on their own and then load the refresher's shared snapshot
+report the same version, and so the same ETags, exactly when they hold
+the same deals.
+"""
+
+import time
+from threading import Lock
+from typing import Callable, Dict, List, Iterator, Optional, Any
+
+import numpy as np
+
+from config import DEAL_STORE_CHUNK_SIZE, DEAL_STORE_MAX_DEALS
+from deal_batch import DealBatch
+
+MIN_CAPACITY = 1024
+
+
+class DealStore:
+    """
+    Per-network store of ingested deals, unique and ascending by deal id
+    """
+
+    def __init__(self, network: str, max_deals: int = DEAL_STORE_MAX_DEALS):
+        self.network = network
+        self.max_deals = max_deals  # 0: unbounded
+        self._deals = DealBatch([], network=network)
+        # Column buffers _deals is the view [_start, _start + len) of (None: _deals owns its arrays)
+        self._buffers: Optional[Dict[str, np.ndarray]] = None
+        self._start = 0
+        # Smallest id kept by the last retention trim (None: nothing trimmed yet)
+        self.evicted_below: Optional[int] = None
+        self._lock = Lock()
+        self._digest = 0
+        self.version = 0
+        self.updated_at: Optional[float] = None
+        # Last ingest, whether or not it added deals: how recently the store was checked against the upstream
+        self.checked_at: Optional[float] = None
+        # Called with each batch of newly added deals (e.g. the price series)
+        self.listeners: List[Callable[[DealBatch], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._deals)
+
+    def checked_within(self, seconds: float) -> bool:
+        return self.checked_at is not None and time.time() - self.checked_at <= seconds
+
+    def snapshot(self) -> DealBatch:
+        """Current immutable batch (sorted by id)"""
+        return self._deals
+
+    def ingest(self, deals: List[Dict[str, Any]]) -> DealBatch:
+        """
+        Add Filfox deal dicts to the store, skipping ids already present.
+        Returns the batch of deals that were actually new.
+        """
+        self.checked_at = time.time()
+        incoming = DealBatch(deals, network=self.network)
+        if not len(incoming):
+            return incoming
+
+        # Sort and drop duplicates within the page itself
+        incoming = incoming.take(np.argsort(incoming.ids, kind="stable"))
+        _, first = np.unique(incoming.ids, return_index=True)
+        incoming = incoming.take(first)
+
+        with self._lock:
+            current = self._deals
+            new = incoming.take(~_contains(current.ids, incoming.ids))
+            if len(new):
+                if not len(current) or new.ids[0] > current.ids[-1]:
+                    self._append(new)
+                else:
+                    self._deals, self._buffers = _merge_sorted(current, new), None
+                digest = (self._digest + _id_digest(new.ids)) % _DIGEST_MOD
+                trimmed = self._trim()
+                if trimmed is not None:
+                    digest = (digest - _id_digest(trimmed)) % _DIGEST_MOD
+                    # Deals older than what is kept were not really added
+                    new = new.take(new.ids >= self.evicted_below)
+                self._set_digest(digest)
+                self.updated_at = time.time()
+        self._notify(new)
+        return new
+
+    def replace(self, batch: DealBatch, updated_at: Optional[float] = None,
+                evicted_below: Optional[int] = None) -> DealBatch:
+        """
+        Swap in a snapshot loaded from another process (see snapshot_store),
+        adopting its retention floor. Deals this process ingested itself
+        that the snapshot lacks are kept (merged back in, then trimmed to
+        max_deals), so a follower's own fetches are not dropped.
+        Returns the deals that were not in the previous snapshot.
+        """
+        with self._lock:
+            current = self._deals
+            new = batch.take(~_contains(current.ids, batch.ids))
+            local = current.take(~_contains(batch.ids, current.ids))
+            if evicted_below is not None:
+                local = local.take(local.ids >= evicted_below)
+            self._deals = _merge_sorted(batch, local) if len(local) else batch
+            self._buffers, self._start = None, 0
+            self.evicted_below = evicted_below
+            self._trim()
+            self._set_digest(_id_digest(self._deals.ids))
+            self.updated_at = updated_at
+        self._notify(new)
+        return new
+
+    def _set_digest(self, digest: int):
+        """Store the id-set hash and the version derived from it (lock held)"""
+        self._digest = digest
+        self.version = _version(digest, len(self._deals))
+
+    def _append(self, new: DealBatch):
+        """Write deals with ids above the current maximum after the current view (lock held)"""
+        n, k = len(self._deals), len(new)
+        start, buffers = self._start, self._buffers
+        if buffers is None or start + n + k > len(buffers["ids"]):
+            # Fresh buffers with the live deals at the front (trimmed ones are left behind)
+            capacity = max(2 * (n + k), MIN_CAPACITY)
+            buffers = {}
+            for name in DealBatch.COLUMNS:
+                column = getattr(self._deals, name)
+                buffers[name] = np.empty(capacity, dtype=column.dtype)
+                buffers[name][:n] = column
+            self._buffers, self._start, start = buffers, 0, 0
+        for name in DealBatch.COLUMNS:
+            buffers[name][start + n:start + n + k] = getattr(new, name)
+        self._deals = DealBatch.from_columns(self.network, **{name: buffers[name][start:start + n + k]
+                                                              for name in DealBatch.COLUMNS})
+
+    def _trim(self) -> Optional[np.ndarray]:
+        """Drop the oldest deals beyond max_deals (lock held); returns their ids, None if none"""
+        excess = len(self._deals) - self.max_deals
+        if not self.max_deals or excess <= 0:
+            return None
+        trimmed = self._deals.ids[:excess].copy()
+        self._deals = self._deals.take(slice(excess, None))
+        if self._buffers is not None:
+            self._start += excess
+        self.evicted_below = int(self._deals.ids[0])
+        return trimmed
+
+    def _notify(self, new: DealBatch):
+        if len(new):
+            for listener in self.listeners:
+                listener(new)
+
+    def page_before(self, before_id: Optional[int], limit: int) -> DealBatch:
+        """
+        Keyset page: the `limit` newest deals with id < before_id (all deals
+        when before_id is None), newest first. A binary search plus a slice,
+        so deep pages cost the same as the first one.
+        """
+        deals = self._deals
+        end = len(deals) if before_id is None else int(np.searchsorted(deals.ids, before_id, side="left"))
+        start = max(0, end - limit)
+        return deals.take(slice(start, end)).take(slice(None, None, -1))
+
+    def scan(self, provider: Optional[str] = None, client: Optional[str] = None,
+             verified: Optional[bool] = None, min_epoch: Optional[int] = None,
+             max_epoch: Optional[int] = None, chunk_size: int = DEAL_STORE_CHUNK_SIZE) -> Iterator[DealBatch]:
+        """
+        Yield filtered chunks of the current snapshot in id order.
+        Filters are applied per chunk, so memory stays bounded by chunk_size.
+        Epoch bounds apply to the deal start epoch (inclusive).
+        """
+        deals = self._deals
+        for start in range(0, len(deals), chunk_size):
+            chunk = deals.take(slice(start, start + chunk_size))
+            mask = np.ones(len(chunk), dtype=bool)
+            if provider is not None:
+                mask &= chunk.providers == provider
+            if client is not None:
+                mask &= chunk.clients == client
+            if verified is not None:
+                mask &= chunk.verified == verified
+            if min_epoch is not None:
+                mask &= chunk.start_epochs >= min_epoch
+            if max_epoch is not None:
+                mask &= chunk.start_epochs <= max_epoch
+            if not mask.all():
+                chunk = chunk.take(mask)
+            if len(chunk):
+                yield chunk
+
+
+_DIGEST_MOD = 1 << 64
+
+
+def _id_digest(ids: np.ndarray) -> int:
+    """Order-independent hash of a set of ids: sum of splitmix64(id) mod 2**64"""
+    z = ids.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return int(z.sum(dtype=np.uint64))
+
+
+def _version(digest: int, count: int) -> int:
+    """Non-negative 63-bit store version for an id set (0 for the empty store)"""
+    return ((digest ^ (count * 0x9E3779B97F4A7C15)) % _DIGEST_MOD) >> 1
+
+
+def _merge_sorted(current: DealBatch, new: DealBatch) -> DealBatch:
+    """Insert sorted new deals (none already present) at their positions in a sorted batch, without re-sorting"""
+    positions = np.searchsorted(current.ids, new.ids)
+    return DealBatch.from_columns(current.network, **{
+        name: np.insert(getattr(current, name), positions, getattr(new, name)) for name in DealBatch.COLUMNS
+    })
+
+
+def _contains(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Membership test of ids against a sorted id array via binary search"""
+    if not len(sorted_ids):
+        return np.zeros(len(ids), dtype=bool)
+    pos = np.searchsorted(sorted_ids, ids)
+    pos[pos == len(sorted_ids)] = len(sorted_ids) - 1
+    return sorted_ids[pos] == ids
+
+
+# One store per API network (testnet routes are served from calibration)
+deal_stores = {
+    "mainnet": DealStore("mainnet"),
+    "testnet": DealStore("calibration"),
+}
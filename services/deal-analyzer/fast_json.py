@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Fast JSON Serialisation
+Opt-in response path that encodes trusted internal data (plain dicts built
+from DealBatch columns) with orjson, skipping pydantic validation and
+FastAPI's jsonable_encoder walk
+"""
+
+import json
+from typing import Any
+
+import numpy as np
+from fastapi.responses import Response
+
+from tracing import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Fallback encoder for NumPy scalars/arrays when orjson is unavailable"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content to JSON bytes using the fastest available encoder"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(Response):
+    """JSON response for data we produced ourselves; no validation, one encoding pass"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with span("serialise", "orjson"):
+            return dumps(content)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Storage Price Forecast
+Where deal_storage_cost_fil is heading, from the full daily-metrics
+history, in a few vectorised NumPy steps:
+
+- trend: Theil-Sen slope (median of pairwise slopes, robust to spikes) of
+  log price over the last FORECAST_TREND_DAYS days
+- level: exponentially weighted mean of the detrended log prices, anchored
+  at the latest day, so one noisy day doesn't move the forecast
+- bands: day-to-day noise (MAD of daily log changes) growing with sqrt(h),
+  plus the uncertainty of the trend itself growing with h
+
+The result answers "wait or buy now": the probability that the price in
+FORECAST_HORIZON_DAYS is lower than today's estimate, and the expected
+change. Forecasts are cached per parquet version, so only the first
+request after a new parquet fits the model.
+"""
+
+from collections import OrderedDict
+from statistics import NormalDist
+from threading import Lock
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from config import FORECAST_CONFIDENCE, FORECAST_HORIZON_DAYS, FORECAST_TREND_DAYS
+
+LEVEL_SMOOTHING = 0.2  # EWMA weight of the latest day (half-life ~3 days)
+MIN_HISTORY_DAYS = 14
+# Probability-of-lower thresholds for the wait / buy-now call
+WAIT_ABOVE, BUY_BELOW = 0.6, 0.4
+CACHE_SIZE = 8
+
+_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_cache_lock = Lock()  # routes call cached_forecast from worker threads
+
+
+def theil_sen(t: np.ndarray, y: np.ndarray) -> float:
+    """Median slope over all pairs of points with distinct t (0 when there are none)"""
+    i, j = np.triu_indices(len(t), k=1)
+    distinct = t[j] != t[i]
+    if not distinct.any():
+        return 0.0
+    i, j = i[distinct], j[distinct]
+    return float(np.median((y[j] - y[i]) / (t[j] - t[i])))
+
+
+def forecast_prices(dates: np.ndarray, prices: np.ndarray, horizon: int = FORECAST_HORIZON_DAYS,
+                    trend_days: int = FORECAST_TREND_DAYS, confidence: float = FORECAST_CONFIDENCE
+                    ) -> Optional[Dict[str, Any]]:
+    """Forecast of daily prices `horizon` days past the last date; None with too little history"""
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    prices = np.asarray(prices, dtype=np.float64)
+    valid = np.isfinite(prices) & (prices > 0)
+    dates, prices = dates[valid], prices[valid]
+    if len(prices) < MIN_HISTORY_DAYS:
+        return None
+
+    order = np.argsort(dates, kind="stable")
+    dates, y = dates[order], np.log(prices[order])
+    days = (dates - dates[-1]).astype(np.float64)  # 0 on the latest day
+    recent = days > -trend_days
+    slope = theil_sen(days[recent], y[recent])
+
+    # Level today: recency-weighted mean of prices projected to today along the trend
+    weights = (1 - LEVEL_SMOOTHING) ** -days[recent]
+    level = float(np.average(y[recent] - slope * days[recent], weights=weights))
+
+    steps = np.diff(y[recent]) - slope * np.diff(days[recent])
+    daily_sigma = max(float(1.4826 * np.median(np.abs(steps - np.median(steps)))), 1e-9) if len(steps) else 1e-9
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    h = np.arange(1, horizon + 1, dtype=np.float64)
+    center = level + slope * h
+    # Random-walk noise plus trend uncertainty (slope standard error ~ sigma / sqrt(window))
+    spread = z * daily_sigma * np.sqrt(h + h ** 2 / max(int(recent.sum()), 1))
+    path_dates = np.datetime_as_string(dates[-1] + h.astype("timedelta64[D]"), unit="D").tolist()
+    expected, lower, upper = np.exp(center).tolist(), np.exp(center - spread).tolist(), np.exp(center + spread).tolist()
+
+    # P(price at the horizon < today's level)
+    probability_lower = NormalDist().cdf(-slope * horizon / (daily_sigma * np.sqrt(horizon)))
+    if probability_lower >= WAIT_ABOVE:
+        decision, trend = "wait", "decreasing"
+    elif probability_lower <= BUY_BELOW:
+        decision, trend = "buy_now", "increasing"
+    else:
+        decision, trend = "neutral", "stable"
+
+    return {
+        "model": "theil_sen_log_trend",
+        "history_days": int(len(y)),
+        "trend_window_days": int(recent.sum()),
+        "as_of": str(dates[-1]),
+        "current_estimate": float(np.exp(level)),
+        "daily_change_percent": float(np.expm1(slope) * 100),
+        "horizon_days": horizon,
+        "expected_change_percent": float(np.expm1(slope * horizon) * 100),
+        "probability_lower_at_horizon": float(probability_lower),
+        "confidence": confidence,
+        "trend": trend,
+        "decision": decision,
+        "path": [
+            {"date": path_dates[k], "expected": expected[k], "lower": lower[k], "upper": upper[k]}
+            for k in range(horizon)
+        ],
+    }
+
+
+def cached_forecast(data_version: str, dates: np.ndarray, prices: np.ndarray,
+                    horizon: int = FORECAST_HORIZON_DAYS) -> Optional[Dict[str, Any]]:
+    """forecast_prices() computed once per (parquet version, horizon) in this process"""
+    key = (data_version, horizon)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    # Fitted outside the lock: concurrent misses for one key at worst fit it twice
+    result = forecast_prices(dates, prices, horizon)
+    with _cache_lock:
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def apply_forecast(pricing: Dict[str, Any], forecast: Dict[str, Any]):
+    """
+    Attach a forecast to an analysis' pricing section, taking price_trend
+    and price_change_percent (over the horizon) from it so they can't
+    disagree with the forecast or with each other
+    """
+    pricing["price_trend"] = forecast["trend"]
+    pricing["price_change_percent"] = forecast["expected_change_percent"]
+    pricing["forecast"] = forecast
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Conditional and Compressed JSON Responses
+Weak ETags derived from the underlying snapshot version (deal store
+version, parquet version), 304 answers to If-None-Match, and zstd/gzip
+compression of large bodies when the client negotiates it
+"""
+
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+import zstandard as zstd
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from config import COMPRESS_MIN_BYTES
+from fast_json import dumps
+from metrics import cache_counters
+from tracing import span
+
+# Preferred first when the client accepts several
+SUPPORTED_ENCODINGS = ("zstd", "gzip")
+
+_zstd_compressor = zstd.ZstdCompressor(level=3)
+
+# Conditional requests: hit = answered 304 from the client's copy
+_etag_hit, _etag_miss = cache_counters("http_etag")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick zstd or gzip from an Accept-Encoding header (q=0 means refused)"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token)
+    for encoding in SUPPORTED_ENCODINGS:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def compute_etag(request: Request, version: Any) -> str:
+    """
+    Weak ETag for (route, query, snapshot version). Bodies carry a
+    timestamp and epoch-dependent deal status, so two responses at one
+    version are equivalent rather than byte-identical, and one weak tag
+    covers every content-coding.
+    """
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}|{version}"
+    return 'W/"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so ignore W/ prefixes on both sides
+    return "*" in candidates or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+
+
+def not_modified(request: Request, version: Any) -> Optional[Response]:
+    """
+    304 when the client's If-None-Match matches the tag for `version`, so
+    routes can answer before doing any work for the body
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    etag = compute_etag(request, version)
+    if etag_matches(if_none_match, etag):
+        _etag_hit.inc()
+        return Response(status_code=304, headers={"Cache-Control": "no-cache", "Vary": "Accept-Encoding",
+                                                  "ETag": etag})
+    _etag_miss.inc()
+    return None
+
+
+def render_json(content: Any, fast: bool = False) -> bytes:
+    """Encode like JSONResponse (or the fast path) without building a response object"""
+    with span("serialise", "orjson" if fast else "json"):
+        if fast:
+            return dumps(content)
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                          indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    with span("compress", encoding, bytes=len(body)):
+        if encoding == "zstd":
+            return _zstd_compressor.compress(body)
+        return gzip.compress(body, compresslevel=6)
+
+
+def conditional_json_response(request: Request, content: Any, version: Any, fast: bool = False) -> Response:
+    """
+    JSON response validated by the snapshot version: 304 when the client's
+    If-None-Match still matches, otherwise the body, compressed if large
+    and the client accepts zstd or gzip
+    """
+    cached = not_modified(request, version)
+    if cached is not None:
+        return cached
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    headers: Dict[str, str] = {
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        "ETag": compute_etag(request, version),
+    }
+    body = render_json(content, fast=fast)
+    if encoding and len(body) >= COMPRESS_MIN_BYTES:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Live Deal Feed
+One ingestion loop per network polls Filfox, ingests into the deal store
+and fans new deals (and refreshed market insights) out to every subscriber.
+New deals are published from a deal store listener, so deals added by any
+ingest path (this poll, the deal and analysis routes, the cursor backfill,
+shared snapshot loads) reach subscribers, whichever thread ingested them.
+Each subscriber has a bounded queue that drops its oldest events when the
+consumer falls behind, so a slow dashboard never stalls the loop.
+"""
+
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from config import (LIVE_FEED_POLL_SECONDS, LIVE_FEED_INSIGHTS_SECONDS,
+                    LIVE_FEED_QUEUE_SIZE)
+from deal_batch import DealBatch
+from deal_store import DealStore
+from fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """Bounded per-client event queue with drop-oldest semantics"""
+
+    def __init__(self, maxsize: int = LIVE_FEED_QUEUE_SIZE):
+        self.queue: deque = deque(maxlen=maxsize)
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def push(self, event: Dict[str, Any]):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(event)
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within timeout"""
+        while not self.queue:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.queue.popleft()
+
+
+class DealFeed:
+    """
+    Single producer for a network's live events.
+
+    fetch_deals returns an aggregator-style result ({"deals": [...]} or
+    {"error": ...}); fetch_insights (optional) returns a market analysis
+    with a data_version, published only when that version changes.
+    """
+
+    def __init__(self, network: str, store: DealStore, fetch_deals: Callable[[], Dict[str, Any]],
+                 fetch_insights: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.network = network
+        self.store = store
+        self.fetch_deals = fetch_deals
+        self.fetch_insights = fetch_insights
+        self.subscribers: List[Subscriber] = []
+        self.last_insights: Optional[Dict[str, Any]] = None
+        self._event_ids = itertools.count(1)
+        self._tasks: List[asyncio.Task] = []
+        # Loop the subscribers wait on; ingests in worker threads hand events over to it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        store.listeners.append(self._on_ingest)
+
+    def subscribe(self) -> Subscriber:
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber()
+        self.subscribers.append(subscriber)
+        # New dashboards get the current insights straight away
+        if self.last_insights is not None:
+            subscriber.push(self.last_insights)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def publish(self, event_type: str, data: Any) -> Dict[str, Any]:
+        event = {"id": next(self._event_ids), "event": event_type, "data": data}
+        for subscriber in list(self.subscribers):
+            subscriber.push(event)
+        return event
+
+    def _on_ingest(self, new: DealBatch):
+        """DealStore listener: publish newly ingested deals (runs in the ingesting thread)"""
+        loop = self._loop
+        if loop is None or not self.subscribers or not len(new):
+            return
+        # Newest first, like the listing routes; converted here so the loop only queues the event
+        new = new.take(slice(None, None, -1))
+        data = {"network": self.store.network, "deals": new.to_records(), "analytics": new.analytics()}
+        try:
+            loop.call_soon_threadsafe(self.publish, "deals", data)
+        except RuntimeError:  # loop already closed (shutdown)
+            pass
+
+    def publish_insights(self, data: Dict[str, Any]):
+        self.last_insights = self.publish("insights", data)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._tasks.append(asyncio.create_task(self._poll_deals()))
+        if self.fetch_insights is not None:
+            self._tasks.append(asyncio.create_task(self._poll_insights()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _poll_deals(self):
+        while True:
+            try:
+                result = await asyncio.to_thread(self.fetch_deals)
+                if "error" in result:
+                    logger.warning(f"{self.network} live feed poll failed: {result['error']}")
+                else:
+                    await asyncio.to_thread(self.store.ingest, result.get("deals", []))
+            except Exception as e:
+                logger.error(f"{self.network} live feed error: {e}")
+            await asyncio.sleep(LIVE_FEED_POLL_SECONDS)
+
+    async def _poll_insights(self):
+        version = None
+        while True:
+            try:
+                result = await asyncio.to_thread(self.fetch_insights)
+                if "error" not in result and result.get("data_version") != version:
+                    version = result.get("data_version")
+                    self.publish_insights({
+                        "timestamp": result["timestamp"],
+                        "market_insights": result["market_insights"],
+                        "recommendations": result["recommendations"]
+                    })
+            except Exception as e:
+                logger.error(f"{self.network} insights feed error: {e}")
+            await asyncio.sleep(LIVE_FEED_INSIGHTS_SECONDS)
+
+
+def format_sse(event: Dict[str, Any], dropped: int = 0) -> bytes:
+    """Encode an event in text/event-stream framing"""
+    data = event["data"]
+    if dropped and isinstance(data, dict):
+        data = {**data, "dropped_events": dropped}
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event["id"], event["event"].encode(), dumps(data))
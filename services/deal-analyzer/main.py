@@ -4,20 +4,40 @@ Filecoin Deal Analyzer API Server
 Provides REST API endpoints for deal analysis and recommendations
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Dict, List, Optional, Any
-import uvicorn
 import logging
-from datetime import datetime, timezone
-import time
+import asyncio
+import hmac
+import threading
+from datetime import datetime
 
-# Import our aggregators
-from data_aggregator import FilecoinDealDataAggregator
-from testnet_aggregator import TestnetDealDataAggregator
-from unified_aggregator import UnifiedFilecoinAggregator
-from user_storage_advisor import FilecoinStorageAdvisor
+from deal_batch import DealBatch
+from fast_json import FastJSONResponse
+from deal_store import deal_stores
+from deal_backfill import BackfillError, DealBackfill
+from deal_export import EXPORT_ENCODERS, EXPORT_MEDIA_TYPES
+from price_series import RESOLUTIONS, candle_records, parse_time, price_series
+from placement import optimize_placement
+from simulator import simulate_storage_cost
+from pagination import InvalidCursor, decode_cursor, encode_cursor, next_cursor
+from http_cache import conditional_json_response, not_modified
+from live_feed import DealFeed, format_sse
+from workers import start_worker_pool, stop_worker_pool
+from snapshot_store import SnapshotSync, shared_snapshots
+from result_cache import result_cache
+from checkpoint import create_checkpointer
+from metrics import MetricsMiddleware, monitor_event_loop, render as render_metrics
+from tracing import TracingMiddleware
+from profiler import ProfilerBusy, allocation_diff, sample_stacks
+from watchdog import LoopWatchdog
+from admission import AdmissionMiddleware
+from config import (ADMIN_TOKEN, ADMISSION_ENABLED, DEAL_STORE_CHUNK_SIZE, LIVE_FEED_ENABLED,
+                    LIVE_FEED_KEEPALIVE_SECONDS, LIVE_FEED_POLL_SECONDS, LOOP_WATCHDOG_ENABLED, METRICS_ENABLED,
+                    PROFILE_MAX_SECONDS, RESULT_CACHE_TTLS, SIMULATION_MAX_DRAWS)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,6 +50,11 @@ app = FastAPI(
     version="2.0.0"
 )
 
+# Concurrency limits and 503 load shedding for expensive routes; innermost, so shed
+# responses still get CORS headers, traces and metrics
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -39,10 +64,102 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize aggregators
-mainnet_aggregator = FilecoinDealDataAggregator()
-testnet_aggregator = TestnetDealDataAggregator()
-storage_advisor = FilecoinStorageAdvisor()
+# Request traces (sampled, or on demand with ?debug_timing=1)
+app.add_middleware(TracingMiddleware)
+
+# Per-route latency / status / in-flight metrics, exported at /metrics
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Aggregators (and their modules) are built on first use, keeping startup cheap
+def _lazy(factory):
+    """Return a getter that builds factory() once, on first call"""
+    instance = []
+    lock = threading.Lock()
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+    return get
+
+def _build_mainnet_aggregator():
+    from data_aggregator import FilecoinDealDataAggregator
+    return FilecoinDealDataAggregator()
+
+def _build_testnet_aggregator():
+    from testnet_aggregator import TestnetDealDataAggregator
+    return TestnetDealDataAggregator()
+
+def _build_storage_advisor():
+    from user_storage_advisor import FilecoinStorageAdvisor
+    return FilecoinStorageAdvisor()
+
+mainnet_aggregator = _lazy(_build_mainnet_aggregator)
+testnet_aggregator = _lazy(_build_testnet_aggregator)
+storage_advisor = _lazy(_build_storage_advisor)
+
+# Live feeds: one ingestion loop per network shared by every subscriber
+live_feeds = {
+    "mainnet": DealFeed("mainnet", deal_stores["mainnet"],
+                        fetch_deals=lambda: mainnet_aggregator().get_recent_deals_from_filfox(limit=100),
+                        fetch_insights=lambda: storage_advisor().get_market_analysis(days=7)),
+    "testnet": DealFeed("testnet", deal_stores["testnet"],
+                        fetch_deals=lambda: testnet_aggregator().get_testnet_deals(limit=100)),
+}
+
+# Cursor pages older than the store reaches fetch older upstream pages into it
+deal_backfills = {
+    "mainnet": DealBackfill(deal_stores["mainnet"], lambda page, size: mainnet_aggregator().get_recent_deals_from_filfox(
+        limit=size, page=page)),
+    "testnet": DealBackfill(deal_stores["testnet"], lambda page, size: testnet_aggregator().get_testnet_deals(
+        limit=size, page=page)),
+}
+
+# Multi-worker mode: only the elected refresher polls upstream, the others follow its snapshots
+snapshot_sync = (SnapshotSync(shared_snapshots, deal_stores, live_feeds, run_feeds=LIVE_FEED_ENABLED)
+                 if shared_snapshots is not None else None)
+
+# Warm start: state restored from the last checkpoint before the first request is served
+checkpointer = create_checkpointer(deal_stores, result_cache, live_feeds)
+
+event_loop_monitor: Optional[asyncio.Task] = None
+loop_watchdog = LoopWatchdog() if LOOP_WATCHDOG_ENABLED else None
+
+@app.on_event("startup")
+async def start_background_services():
+    global event_loop_monitor
+    if METRICS_ENABLED:
+        event_loop_monitor = asyncio.create_task(monitor_event_loop())
+    if loop_watchdog is not None:
+        loop_watchdog.start()
+    if checkpointer is not None:
+        try:
+            await asyncio.to_thread(checkpointer.restore)
+        except Exception as e:
+            logger.error(f"Warm-start restore failed, starting cold: {e}")
+        checkpointer.start()
+    start_worker_pool()
+    if snapshot_sync is not None:
+        snapshot_sync.start()
+    elif LIVE_FEED_ENABLED:
+        for feed in live_feeds.values():
+            feed.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    if snapshot_sync is not None:
+        await snapshot_sync.stop()
+    for feed in live_feeds.values():
+        await feed.stop()
+    if checkpointer is not None:
+        await checkpointer.stop()
+    stop_worker_pool()
+    if event_loop_monitor is not None:
+        event_loop_monitor.cancel()
+    if loop_watchdog is not None:
+        loop_watchdog.stop()
 
 # Pydantic models for API responses
 class DealInfo(BaseModel):
@@ -52,9 +169,9 @@ class DealInfo(BaseModel):
     piece_size: int
     verified_deal: bool
     storage_price: Optional[str]
-    start_epoch: int
-    end_epoch: int
-    duration_days: float
+    start_epoch: Optional[int]
+    end_epoch: Optional[int]
+    duration_days: Optional[float]
 
 class MarketInsights(BaseModel):
     daily_new_deals: int
@@ -85,21 +202,9 @@ class AnalysisResponse(BaseModel):
     recommendations: List[Recommendation]
     deals: List[DealInfo]
 
-# Helper to convert Filecoin epoch to timestamp (approximate)
-EPOCH_DURATION_SECONDS = 30
-FILECOIN_GENESIS_TIMESTAMP = 1598306400  # Mainnet genesis (2020-08-25T06:00:00Z)
-
-def epoch_to_datetime(epoch: int) -> str:
-    ts = FILECOIN_GENESIS_TIMESTAMP + epoch * EPOCH_DURATION_SECONDS
-    return datetime.utcfromtimestamp(ts).replace(tzinfo=timezone.utc).isoformat()
-
-def get_deal_status(start_epoch: int, end_epoch: int, current_epoch: int) -> str:
-    if current_epoch < start_epoch:
-        return "Pending"
-    elif start_epoch <= current_epoch <= end_epoch:
-        return "Active"
-    else:
-        return "Expired"
+async def _cached_result(key: str, ttl: int, compute) -> Dict[str, Any]:
+    """Aggregator result through the L1/L2 result cache, computed off the event loop"""
+    return await asyncio.to_thread(result_cache.get_or_compute, key, compute, ttl)
 
 # API Routes
 
@@ -121,8 +226,14 @@ async def root():
                 "network_info": "/api/testnet/network",
                 "comprehensive": "/api/testnet/analysis"
             },
+            "export": "/api/{network}/deals/export",
+            "live_feed": "/api/{network}/deals/stream",
+            "price_candles": "/api/{network}/prices/candles",
+            "cost_simulation": "/api/{network}/simulate/storage-cost",
+            "replica_placement": "/api/{network}/placement",
             "user_advisor": "/api/advisor/market-analysis",
-            "health": "/api/health"
+            "health": "/api/health",
+            "metrics": "/metrics"
         }
     }
 
@@ -132,65 +243,137 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "service": "Filecoin Deal Analyzer API"
+        "service": "Filecoin Deal Analyzer API",
+        "warm_start": checkpointer.restore_report if checkpointer is not None else None
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # Mainnet Endpoints
 
+# Opt-in fast serialisation: plain dicts straight from DealBatch columns, encoded with orjson
+FAST_QUERY = Query(False, description="Skip pydantic validation and encode with the fast JSON path")
+
+CURSOR_QUERY = Query(None, description="Opaque cursor from a previous page's next_cursor")
+
+def _cursor_before_id(cursor: Optional[str], network: str) -> Optional[int]:
+    """Decode a page cursor, rejecting bad ones with 400 rather than 500"""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor, network)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _stored_deals_page(network: str, before_id: Optional[int], limit: int) -> Dict[str, Any]:
+    """
+    Page served from the deal store: the newest deals, or those below a
+    cursor, backfilling older upstream pages into the store as needed
+    """
+    if before_id is None:
+        batch, more = deal_stores[network].page_before(None, limit), True
+    else:
+        try:
+            batch, more = deal_backfills[network].page_before(before_id, limit)
+        except BackfillError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+    cursor = next_cursor(network, batch.ids, limit)
+    if cursor is None and more and before_id is not None:
+        # Short page because the backfill stopped at its per-request budget: carry on from here
+        cursor = encode_cursor(network, int(batch.ids.min()) if len(batch) else before_id)
+    return {
+        "network": batch.network,
+        "timestamp": datetime.now().isoformat(),
+        "total_deals": len(batch),
+        "deals": batch.to_records(),
+        "analytics": batch.analytics(),
+        "next_cursor": cursor
+    }
+
+def _upstream_deals_page(network: str, limit: int) -> Dict[str, Any]:
+    """First page fetched from Filfox and ingested into the deal store"""
+    if network == "mainnet":
+        result = mainnet_aggregator().get_recent_deals_from_filfox(limit=limit)
+    else:
+        result = testnet_aggregator().get_testnet_deals(limit=limit)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    deal_stores[network].ingest(result.get("deals", []))
+    batch = DealBatch(result.get("deals", []), network=result.get("network", network))
+    return {
+        "network": result.get("network", network),
+        "timestamp": result["timestamp"],
+        "total_deals": result["total_deals"],
+        "deals": batch.to_records(),
+        "analytics": result["analytics"],
+        "next_cursor": next_cursor(network, batch.ids, limit)
+    }
+
+def _analysis_deal_records(network: str, deals: List[Dict[str, Any]], batch_network: str) -> List[Dict[str, Any]]:
+    """Ingest an analysis result's deals and convert them for the response"""
+    deal_stores[network].ingest(deals)
+    return DealBatch(deals, network=batch_network).to_records(with_times=False)
+
+def _shared_store_is_live(network: str) -> bool:
+    """
+    In multi-worker mode the refresher's live feed keeps the store current,
+    so first pages are served from it instead of each worker calling Filfox
+    """
+    return (shared_snapshots is not None and LIVE_FEED_ENABLED and len(deal_stores[network]) > 0
+            and shared_snapshots.refresher_alive(2 * LIVE_FEED_POLL_SECONDS))
+
+def _deals_not_modified(request: Request, network: str, from_store: bool) -> Optional[Response]:
+    """
+    Answer If-None-Match from the store version before paging or calling
+    Filfox. First pages fetched from Filfox only qualify while the store
+    was checked against Filfox within the last live feed poll interval.
+    """
+    store = deal_stores[network]
+    if from_store or store.checked_within(LIVE_FEED_POLL_SECONDS):
+        return not_modified(request, store.version)
+    return None
+
 @app.get("/api/mainnet/deals")
-async def get_mainnet_deals(limit: int = Query(50, ge=1, le=100)):
-    """Get recent mainnet deals"""
+async def get_mainnet_deals(request: Request, limit: int = Query(50, ge=1, le=100),
+                            cursor: Optional[str] = CURSOR_QUERY, fast: bool = FAST_QUERY):
+    """Get recent mainnet deals (pass next_cursor back as cursor for older pages)"""
+    before_id = _cursor_before_id(cursor, "mainnet")
     try:
-        result = mainnet_aggregator.get_recent_deals_from_filfox(limit=limit)
-        if "error" in result:
-            raise HTTPException(status_code=500, detail=result["error"])
-        # Get current epoch (approximate)
-        now = int(time.time())
-        current_epoch = (now - FILECOIN_GENESIS_TIMESTAMP) // EPOCH_DURATION_SECONDS
-        deals = []
-        for deal in result.get("deals", []):
-            duration_epochs = deal['endEpoch'] - deal['startEpoch']
-            duration_days = duration_epochs * 30 / (24 * 60 * 60)
-            start_time = epoch_to_datetime(deal['startEpoch'])
-            end_time = epoch_to_datetime(deal['endEpoch'])
-            status = get_deal_status(deal['startEpoch'], deal['endEpoch'], current_epoch)
-            deals.append({
-                "id": deal['id'],
-                "provider": deal['provider'],
-                "client": deal['client'],
-                "piece_size": deal['pieceSize'],
-                "verified_deal": deal['verifiedDeal'],
-                "storage_price": deal.get('stroagePrice'),
-                "start_epoch": deal['startEpoch'],
-                "end_epoch": deal['endEpoch'],
-                "duration_days": duration_days,
-                "start_time": start_time,
-                "end_time": end_time,
-                "status": status
-            })
-        return {
-            "network": "mainnet",
-            "timestamp": result["timestamp"],
-            "total_deals": result["total_deals"],
-            "deals": deals,
-            "analytics": result["analytics"]
-        }
+        from_store = before_id is not None or _shared_store_is_live("mainnet")
+        cached = _deals_not_modified(request, "mainnet", from_store)
+        if cached is not None:
+            return cached
+        if from_store:
+            response = await asyncio.to_thread(_stored_deals_page, "mainnet", before_id, limit)
+            return conditional_json_response(request, response, deal_stores["mainnet"].version, fast=fast)
+
+        response = await asyncio.to_thread(_upstream_deals_page, "mainnet", limit)
+        return conditional_json_response(request, response, deal_stores["mainnet"].version, fast=fast)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching mainnet deals: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/mainnet/market")
-async def get_mainnet_market_analysis(days: int = Query(7, ge=1, le=30)):
+async def get_mainnet_market_analysis(request: Request, days: int = Query(7, ge=1, le=30)):
     """Get mainnet market analysis"""
     try:
-        result = mainnet_aggregator.get_historical_metrics_from_parquet(days=days)
+        result = await _cached_result(f"mainnet/market?days={days}", RESULT_CACHE_TTLS["market"],
+                                      lambda: mainnet_aggregator().get_historical_metrics_from_parquet(days=days))
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         
         insights = result["market_insights"]
         
-        return {
+        response = {
             "network": "mainnet",
             "timestamp": result["timestamp"],
             "analysis_period_days": result["analysis_period_days"],
@@ -201,18 +384,27 @@ async def get_mainnet_market_analysis(days: int = Query(7, ge=1, le=30)):
                 average_storage_price=insights["pricing"]["current_storage_cost"],
                 market_activity_level=insights["market_activity"]["market_activity_level"]
             ),
+            "price_forecast": insights["pricing"].get("forecast"),
             "recommendations": result["recommendations"]
         }
+        return conditional_json_response(request, response, result["data_version"])
         
     except Exception as e:
         logger.error(f"Error fetching mainnet market analysis: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _recommendation(rec: Any) -> Dict[str, Any]:
+    """The mainnet aggregator's insights give plain-string recommendations; wrap them as Recommendation fields"""
+    if isinstance(rec, str):
+        return {"category": "Network", "priority": "Medium", "message": rec, "action": ""}
+    return rec
+
 @app.get("/api/mainnet/analysis")
-async def get_mainnet_comprehensive_analysis():
+async def get_mainnet_comprehensive_analysis(fast: bool = FAST_QUERY):
     """Get comprehensive mainnet analysis"""
     try:
-        result = mainnet_aggregator.get_comprehensive_deal_analysis()
+        result = await _cached_result("mainnet/analysis", RESULT_CACHE_TTLS["analysis"],
+                                      mainnet_aggregator().get_comprehensive_deal_analysis)
         
         # Extract insights
         insights = result.get("insights", {})
@@ -221,43 +413,34 @@ async def get_mainnet_comprehensive_analysis():
         # Convert deals to response format
         deals = []
         if "filfox" in result["sources"] and "error" not in result["sources"]["filfox"]:
-            for deal in result["sources"]["filfox"].get("deals", []):
-                duration_epochs = deal['endEpoch'] - deal['startEpoch']
-                duration_days = duration_epochs * 30 / (24 * 60 * 60)
-                
-                deals.append(DealInfo(
-                    id=deal['id'],
-                    provider=deal['provider'],
-                    client=deal['client'],
-                    piece_size=deal['pieceSize'],
-                    verified_deal=deal['verifiedDeal'],
-                    storage_price=deal.get('stroagePrice'),
-                    start_epoch=deal['startEpoch'],
-                    end_epoch=deal['endEpoch'],
-                    duration_days=duration_days
-                ))
+            deals = await asyncio.to_thread(_analysis_deal_records, "mainnet",
+                                            result["sources"]["filfox"].get("deals", []), "mainnet")
         
-        return AnalysisResponse(
-            timestamp=result["timestamp"],
-            network="mainnet",
-            market_insights=MarketInsights(
-                daily_new_deals=market_health.get("daily_deal_activity", 0),
-                verified_deals_percentage=insights.get("trends", {}).get("recent_deals", {}).get("verified_deal_percentage", 0),
-                average_piece_size_gb=insights.get("trends", {}).get("recent_deals", {}).get("average_piece_size", 0),
-                average_storage_price=insights.get("trends", {}).get("recent_deals", {}).get("average_storage_price", 0),
-                market_activity_level="High" if market_health.get("daily_deal_activity", 0) > 50000 else "Moderate"
-            ),
-            network_health=NetworkHealth(
-                total_active_deals=market_health.get("total_active_deals", 0),
-                data_stored_pibs=0,  # Would need to extract from Dune data
-                network_utilization=market_health.get("network_utilization", 0),
-                fil_plus_adoption=market_health.get("fil_plus_adoption", 0),
-                active_providers=0,  # Would need to extract from Dune data
-                active_clients=0  # Would need to extract from Dune data
-            ) if market_health else None,
-            recommendations=[Recommendation(**rec) for rec in insights.get("recommendations", [])],
-            deals=deals
-        )
+        recent_deals = insights.get("trends", {}).get("recent_deals", {})
+        response = {
+            "timestamp": result["timestamp"],
+            "network": "mainnet",
+            "market_insights": {
+                "daily_new_deals": market_health.get("daily_deal_activity", 0),
+                "verified_deals_percentage": recent_deals.get("verified_deal_percentage", 0),
+                "average_piece_size_gb": recent_deals.get("average_piece_size", 0),
+                "average_storage_price": recent_deals.get("average_storage_price", 0),
+                "market_activity_level": "High" if market_health.get("daily_deal_activity", 0) > 50000 else "Moderate"
+            },
+            "network_health": {
+                "total_active_deals": market_health.get("total_active_deals", 0),
+                "data_stored_pibs": 0,  # Would need to extract from Dune data
+                "network_utilization": market_health.get("network_utilization", 0),
+                "fil_plus_adoption": market_health.get("fil_plus_adoption", 0),
+                "active_providers": 0,  # Would need to extract from Dune data
+                "active_clients": 0  # Would need to extract from Dune data
+            } if market_health else None,
+            "recommendations": [_recommendation(rec) for rec in insights.get("recommendations", [])],
+            "deals": deals
+        }
+        if fast:
+            return FastJSONResponse(response)
+        return AnalysisResponse(**response)
         
     except Exception as e:
         logger.error(f"Error fetching mainnet comprehensive analysis: {e}")
@@ -266,42 +449,23 @@ async def get_mainnet_comprehensive_analysis():
 # Testnet Endpoints
 
 @app.get("/api/testnet/deals")
-async def get_testnet_deals(limit: int = Query(50, ge=1, le=100)):
-    """Get recent testnet deals"""
+async def get_testnet_deals(request: Request, limit: int = Query(50, ge=1, le=100),
+                            cursor: Optional[str] = CURSOR_QUERY, fast: bool = FAST_QUERY):
+    """Get recent testnet deals (pass next_cursor back as cursor for older pages)"""
+    before_id = _cursor_before_id(cursor, "testnet")
     try:
-        result = testnet_aggregator.get_testnet_deals(limit=limit)
-        if "error" in result:
-            raise HTTPException(status_code=500, detail=result["error"])
-        now = int(time.time())
-        current_epoch = (now - FILECOIN_GENESIS_TIMESTAMP) // EPOCH_DURATION_SECONDS
-        deals = []
-        for deal in result.get("deals", []):
-            duration_epochs = deal['endEpoch'] - deal['startEpoch']
-            duration_days = duration_epochs * 30 / (24 * 60 * 60)
-            start_time = epoch_to_datetime(deal['startEpoch'])
-            end_time = epoch_to_datetime(deal['endEpoch'])
-            status = get_deal_status(deal['startEpoch'], deal['endEpoch'], current_epoch)
-            deals.append({
-                "id": deal['id'],
-                "provider": deal['provider'],
-                "client": deal['client'],
-                "piece_size": deal['pieceSize'],
-                "verified_deal": deal['verifiedDeal'],
-                "storage_price": deal.get('stroagePrice'),
-                "start_epoch": deal['startEpoch'],
-                "end_epoch": deal['endEpoch'],
-                "duration_days": duration_days,
-                "start_time": start_time,
-                "end_time": end_time,
-                "status": status
-            })
-        return {
-            "network": result["network"],
-            "timestamp": result["timestamp"],
-            "total_deals": result["total_deals"],
-            "deals": deals,
-            "analytics": result["analytics"]
-        }
+        from_store = before_id is not None or _shared_store_is_live("testnet")
+        cached = _deals_not_modified(request, "testnet", from_store)
+        if cached is not None:
+            return cached
+        if from_store:
+            response = await asyncio.to_thread(_stored_deals_page, "testnet", before_id, limit)
+            return conditional_json_response(request, response, deal_stores["testnet"].version, fast=fast)
+
+        response = await asyncio.to_thread(_upstream_deals_page, "testnet", limit)
+        return conditional_json_response(request, response, deal_stores["testnet"].version, fast=fast)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching testnet deals: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -310,7 +474,7 @@ async def get_testnet_deals(limit: int = Query(50, ge=1, le=100)):
 async def get_testnet_network_info():
     """Get testnet network information"""
     try:
-        result = testnet_aggregator.get_testnet_chain_info()
+        result = await asyncio.to_thread(testnet_aggregator().get_testnet_chain_info)
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
@@ -328,10 +492,11 @@ async def get_testnet_network_info():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/testnet/analysis")
-async def get_testnet_comprehensive_analysis():
+async def get_testnet_comprehensive_analysis(fast: bool = FAST_QUERY):
     """Get comprehensive testnet analysis"""
     try:
-        result = testnet_aggregator.get_comprehensive_testnet_analysis()
+        result = await _cached_result("testnet/analysis", RESULT_CACHE_TTLS["analysis"],
+                                      testnet_aggregator().get_comprehensive_testnet_analysis)
         
         # Extract insights
         insights = result.get("insights", {})
@@ -340,36 +505,26 @@ async def get_testnet_comprehensive_analysis():
         # Convert deals to response format
         deals = []
         if "deals" in result["sources"] and "error" not in result["sources"]["deals"]:
-            for deal in result["sources"]["deals"].get("deals", []):
-                duration_epochs = deal['endEpoch'] - deal['startEpoch']
-                duration_days = duration_epochs * 30 / (24 * 60 * 60)
-                
-                deals.append(DealInfo(
-                    id=deal['id'],
-                    provider=deal['provider'],
-                    client=deal['client'],
-                    piece_size=deal['pieceSize'],
-                    verified_deal=deal['verifiedDeal'],
-                    storage_price=deal.get('stroagePrice'),
-                    start_epoch=deal['startEpoch'],
-                    end_epoch=deal['endEpoch'],
-                    duration_days=duration_days
-                ))
+            deals = await asyncio.to_thread(_analysis_deal_records, "testnet",
+                                            result["sources"]["deals"].get("deals", []), result["network"])
         
-        return AnalysisResponse(
-            timestamp=result["timestamp"],
-            network=result["network"],
-            market_insights=MarketInsights(
-                daily_new_deals=deal_activity.get("total_deals", 0),
-                verified_deals_percentage=deal_activity.get("verified_deals_percentage", 0),
-                average_piece_size_gb=deal_activity.get("average_piece_size_gb", 0),
-                average_storage_price=deal_activity.get("average_storage_price", 0),
-                market_activity_level="High" if deal_activity.get("total_deals", 0) > 20 else "Moderate"
-            ),
-            network_health=None,  # Testnet doesn't have comprehensive network health data
-            recommendations=[Recommendation(**rec) for rec in insights.get("recommendations", [])],
-            deals=deals
-        )
+        response = {
+            "timestamp": result["timestamp"],
+            "network": result["network"],
+            "market_insights": {
+                "daily_new_deals": deal_activity.get("total_deals", 0),
+                "verified_deals_percentage": deal_activity.get("verified_deals_percentage", 0),
+                "average_piece_size_gb": deal_activity.get("average_piece_size_gb", 0),
+                "average_storage_price": deal_activity.get("average_storage_price", 0),
+                "market_activity_level": "High" if deal_activity.get("total_deals", 0) > 20 else "Moderate"
+            },
+            "network_health": None,  # Testnet doesn't have comprehensive network health data
+            "recommendations": insights.get("recommendations", []),
+            "deals": deals
+        }
+        if fast:
+            return FastJSONResponse(response)
+        return AnalysisResponse(**response)
         
     except Exception as e:
         logger.error(f"Error fetching testnet comprehensive analysis: {e}")
@@ -378,17 +533,18 @@ async def get_testnet_comprehensive_analysis():
 # User Advisor Endpoints
 
 @app.get("/api/advisor/market-analysis")
-async def get_user_market_analysis(days: int = Query(7, ge=1, le=30)):
+async def get_user_market_analysis(request: Request, days: int = Query(7, ge=1, le=30)):
     """Get user-focused market analysis and recommendations"""
     try:
-        result = storage_advisor.get_market_analysis(days=days)
+        result = await _cached_result(f"advisor/market-analysis?days={days}", RESULT_CACHE_TTLS["advisor"],
+                                      lambda: storage_advisor().get_market_analysis(days=days))
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         
         insights = result["market_insights"]
         
-        return {
+        response = {
             "timestamp": result["timestamp"],
             "analysis_period_days": result["analysis_period_days"],
             "market_insights": MarketInsights(
@@ -398,13 +554,164 @@ async def get_user_market_analysis(days: int = Query(7, ge=1, le=30)):
                 average_storage_price=insights["pricing"]["current_storage_cost"],
                 market_activity_level=insights["market_activity"]["market_activity_level"]
             ),
+            "price_forecast": insights["pricing"].get("forecast"),
             "recommendations": result["recommendations"]
         }
+        return conditional_json_response(request, response, result["data_version"])
         
     except Exception as e:
         logger.error(f"Error fetching user market analysis: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Bulk Export Endpoints
+
+@app.get("/api/{network}/deals/export")
+async def export_deals(
+    network: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow)$"),
+    provider: Optional[str] = Query(None, description="Only deals with this provider id"),
+    client: Optional[str] = Query(None, description="Only deals with this client id"),
+    verified: Optional[bool] = Query(None, description="Only verified (true) or regular (false) deals"),
+    min_epoch: Optional[int] = Query(None, description="Minimum deal start epoch (inclusive)"),
+    max_epoch: Optional[int] = Query(None, description="Maximum deal start epoch (inclusive)"),
+    chunk_size: int = Query(DEAL_STORE_CHUNK_SIZE, ge=100, le=100000)
+):
+    """Stream every stored deal matching the filters as NDJSON, CSV or Arrow IPC"""
+    if network not in deal_stores:
+        raise HTTPException(status_code=400, detail="Network must be 'mainnet' or 'testnet'")
+    
+    chunks = deal_stores[network].scan(
+        provider=provider,
+        client=client,
+        verified=verified,
+        min_epoch=min_epoch,
+        max_epoch=max_epoch,
+        chunk_size=chunk_size
+    )
+    extension = "arrows" if format == "arrow" else format
+    return StreamingResponse(
+        EXPORT_ENCODERS[format](chunks),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{network}-deals.{extension}"'}
+    )
+
+# Live Feed Endpoints
+
+@app.get("/api/{network}/deals/stream")
+async def stream_deals(network: str, request: Request):
+    """Server-Sent Events stream of newly ingested deals and refreshed market insights"""
+    if network not in live_feeds:
+        raise HTTPException(status_code=400, detail="Network must be 'mainnet' or 'testnet'")
+    
+    feed = live_feeds[network]
+    subscriber = feed.subscribe()
+    
+    async def events():
+        reported_drops = 0
+        try:
+            yield b"retry: 5000\n\n"
+            while not await request.is_disconnected():
+                event = await subscriber.get(timeout=LIVE_FEED_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield b": keepalive\n\n"
+                    continue
+                yield format_sse(event, dropped=subscriber.dropped - reported_drops)
+                reported_drops = subscriber.dropped
+        finally:
+            feed.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Price History Endpoints
+
+@app.get("/api/{network}/prices/candles")
+async def get_price_candles(
+    request: Request,
+    network: str,
+    resolution: str = Query("day", pattern="^(hour|day|week)$"),
+    verified: Optional[bool] = Query(None, description="Only verified (true) or regular (false) deals; both if unset"),
+    start: Optional[str] = Query(None, description="ISO-8601 date/time or unix seconds (inclusive)"),
+    end: Optional[str] = Query(None, description="ISO-8601 date/time or unix seconds (exclusive)"),
+    limit: int = Query(1000, ge=1, le=100000, description="Latest candles in the range"),
+    fast: bool = FAST_QUERY
+):
+    """OHLC and volume candles of price per GiB per epoch (attoFIL) from every ingested deal"""
+    if network not in price_series:
+        raise HTTPException(status_code=400, detail="Network must be 'mainnet' or 'testnet'")
+    try:
+        start_ts, end_ts = parse_time(start), parse_time(end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid start/end: {e}")
+
+    series = price_series[network]
+    candles = series.candles(resolution, verified, start_ts, end_ts, limit)
+    response = {
+        "network": network,
+        "resolution": resolution,
+        "bucket_seconds": RESOLUTIONS[resolution],
+        "verified": verified,
+        "unit": "attoFIL per GiB per epoch",
+        "candles": candle_records(candles)
+    }
+    return conditional_json_response(request, response, series.version, fast=fast)
+
+# Cost Simulation Endpoints
+
+@app.get("/api/{network}/simulate/storage-cost")
+async def simulate_cost(
+    network: str,
+    size_tib: float = Query(..., gt=0, le=1_000_000, description="Data size in TiB"),
+    days: int = Query(365, ge=1, le=3650, description="Storage duration in days"),
+    replicas: int = Query(1, ge=1, le=20, description="Copies, each with a different provider"),
+    trials: int = Query(100_000, ge=1_000, le=1_000_000),
+    verified: Optional[bool] = Query(None, description="Sample verified (true) or regular (false) deals only"),
+    lookback_days: int = Query(90, ge=0, le=3650, description="Only sample deals starting this recently (0: all)"),
+    seed: Optional[int] = Query(None, description="Fix for reproducible results")
+):
+    """Monte Carlo total cost (FIL percentiles) sampled from provider prices in the deal store"""
+    if network not in deal_stores:
+        raise HTTPException(status_code=400, detail="Network must be 'mainnet' or 'testnet'")
+    if trials * replicas > SIMULATION_MAX_DRAWS:
+        raise HTTPException(status_code=400, detail=f"trials x replicas must be at most {SIMULATION_MAX_DRAWS:,}")
+    result = await asyncio.to_thread(simulate_storage_cost, deal_stores[network].snapshot(), size_tib, days,
+                                     replicas, trials, verified, lookback_days, seed)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+# Replica Placement Endpoints
+
+@app.get("/api/{network}/placement")
+async def get_replica_placement(
+    network: str,
+    replicas: int = Query(3, ge=1, le=20, description="Number of providers to pick, one replica each"),
+    size_tib: float = Query(1, gt=0, le=1_000_000, description="Data size in TiB"),
+    days: int = Query(365, ge=1, le=3650, description="Storage duration in days"),
+    verified: Optional[bool] = Query(None, description="Price from verified (true) or regular (false) deals only"),
+    lookback_days: int = Query(90, ge=0, le=3650, description="Only use deals starting this recently (0: all)"),
+    min_deals: int = Query(1, ge=1, description="Minimum recent deals per provider"),
+    max_client_overlap: float = Query(1.0, ge=0, le=1, description="Max Jaccard overlap of two picks' client sets"),
+    min_reputation: Optional[float] = Query(None, ge=0, le=100,
+                                            description="Minimum provider reputation score (inert: scores are a "
+                                                        "constant 50 until real ones exist)"),
+    min_durability: Optional[float] = Query(None, gt=0, lt=1,
+                                            description="Target P(at least one replica survives), from reputation "
+                                                        "(inert, like min_reputation)")
+):
+    """Cheapest set of providers for N replicas under diversity (and opt-in reputation) constraints"""
+    if network not in deal_stores:
+        raise HTTPException(status_code=400, detail="Network must be 'mainnet' or 'testnet'")
+    result = await asyncio.to_thread(optimize_placement, deal_stores[network].snapshot(), replicas, size_tib, days,
+                                     verified, lookback_days, min_deals, max_client_overlap, min_reputation,
+                                     min_durability)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
 # Unified Endpoints
 
 @app.get("/api/unified/{network}/analysis")
@@ -414,8 +721,10 @@ async def get_unified_analysis(network: str):
         raise HTTPException(status_code=400, detail="Network must be 'mainnet' or 'testnet'")
     
     try:
-        aggregator = UnifiedFilecoinAggregator(network)
-        result = aggregator.get_comprehensive_analysis()
+        from unified_aggregator import get_unified_aggregator
+        
+        result = await _cached_result(f"unified/{network}/analysis", RESULT_CACHE_TTLS["unified"],
+                                      get_unified_aggregator(network).get_comprehensive_analysis)
         
         return {
             "network": network,
@@ -428,5 +737,53 @@ async def get_unified_analysis(network: str):
         logger.error(f"Error fetching unified analysis for {network}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Admin Endpoints
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Bearer ADMIN_TOKEN; the admin routes don't exist when no token is configured"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = (authorization or "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/api/admin/profile", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def profile_process(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    hz: int = Query(100, ge=1, le=1000),
+    include_idle: bool = Query(False, description="Keep threads parked in selector/queue waits"),
+    lines: bool = Query(True, description="Split frames by line number")
+):
+    """Sample every thread's stack for `seconds`; collapsed stacks for flamegraph.pl / speedscope"""
+    try:
+        collapsed, samples = await asyncio.to_thread(sample_stacks, seconds, hz, include_idle, lines)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(collapsed, headers={
+        "Content-Disposition": f'attachment; filename="deal-analyzer-{int(datetime.now().timestamp())}.collapsed"',
+        "X-Profile-Samples": str(samples)
+    })
+
+@app.get("/api/admin/allocations", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def allocation_snapshot(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    top: int = Query(30, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    frames: int = Query(10, ge=1, le=50, description="Stack depth kept when group_by=traceback")
+):
+    """tracemalloc growth over a `seconds` window, largest allocation sites first"""
+    try:
+        return await asyncio.to_thread(allocation_diff, seconds, top, group_by, frames)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/api/admin/blocking", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def blocking_calls():
+    """Event-loop stalls caught by the watchdog: counts per call site and the latest stacks"""
+    if loop_watchdog is None:
+        raise HTTPException(status_code=404, detail="Event-loop watchdog is disabled")
+    return loop_watchdog.report()
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
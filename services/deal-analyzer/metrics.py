@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Prometheus Metrics
+Served at /metrics:
+- HTTP request latency and status per route, and requests in flight
+- upstream latency, outcome and bytes downloaded per source (see upstream.py)
+- parse time per source and format (JSON pages, parquet decoding)
+- hit / miss counts per cache (hit ratio = hits / (hits + misses))
+- event-loop lag, sampled by a timer task
+- event-loop stalls over the watchdog threshold, per blocking call site (see watchdog.py)
+- admission control per expensive route: running, queued, queue wait and shed requests (see admission.py)
+
+Labels are bounded: routes are the matched route templates, never raw
+paths. Recording is a few microseconds per request (pre-bound children,
+pure ASGI middleware), well under 1% of a request's CPU.
+
+Parse samples taken in CPU worker processes are buffered there and
+replayed here with the result (see workers.py). With uvicorn --workers,
+set PROMETHEUS_MULTIPROC_DIR so /metrics aggregates every worker.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest)
+
+from config import EVENT_LOOP_LAG_INTERVAL_SECONDS
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PARSE_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+REQUEST_SECONDS = Histogram("deal_analyzer_http_request_duration_seconds",
+                            "HTTP request latency by route template", ["route", "method"],
+                            buckets=LATENCY_BUCKETS)
+REQUESTS = Counter("deal_analyzer_http_requests", "HTTP requests by route template and status",
+                   ["route", "method", "status"])
+IN_FLIGHT = Gauge("deal_analyzer_http_requests_in_flight", "HTTP requests being served",
+                  multiprocess_mode="livesum")
+
+UPSTREAM_SECONDS = Histogram("deal_analyzer_upstream_request_duration_seconds",
+                             "Upstream request latency including the body download", ["source"],
+                             buckets=LATENCY_BUCKETS)
+UPSTREAM_REQUESTS = Counter("deal_analyzer_upstream_requests",
+                            "Upstream requests by outcome (2xx/4xx/5xx/error)", ["source", "outcome"])
+UPSTREAM_BYTES = Counter("deal_analyzer_upstream_bytes", "Response bytes downloaded from upstream", ["source"])
+
+PARSE_SECONDS = Histogram("deal_analyzer_parse_duration_seconds", "Time decoding upstream payloads",
+                          ["source", "format"], buckets=PARSE_BUCKETS)
+
+CACHE_REQUESTS = Counter("deal_analyzer_cache_requests", "Cache lookups by cache and result (hit/miss)",
+                         ["cache", "result"])
+
+EVENT_LOOP_LAG = Histogram("deal_analyzer_event_loop_lag_seconds",
+                           "How late the event loop ran a timer scheduled every "
+                           f"{EVENT_LOOP_LAG_INTERVAL_SECONDS}s", buckets=LAG_BUCKETS)
+LOOP_BLOCKS = Counter("deal_analyzer_event_loop_blocks", "Event-loop stalls over the watchdog threshold",
+                      ["site"])
+LOOP_BLOCKED_SECONDS = Histogram("deal_analyzer_event_loop_blocked_seconds",
+                                 "Duration of event-loop stalls over the watchdog threshold", buckets=LAG_BUCKETS)
+
+ADMISSION_ACTIVE = Gauge("deal_analyzer_admission_active", "Admitted requests running, per limited route",
+                         ["route"], multiprocess_mode="livesum")
+ADMISSION_QUEUED = Gauge("deal_analyzer_admission_queue_depth", "Requests waiting for admission, per limited route",
+                         ["route"], multiprocess_mode="livesum")
+ADMISSION_WAIT_SECONDS = Histogram("deal_analyzer_admission_wait_seconds", "Time queued before admission",
+                                   ["route"], buckets=LATENCY_BUCKETS)
+ADMISSION_SHED = Counter("deal_analyzer_admission_shed", "Requests rejected with 503 (queue_full/queue_timeout)",
+                         ["route", "reason"])
+
+
+def cache_counters(cache: str) -> Tuple[Counter, Counter]:
+    """(hit, miss) counters for one cache, bound once so lookups stay cheap"""
+    return CACHE_REQUESTS.labels(cache, "hit"), CACHE_REQUESTS.labels(cache, "miss")
+
+
+def record_upstream(source: str, outcome: str, seconds: float, size: int):
+    UPSTREAM_SECONDS.labels(source).observe(seconds)
+    UPSTREAM_REQUESTS.labels(source, outcome).inc()
+    if size:
+        UPSTREAM_BYTES.labels(source).inc(size)
+
+
+# Set in CPU worker processes, whose own registry is never scraped
+_worker_samples: Optional[List[Tuple[str, str, float]]] = None
+
+
+def observe_parse(source: str, fmt: str, seconds: float):
+    if _worker_samples is not None:
+        _worker_samples.append((source, fmt, seconds))
+    else:
+        PARSE_SECONDS.labels(source, fmt).observe(seconds)
+
+
+@contextmanager
+def parse_timer(source: str, fmt: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_parse(source, fmt, time.perf_counter() - start)
+
+
+def buffer_worker_samples():
+    """Called in each CPU worker: keep samples for drain_worker_samples()"""
+    global _worker_samples
+    _worker_samples = []
+
+
+def drain_worker_samples() -> List[Tuple[str, str, float]]:
+    global _worker_samples
+    samples, _worker_samples = _worker_samples or [], []
+    return samples
+
+
+def replay_worker_samples(samples: List[Tuple[str, str, float]]):
+    for source, fmt, seconds in samples:
+        PARSE_SECONDS.labels(source, fmt).observe(seconds)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: latency, status and in-flight count per route template"""
+
+    def __init__(self, app):
+        self.app = app
+        # (route, method) -> (latency child, {status: counter child}); labels() costs more than the sample
+        self._series: Dict[Tuple[str, str], Tuple[Any, Dict[int, Any]]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            # Set by the router once matched; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            latency, counts = self._route_series(route, scope["method"])
+            latency.observe(elapsed)
+            counter = counts.get(status)
+            if counter is None:
+                counter = counts[status] = REQUESTS.labels(route, scope["method"], str(status))
+            counter.inc()
+
+    def _route_series(self, route: str, method: str):
+        series = self._series.get((route, method))
+        if series is None:
+            series = self._series[(route, method)] = (REQUEST_SECONDS.labels(route, method), {})
+        return series
+
+
+async def monitor_event_loop(interval: float = EVENT_LOOP_LAG_INTERVAL_SECONDS):
+    """Record how late a periodic timer fires; anything blocking the loop shows up as lag"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+
+def render() -> Tuple[bytes, str]:
+    """Exposition-format body and content type for /metrics"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Opaque Keyset Cursors
+Cursors for the deal listing routes encode the network and the last deal id
+returned; the next page is answered by DealStore.page_before() as an index
+range on the id-sorted store, never by another upstream call.
+"""
+
+import base64
+import json
+from typing import Optional
+
+CURSOR_VERSION = 1
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor is malformed or belongs to another network"""
+
+
+def encode_cursor(network: str, last_id: int) -> str:
+    payload = json.dumps({"v": CURSOR_VERSION, "n": network, "id": int(last_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, network: str) -> int:
+    """Return the deal id the next page starts below"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload["v"] != CURSOR_VERSION or payload["n"] != network:
+            raise InvalidCursor("Cursor does not belong to this route")
+        return int(payload["id"])
+    except InvalidCursor:
+        raise
+    except Exception as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+
+
+def next_cursor(network: str, page_ids, limit: int) -> Optional[str]:
+    """Cursor after a newest-first page, or None when the page was the last one"""
+    if len(page_ids) < limit or not len(page_ids):
+        return None
+    return encode_cursor(network, min(page_ids))
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Replica Placement
+Picks N storage providers for N replicas, minimising the expected total
+cost under diversity constraints, from the deal store:
+
+- expected cost of a replica: the provider's mean recent price per GiB
+  per epoch x size x duration
+- evidence: providers with fewer than min_deals recent deals are excluded
+- diversity: replicas go to distinct providers whose client sets overlap
+  (Jaccard) by at most max_client_overlap, since providers that serve the
+  same clients are often one operator or one data-prep pipeline
+
+Reliability is opt-in and inert for now: min_reputation / min_durability
+read the ReputationScorer score (0-100) as the probability that a replica
+survives the term, but the scorer returns a constant 50 until real scores
+exist (the Filfox deal list carries no slashing or early-termination
+data). Both are off (None) by default.
+
+- reliability: providers below min_reputation are excluded
+- durability target: P(at least one replica survives) >= min_durability
+
+Greedy over candidates sorted by cost (more recent deals first on ties):
+each step takes the cheapest provider that conflicts with no earlier
+pick and, with min_durability, carries at least its share of the
+remaining durability need (-log(1 - r) summed over picks), falling back
+to the most reliable allowed provider. Each step costs O(candidates + that provider's client pairs), so
+thousands of providers are placed in milliseconds. The cost of the N
+cheapest eligible providers is reported alongside as a lower bound.
+"""
+
+import math
+import time
+from threading import Lock
+from typing import Any, Dict, Optional
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from config import EPOCH_DURATION_SECONDS
+from deal_batch import SECONDS_PER_DAY, DealBatch, factorize
+from reputation import ReputationScorer
+from simulator import ATTO, GIB_PER_TIB, PriceSample, price_sample
+
+MAX_RELIABILITY = 1 - 1e-9  # keeps -log(1 - r) finite for a perfect score
+
+
+class ClientPairs:
+    """Distinct (provider, client) pairs of a PriceSample, indexed by provider and by client"""
+
+    def __init__(self, deals: DealBatch, sample: PriceSample):
+        clients, client_codes = factorize(deals.clients[sample.rows])
+        self.n_providers, self.n_clients = len(sample.providers), len(clients)
+        # Sort + adjacent compare: np.unique is far slower on large int arrays
+        keys = np.sort(sample.codes * self.n_clients + client_codes)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        providers, pair_clients = np.divmod(keys, self.n_clients)
+        self.clients = pair_clients
+        self.starts = np.searchsorted(providers, np.arange(self.n_providers + 1))
+        self.counts = np.diff(self.starts)
+        by_client = np.argsort(pair_clients, kind="stable")
+        self.client_providers = providers[by_client]
+        self.client_starts = np.searchsorted(pair_clients[by_client], np.arange(self.n_clients + 1))
+
+    def overlap(self, provider: int) -> np.ndarray:
+        """Jaccard overlap of every provider's client set with `provider`'s"""
+        served = self.clients[self.starts[provider]:self.starts[provider + 1]]
+        # Providers of each served client, gathered from the by-client index
+        lengths = self.client_starts[served + 1] - self.client_starts[served]
+        offsets = np.repeat(self.client_starts[served] - np.cumsum(lengths) + lengths, lengths)
+        sharing = self.client_providers[offsets + np.arange(int(lengths.sum()))]
+        shared = np.bincount(sharing, minlength=self.n_providers)
+        union = self.counts + self.counts[provider] - shared
+        return np.divide(shared, union, out=np.zeros(self.n_providers), where=union > 0)
+
+
+# Built on first use per price sample, so it lives as long as the snapshot's sample
+_pairs: "WeakKeyDictionary[PriceSample, ClientPairs]" = WeakKeyDictionary()
+_pairs_lock = Lock()
+
+
+def client_pairs(deals: DealBatch, sample: PriceSample) -> ClientPairs:
+    with _pairs_lock:
+        if sample not in _pairs:
+            _pairs[sample] = ClientPairs(deals, sample)
+        return _pairs[sample]
+
+
+def optimize_placement(deals: DealBatch, replicas: int, size_tib: float, days: int,
+                       verified: Optional[bool] = None, lookback_days: int = 90, min_deals: int = 1,
+                       max_client_overlap: float = 1.0, min_reputation: Optional[float] = None,
+                       min_durability: Optional[float] = None,
+                       scorer: Optional[ReputationScorer] = None) -> Dict[str, Any]:
+    """Cheapest set of `replicas` providers meeting the constraints (greedy)"""
+    started = time.perf_counter()
+    scored = min_reputation is not None or min_durability is not None
+    sample = price_sample(deals, verified, lookback_days)
+    if not len(sample):
+        return {"error": "No matching deals in the store to choose providers from"}
+
+    providers, counts = sample.providers, sample.counts
+    mean_price = np.add.reduceat(sample.prices, sample.starts) / counts
+    epochs = days * SECONDS_PER_DAY / EPOCH_DURATION_SECONDS
+    cost = mean_price * (size_tib * GIB_PER_TIB) * epochs * ATTO
+
+    eligible = counts >= min_deals
+    if scored:
+        scorer = scorer or ReputationScorer()
+        reputation = np.fromiter((scorer.get_score(p) for p in providers.tolist()), dtype=np.float64,
+                                 count=len(providers))
+        weight = -np.log1p(-np.clip(reputation / 100, 0, MAX_RELIABILITY))  # durability of one replica
+        if min_reputation is not None:
+            eligible &= reputation >= min_reputation
+    if eligible.sum() < replicas:
+        return {"error": f"Only {int(eligible.sum())} providers meet min_deals/min_reputation, "
+                         f"{replicas} replicas requested"}
+
+    pairs = client_pairs(deals, sample)
+    order = np.lexsort((-counts, cost))  # cheapest first, more recent deals on ties
+    allowed = eligible.copy()
+    need = -math.log1p(-min_durability) if min_durability else 0.0
+    chosen, overlaps = [], []
+    for step in range(replicas):
+        candidates = order[allowed[order]]
+        if not len(candidates):
+            break
+        pick = int(candidates[0])
+        if need:
+            share = max(need - weight[chosen].sum(), 0.0) / (replicas - step)
+            carrying = candidates[weight[candidates] >= share - 1e-12]
+            pick = int(carrying[0]) if len(carrying) else int(candidates[np.argmax(weight[candidates])])
+        chosen.append(pick)
+        allowed[pick] = False
+        if step + 1 < replicas:
+            overlap = pairs.overlap(pick)
+            allowed &= overlap <= max_client_overlap
+            overlaps.append(overlap)
+
+    if len(chosen) < replicas:
+        return {"error": f"Only {len(chosen)} of {replicas} replicas can be placed under max_client_overlap="
+                         f"{max_client_overlap}"}
+
+    chosen = np.array(chosen)
+    # Largest pairwise overlap among the picks (each earlier pick's row covers the later ones)
+    worst_overlap = max((float(row[chosen[i + 1:]].max()) for i, row in enumerate(overlaps)), default=None)
+    result = {
+        "network": deals.network,
+        "replicas": replicas,
+        "size_tib": size_tib,
+        "days": days,
+        "verified": verified,
+        "lookback_days": lookback_days,
+        "constraints": {
+            "min_deals": min_deals,
+            "max_client_overlap": max_client_overlap,
+            "min_reputation": min_reputation,
+            "min_durability": min_durability,
+        },
+        "candidates": {"providers": int(len(providers)), "eligible": int(eligible.sum())},
+        "placement": [
+            {
+                "provider": providers[i],
+                "expected_cost_fil": float(cost[i]),
+                "price_per_gib_epoch": float(mean_price[i]),
+                "recent_deals": int(counts[i]),
+                "clients": int(pairs.counts[i]),
+            }
+            for i in chosen.tolist()
+        ],
+        "expected_cost_fil": float(cost[chosen].sum()),
+        # N cheapest eligible providers, ignoring diversity
+        "lower_bound_cost_fil": float(np.sort(cost[eligible])[:replicas].sum()),
+        "max_pairwise_client_overlap": worst_overlap,
+    }
+    if scored:
+        for entry, i in zip(result["placement"], chosen.tolist()):
+            entry["reputation"] = float(reputation[i])
+        durability = float(-np.expm1(-weight[chosen].sum()))
+        result["durability"] = durability
+        result["meets_durability"] = None if min_durability is None else durability >= min_durability
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Price Time Series
+OHLC and volume candles of deal prices, per network, kept up to date as
+deals are ingested into the deal stores (ingest, snapshot sync and
+warm-start restore all feed it).
+
+- price: storage price per GiB per epoch (attoFIL), i.e. the deal's price
+  per epoch divided by its piece size in GiB
+- time: the deal's start epoch
+- resolutions: hour, day and week (weeks start Monday 00:00 UTC)
+- series: verified deals, regular deals and all deals
+
+Volume (deals, GiB) counts every deal; open/high/low/close only cover
+priced deals (most verified deals are free), so a candle without any
+priced deal has no OHLC values.
+
+Each table is a set of NumPy columns sorted by bucket. New deals are
+reduced to hourly candles, rolled up to days and weeks, and merged into
+the buckets they touch, so an ingest costs O(new deals + touched buckets)
+and a query is a binary search plus a slice.
+"""
+
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from deal_batch import GIB, MISSING_EPOCH, DealBatch, format_iso_timestamps
+from deal_store import deal_stores
+
+RESOLUTIONS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+# 1970-01-01 was a Thursday; shifting by 3 days aligns week buckets to Mondays
+BUCKET_OFFSETS = {"hour": 0, "day": 0, "week": 3 * 86400}
+SERIES = (None, True, False)  # all deals, verified, regular
+
+# Order of deals within a candle: start epoch, then deal id, packed into one int64
+ID_BITS = 34
+NO_FIRST, NO_LAST = np.iinfo(np.int64).max, -1
+# first_key/last_key locate each candle's open and close when merging (NO_FIRST/NO_LAST without priced deals)
+COLUMNS = ("bucket", "first_key", "last_key", "open", "high", "low", "close", "deals", "priced_deals", "gib")
+INT_COLUMNS = ("bucket", "first_key", "last_key", "deals", "priced_deals")
+
+
+def bucket_start(timestamps: np.ndarray, resolution: str) -> np.ndarray:
+    size, offset = RESOLUTIONS[resolution], BUCKET_OFFSETS[resolution]
+    return (np.asarray(timestamps, dtype=np.int64) + offset) // size * size - offset
+
+
+def _empty() -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype=np.int64 if name in INT_COLUMNS else np.float64) for name in COLUMNS}
+
+
+def _take(table: Dict[str, np.ndarray], index: Any) -> Dict[str, np.ndarray]:
+    return {name: column[index] for name, column in table.items()}
+
+
+def _concat(tables: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    return {name: np.concatenate([t[name] for t in tables]) for name in COLUMNS}
+
+
+def _combine(rows: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Merge candle rows that share a bucket into one candle per bucket (sorted by bucket)"""
+    if not len(rows["bucket"]):
+        return _empty()
+    by_open = _take(rows, np.lexsort((rows["first_key"], rows["bucket"])))
+    buckets, starts = np.unique(by_open["bucket"], return_index=True)
+    ends = np.append(starts[1:], len(by_open["bucket"])) - 1
+    by_close = np.lexsort((rows["last_key"], rows["bucket"]))
+    return {
+        "bucket": buckets,
+        "first_key": np.minimum.reduceat(by_open["first_key"], starts),
+        "last_key": np.maximum.reduceat(by_open["last_key"], starts),
+        "open": by_open["open"][starts],
+        "high": np.fmax.reduceat(by_open["high"], starts),
+        "low": np.fmin.reduceat(by_open["low"], starts),
+        "close": rows["close"][by_close][ends],
+        "deals": np.add.reduceat(by_open["deals"], starts),
+        "priced_deals": np.add.reduceat(by_open["priced_deals"], starts),
+        "gib": np.add.reduceat(by_open["gib"], starts),
+    }
+
+
+def deal_candles(batch: DealBatch) -> Dict[str, np.ndarray]:
+    """One single-deal candle per deal, bucketed by the hour"""
+    gib = batch.piece_sizes / GIB
+    per_gib = batch.price_per_gib_epoch()
+    priced = per_gib > 0
+    per_gib[~priced] = np.nan
+    order = (batch.start_epochs << ID_BITS) | batch.ids
+    return {
+        "bucket": bucket_start(batch.start_timestamps(), "hour"),
+        "first_key": np.where(priced, order, NO_FIRST),
+        "last_key": np.where(priced, order, NO_LAST),
+        "open": per_gib, "high": per_gib, "low": per_gib, "close": per_gib,
+        "deals": np.ones(len(batch), dtype=np.int64),
+        "priced_deals": priced.astype(np.int64),
+        "gib": gib,
+    }
+
+
+def _merge(table: Dict[str, np.ndarray], partial: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Fold new candles into a table, recombining only the buckets they touch"""
+    if not len(partial["bucket"]):
+        return table
+    existing = table["bucket"]
+    pos = np.minimum(np.searchsorted(existing, partial["bucket"]), max(len(existing) - 1, 0))
+    touched = pos[existing[pos] == partial["bucket"]] if len(existing) else pos[:0]
+    keep = np.ones(len(existing), dtype=bool)
+    keep[touched] = False
+    merged = _combine(_concat([_take(table, touched), partial]))
+    result = _concat([_take(table, keep), merged])
+    return _take(result, np.argsort(result["bucket"], kind="stable"))
+
+
+class PriceSeries:
+    """Hourly / daily / weekly price candles for one network"""
+
+    def __init__(self, network: str):
+        self.network = network
+        self.version = 0
+        self._tables = {(resolution, verified): _empty() for resolution in RESOLUTIONS for verified in SERIES}
+        self._lock = Lock()
+
+    def record(self, batch: DealBatch):
+        """Add newly ingested deals (DealStore listener)"""
+        batch = batch.take(batch.start_epochs != MISSING_EPOCH)  # no time to bucket by
+        if not len(batch):
+            return
+        singles = deal_candles(batch)
+        with self._lock:
+            for verified in SERIES:
+                rows = singles if verified is None else _take(singles, batch.verified == verified)
+                partial = _combine(rows)
+                for resolution in RESOLUTIONS:
+                    if resolution != "hour":
+                        partial = _combine({**partial, "bucket": bucket_start(partial["bucket"], resolution)})
+                    key = (resolution, verified)
+                    self._tables[key] = _merge(self._tables[key], partial)
+            self.version += 1
+
+    def candles(self, resolution: str, verified: Optional[bool] = None, start: Optional[float] = None,
+                end: Optional[float] = None, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Candle columns with bucket start in [start, end) (unix seconds), the latest `limit` if given"""
+        table = self._tables[(resolution, verified)]
+        buckets = table["bucket"]
+        lo = 0 if start is None else int(np.searchsorted(buckets, bucket_start(start, resolution), side="left"))
+        hi = len(buckets) if end is None else int(np.searchsorted(buckets, end, side="left"))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        return _take(table, slice(lo, hi))
+
+
+def candle_records(candles: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """JSON-ready candles (OHLC is null for buckets without priced deals)"""
+    times = format_iso_timestamps(candles["bucket"]).tolist()
+    ohlc = {name: np.where(np.isnan(candles[name]), None, candles[name]).tolist()
+            for name in ("open", "high", "low", "close")}
+    deals, priced, gib = candles["deals"].tolist(), candles["priced_deals"].tolist(), candles["gib"].tolist()
+    return [
+        {"time": times[i], "open": ohlc["open"][i], "high": ohlc["high"][i], "low": ohlc["low"][i],
+         "close": ohlc["close"][i], "deals": deals[i], "priced_deals": priced[i], "volume_gib": gib[i]}
+        for i in range(len(times))
+    ]
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """ISO-8601 date/time (UTC unless an offset is given) or unix seconds"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+# One series per API network, fed by the matching deal store
+price_series = {network: PriceSeries(store.network) for network, store in deal_stores.items()}
+for _network, _series in price_series.items():
+    deal_stores[_network].listeners.append(_series.record)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+On-Demand Profiling
+Time-boxed diagnostics of the live process, for the admin endpoints:
+
+- sample_stacks(): wall-clock sampling profiler. A background thread
+  reads every thread's Python stack (sys._current_frames) at `hz` and
+  returns collapsed stacks ("thread;outer;...;inner count" per line), the
+  input format of flamegraph.pl, speedscope and inferno. Threads parked in
+  the usual idle spots (selector, queue/condition waits) are dropped
+  unless include_idle is set; a handler blocked in time.sleep or a socket
+  read stays visible at its calling line.
+- allocation_diff(): tracemalloc snapshots at the start and end of a
+  window, returning the allocation sites that grew the most.
+
+Only this process is sampled (not the CPU worker pool), and one profile
+runs at a time.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profile or allocation snapshot is already running"""
+
+
+_busy = threading.Lock()
+
+# (file basename, function) of the Python frame a thread sits in while waiting for work
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("connection.py", "wait"),
+    ("socketserver.py", "serve_forever"),
+}
+
+
+def _frame_label(frame, lines: bool) -> str:
+    code = frame.f_code
+    if lines:
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})"
+
+
+def sample_stacks(seconds: float, hz: int = 100, include_idle: bool = False, lines: bool = True) -> Tuple[str, int]:
+    """Collapsed stacks for `seconds` of sampling and the number of samples taken"""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        me = threading.get_ident()
+        counts: Counter = Counter()
+        interval = 1.0 / hz
+        samples = 0
+        names: Dict[int, str] = {}
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            if samples % hz == 0:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if not include_idle and (os.path.basename(frame.f_code.co_filename),
+                                         frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame, lines))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}").replace(";", ":").replace(" ", "_"))
+                counts[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval)
+        collapsed = "\n".join(f"{stack} {count}" for stack, count in counts.most_common())
+        return collapsed + "\n" if collapsed else "", samples
+    finally:
+        _busy.release()
+
+
+def allocation_diff(seconds: float, top: int = 30, group_by: str = "lineno", frames: int = 10) -> Dict[str, Any]:
+    """Allocation sites with the largest growth over a window of `seconds`"""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    started = not tracemalloc.is_tracing()
+    try:
+        if started:
+            tracemalloc.start(frames if group_by == "traceback" else 1)
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+        _busy.release()
+
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), group_by)
+    return {
+        "window_seconds": seconds,
+        "group_by": group_by,
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "top": [_stat(stat) for stat in stats[:top]],
+    }
+
+
+def _stat(stat) -> Dict[str, Any]:
+    frames: List[str] = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+    return {
+        "location": frames[-1] if frames else "?",
+        "traceback": frames,
+        "size_diff_bytes": stat.size_diff,
+        "size_bytes": stat.size,
+        "count_diff": stat.count_diff,
+        "count": stat.count,
+    }
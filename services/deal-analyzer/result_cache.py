@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Two-Tier Result Cache
+In-process L1 (SimpleCache) in front of a shared Redis L2 holding
+zstd-compressed JSON snapshots of analyzer results, keyed by route and
+params. Replicas and freshly restarted pods read each other's results from
+L2 instead of recomputing them.
+
+Recomputation is stampede-safe: per key, one thread per process and one
+process across replicas (SET NX lock in Redis) computes while the others
+wait for the value to land in L2. The lock holder renews the lock while it
+computes, so slow computations keep it and a crashed holder's lock lapses.
+
+L1 entries are capped at RESULT_CACHE_L1_TTL only when there is an L2 to
+keep replicas close to; without one they live for the full result TTL.
+
+REDIS_URL selects L2: a redis:// URL, "local" for the in-process stand-in
+(tests, development), or empty for L1 only.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import zstandard as zstd
+
+from cache import SimpleCache
+from config import (REDIS_URL, RESULT_CACHE_L1_TTL, RESULT_CACHE_LOCK_SECONDS,
+                    RESULT_CACHE_WAIT_SECONDS)
+from fast_json import dumps, loads
+from metrics import cache_counters
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "deal-analyzer:v1:"
+
+_l1_hit, _l1_miss = cache_counters("result_l1")
+_l2_hit, _l2_miss = cache_counters("result_l2")
+
+# Compare-and-act on the lock in one step, so a lock that expired and was retaken by another
+# replica between our GET and DEL / PEXPIRE is never dropped or extended
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end
+return 0
+"""
+_RENEW_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end
+return 0
+"""
+
+_compressor = zstd.ZstdCompressor(level=3)
+_decompressor = zstd.ZstdDecompressor()
+
+
+class LocalRedis:
+    """Minimal thread-safe stand-in for the redis-py calls this module makes"""
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and time.time() >= entry[1]:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def set(self, key: str, value: Any, ex: Optional[float] = None, px: Optional[int] = None,
+            nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+            self._data[key] = (value if isinstance(value, bytes) else str(value).encode(),
+                               time.time() + ttl if ttl is not None else None)
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def expire(self, key: str, seconds: float) -> bool:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return False
+            self._data[key] = (entry[0], time.time() + seconds)
+            return True
+
+    def ping(self) -> bool:
+        return True
+
+
+def connect_l2(url: str = REDIS_URL):
+    """Redis client for url, the local stand-in for "local", or None"""
+    if not url:
+        return None
+    if url == "local":
+        return LocalRedis()
+    try:
+        import redis
+    except ImportError:
+        logger.warning("REDIS_URL is set but the redis package is not installed; using L1 only")
+        return None
+    return redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+
+
+class TieredCache:
+    """L1 SimpleCache + optional Redis L2 with a stampede-safe get_or_compute"""
+
+    def __init__(self, l2=None, l1_ttl: int = RESULT_CACHE_L1_TTL, lock_seconds: float = RESULT_CACHE_LOCK_SECONDS,
+                 wait_seconds: float = RESULT_CACHE_WAIT_SECONDS):
+        self.l1 = SimpleCache(ttl=l1_ttl)
+        self.l1_ttl = l1_ttl
+        self.l2 = l2
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+        # Logical expiry of each result set here (L1 copies may expire much sooner)
+        self._expires: Dict[str, float] = {}
+        self._expires_lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._key_locks_guard = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._get(key, count=True)
+
+    def _get(self, key: str, count: bool = False) -> Optional[Any]:
+        value = self.l1.get(key)
+        if count:
+            (_l1_miss if value is None else _l1_hit).inc()
+        if value is not None:
+            return value
+        value = self._l2_get(key)
+        if count and self.l2 is not None:
+            (_l2_miss if value is None else _l2_hit).inc()
+        if value is not None:
+            self.l1.set(key, value)
+        return value
+
+    def _l1_entry_ttl(self, ttl: int) -> int:
+        """Short L1 lifetime only when L2 holds the value for the full ttl"""
+        return min(ttl, self.l1_ttl) if self.l2 is not None else ttl
+
+    def set(self, key: str, value: Any, ttl: int):
+        self._set(key, value, ttl)
+
+    def _set(self, key: str, value: Any, ttl: float, l2_nx: bool = False):
+        with self._expires_lock:
+            self._expires[key] = time.time() + ttl
+        self.l1.set(key, value, ttl=self._l1_entry_ttl(ttl))
+        if self.l2 is not None:
+            try:
+                self.l2.set(KEY_PREFIX + key, _compressor.compress(dumps(value)), ex=max(1, int(ttl)), nx=l2_nx)
+            except Exception as e:
+                logger.warning(f"Result cache L2 write failed for {key}: {e}")
+
+    def entries(self) -> List[Tuple[str, Any, float]]:
+        """
+        Live (key, value, expires) triples at each result's full TTL, e.g.
+        for checkpointing; values L1 has already dropped are read from L2
+        """
+        now = time.time()
+        with self._expires_lock:
+            self._expires = {key: expires for key, expires in self._expires.items() if expires > now}
+            expiry = dict(self._expires)
+        in_l1 = {key: value for key, value, _ in self.l1.entries()}
+        triples = []
+        for key, expires in expiry.items():
+            value = in_l1[key] if key in in_l1 else self._l2_get(key)
+            if value is not None:
+                triples.append((key, value, expires))
+        return triples
+
+    def restore(self, entries) -> int:
+        """
+        Reload entries() triples with their remaining TTL; L2 is only filled
+        where it has no value, since another replica's may be newer.
+        Returns how many were still live.
+        """
+        now = time.time()
+        restored = 0
+        for key, value, expires in entries:
+            if expires > now:
+                self._set(key, value, expires - now, l2_nx=True)
+                restored += 1
+        return restored
+
+    def invalidate(self, key: str):
+        with self._expires_lock:
+            self._expires.pop(key, None)
+        self.l1.invalidate(key)
+        if self.l2 is not None:
+            try:
+                self.l2.delete(KEY_PREFIX + key)
+            except Exception as e:
+                logger.warning(f"Result cache L2 delete failed for {key}: {e}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: int) -> Any:
+        """
+        Cached value for key, computing it at most once at a time per key
+        across threads and replicas. Error results ({"error": ...}) are
+        returned but never cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._key_lock(key):
+            # Another thread may have filled it while we waited (already counted as a miss)
+            value = self._get(key)
+            if value is not None:
+                return value
+
+            token = self._acquire_l2_lock(key)
+            if token is None:
+                value = self._wait_for_l2(key)
+                if value is not None:
+                    self.l1.set(key, value, ttl=self._l1_entry_ttl(ttl))
+                    return value
+                logger.warning(f"Timed out waiting for {key} from another replica; computing locally")
+            renewing = self._renew_l2_lock(key, token)
+            try:
+                with span("compute", key):
+                    value = compute()
+                if not (isinstance(value, dict) and "error" in value):
+                    self.set(key, value, ttl)
+                return value
+            finally:
+                if renewing is not None:
+                    renewing.set()
+                self._release_l2_lock(key, token)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._key_locks_guard:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _l2_get(self, key: str) -> Optional[Any]:
+        if self.l2 is None:
+            return None
+        try:
+            raw = self.l2.get(KEY_PREFIX + key)
+            if raw is None:
+                return None
+            with span("decompress", "result_l2", bytes=len(raw)):
+                return loads(_decompressor.decompress(raw))
+        except Exception as e:
+            logger.warning(f"Result cache L2 read failed for {key}: {e}")
+            return None
+
+    def _acquire_l2_lock(self, key: str) -> Optional[str]:
+        """Lock token, "" when there is no L2 to coordinate with, None if another replica holds it"""
+        if self.l2 is None:
+            return ""
+        token = uuid.uuid4().hex
+        try:
+            if self.l2.set(f"{KEY_PREFIX}lock:{key}", token, nx=True, ex=self.lock_seconds):
+                return token
+            return None
+        except Exception as e:
+            logger.warning(f"Result cache lock failed for {key}: {e}")
+            return ""
+
+    def _renew_l2_lock(self, key: str, token: Optional[str]) -> Optional[threading.Event]:
+        """Extend our lock every third of its expiry until the returned event is set"""
+        if not token or self.l2 is None:
+            return None
+        lock_key = f"{KEY_PREFIX}lock:{key}"
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.lock_seconds / 3):
+                try:
+                    if not self._if_lock_held(lock_key, token, "renew"):
+                        return  # lost it (e.g. Redis restarted); the value still lands in L2
+                except Exception as e:
+                    logger.warning(f"Result cache lock renewal failed for {key}: {e}")
+
+        threading.Thread(target=renew, name=f"result-cache-lock:{key}", daemon=True).start()
+        return done
+
+    def _release_l2_lock(self, key: str, token: Optional[str]):
+        if not token or self.l2 is None:
+            return
+        lock_key = f"{KEY_PREFIX}lock:{key}"
+        try:
+            # Only drop the lock if it is still ours (it may have expired and been retaken)
+            self._if_lock_held(lock_key, token, "release")
+        except Exception as e:
+            logger.warning(f"Result cache unlock failed for {key}: {e}")
+
+    def _if_lock_held(self, lock_key: str, token: str, action: str) -> bool:
+        """Renew or release the lock if `token` still holds it; False if it doesn't"""
+        if isinstance(self.l2, LocalRedis):
+            # The in-process stand-in has no EVAL (and no other process to race with)
+            held = self.l2.get(lock_key)
+            if held is None or held.decode() != token:
+                return False
+            if action == "renew":
+                return self.l2.expire(lock_key, self.lock_seconds)
+            return bool(self.l2.delete(lock_key))
+        if action == "renew":
+            return bool(self.l2.eval(_RENEW_LOCK, 1, lock_key, token, int(self.lock_seconds * 1000)))
+        return bool(self.l2.eval(_RELEASE_LOCK, 1, lock_key, token))
+
+    def _wait_for_l2(self, key: str) -> Optional[Any]:
+        deadline = time.time() + self.wait_seconds
+        delay = 0.05
+        while time.time() < deadline:
+            value = self._l2_get(key)
+            if value is not None:
+                return value
+            try:
+                if self.l2.get(f"{KEY_PREFIX}lock:{key}") is None:
+                    return self._l2_get(key)  # holder finished (or failed) without a value
+            except Exception:
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+        return None
+
+
+result_cache = TieredCache(connect_l2())
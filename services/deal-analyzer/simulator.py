@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Storage Cost Simulator
+Monte Carlo estimate of what storing X TiB for Y days with R replicas
+costs, sampled from the deals in a deal store:
+
+- each replica goes to a provider drawn in proportion to its recent deal
+  count (market share); replicas of one trial use distinct providers
+  whenever enough providers are in the sample
+- its price per GiB per epoch is one of that provider's recent deal
+  prices, so per-provider pricing and the spread between providers both
+  carry into the result
+- cost = sum over replicas of price x size x epochs (deal prices are
+  fixed for the deal's lifetime)
+
+Trials run as a handful of array operations per chunk of CHUNK_DRAWS
+replica draws, so working memory stays bounded whatever the trial count;
+100k trials with three replicas take a few milliseconds. Requests are
+capped at SIMULATION_MAX_DRAWS trials x replicas.
+"""
+
+import time
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from config import EPOCH_DURATION_SECONDS, SIMULATION_MAX_DRAWS
+from deal_batch import SECONDS_PER_DAY, DealBatch, current_epoch, factorize
+
+ATTO = 1e-18
+GIB_PER_TIB = 1024
+PERCENTILES = (5, 25, 50, 75, 95)
+# Rounds of re-drawing providers that already hold a replica in the same trial
+DISTINCT_REDRAWS = 8
+# Replica draws simulated at once (a few MB of working arrays)
+CHUNK_DRAWS = 1 << 18
+
+
+class PriceSample:
+    """Sampled deals' prices grouped by provider: provider p owns prices[starts[p]:starts[p] + counts[p]] (same for rows)"""
+
+    def __init__(self, deals: DealBatch, verified: Optional[bool], lookback_days: int):
+        prices = deals.price_per_gib_epoch()
+        usable = np.isfinite(prices)
+        if lookback_days:
+            since = current_epoch(deals.network) - lookback_days * SECONDS_PER_DAY // EPOCH_DURATION_SECONDS
+            usable &= deals.start_epochs >= since
+        if verified is not None:
+            usable &= deals.verified == verified
+
+        self.providers, codes = factorize(deals.providers[usable])
+        order = np.argsort(codes, kind="stable")
+        self.rows = np.flatnonzero(usable)[order]
+        self.prices = prices[self.rows]
+        self.codes = codes[order]
+        self.counts = np.bincount(codes, minlength=len(self.providers))
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1])).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+
+# Parsing prices and grouping providers dominates for large stores; a snapshot is reused until the next ingest
+_samples: "WeakKeyDictionary[DealBatch, Dict[tuple, PriceSample]]" = WeakKeyDictionary()
+_samples_lock = Lock()
+
+
+def price_sample(deals: DealBatch, verified: Optional[bool], lookback_days: int) -> PriceSample:
+    with _samples_lock:
+        per_batch = _samples.setdefault(deals, {})
+        key = (verified, lookback_days)
+        if key not in per_batch:
+            per_batch[key] = PriceSample(deals, verified, lookback_days)
+        return per_batch[key]
+
+
+def simulate_storage_cost(deals: DealBatch, size_tib: float, days: int, replicas: int = 1,
+                          trials: int = 100_000, verified: Optional[bool] = None, lookback_days: int = 90,
+                          seed: Optional[int] = None) -> Dict[str, Any]:
+    """Cost percentiles (FIL) over `trials` simulated placements"""
+    started = time.perf_counter()
+    if trials * replicas > SIMULATION_MAX_DRAWS:
+        return {"error": f"trials x replicas must be at most {SIMULATION_MAX_DRAWS:,}"}
+    sample = price_sample(deals, verified, lookback_days)
+    if not len(sample):
+        return {"error": "No matching deals in the store to sample prices from"}
+
+    rng = np.random.default_rng(seed)
+    want_distinct = len(sample.providers) >= replicas
+    distinct = want_distinct
+    totals = np.empty(trials)
+    chunk = max(1, CHUNK_DRAWS // replicas)
+    for start in range(0, trials, chunk):
+        stop = min(start + chunk, trials)
+        totals[start:stop], chunk_distinct = _simulate_prices(sample, rng, stop - start, replicas, want_distinct)
+        distinct &= chunk_distinct
+    epochs = days * SECONDS_PER_DAY / EPOCH_DURATION_SECONDS
+    totals *= (size_tib * GIB_PER_TIB) * epochs * ATTO
+
+    quantiles = np.percentile(totals, PERCENTILES)
+    return {
+        "network": deals.network,
+        "size_tib": size_tib,
+        "days": days,
+        "replicas": replicas,
+        "trials": trials,
+        "verified": verified,
+        "lookback_days": lookback_days,
+        "sample": {
+            "deals": int(len(sample)),
+            "providers": int(len(sample.providers)),
+            "distinct_replica_providers": bool(distinct),
+        },
+        "cost_fil": {
+            "mean": float(totals.mean()),
+            **{f"p{p}": float(q) for p, q in zip(PERCENTILES, quantiles)},
+            "max": float(totals.max()),
+        },
+        "probability_free": float((totals == 0).mean()),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def _simulate_prices(sample: PriceSample, rng: np.random.Generator, trials: int, replicas: int,
+                     want_distinct: bool) -> Tuple[np.ndarray, bool]:
+    """Summed price per GiB per epoch of each trial's replicas, and whether all trials used distinct providers"""
+    n = len(sample)
+    # A uniformly drawn deal's provider is a draw weighted by market share
+    chosen = sample.codes[rng.integers(0, n, size=(trials, replicas))]
+    distinct = want_distinct
+    if want_distinct and replicas > 1:
+        for _ in range(DISTINCT_REDRAWS):
+            clash = _duplicate_mask(chosen)
+            if not clash.any():
+                break
+            chosen[clash] = sample.codes[rng.integers(0, n, size=int(clash.sum()))]
+        distinct = not _duplicate_mask(chosen).any()
+
+    picks = sample.starts[chosen] + (rng.random((trials, replicas)) * sample.counts[chosen]).astype(np.int64)
+    return sample.prices[picks].sum(axis=1), distinct
+
+
+def _duplicate_mask(chosen: np.ndarray) -> np.ndarray:
+    """True where a replica's provider already appears in an earlier column of the same trial"""
+    clash = np.zeros(chosen.shape, dtype=bool)
+    for j in range(1, chosen.shape[1]):
+        clash[:, j] = (chosen[:, :j] == chosen[:, j:j + 1]).any(axis=1)
+    return clash
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Shared Snapshot Store
+Lets several uvicorn workers share one set of upstream fetches. A directory
+on local disk (SHARED_SNAPSHOT_DIR) holds:
+
+- deals-<network>.arrow: the deal store as an Arrow IPC file, written by the
+  single refresher worker and memory-mapped by every other worker
+- <name>.blob: raw upstream payloads (the daily-metrics parquet, live feed
+  insights) fetched by whichever worker finds them stale first, with a
+  per-file lock so concurrent workers wait for that fetch instead of
+  repeating it
+
+The refresher is elected with an exclusive lock on refresher.lock; when its
+process dies the lock is released and the next worker to try takes over.
+Files are replaced atomically (write to a temp file, then os.replace), so a
+reader always maps a complete snapshot.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from config import SHARED_SNAPSHOT_DIR, SHARED_SNAPSHOT_SYNC_SECONDS
+from deal_batch import DealBatch
+from deal_store import DealStore
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single worker, no cross-process locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_NUMERIC_COLUMNS = ("ids", "piece_sizes", "verified", "start_epochs", "end_epochs")
+
+
+class SharedSnapshots:
+    """Snapshot directory shared by every worker process on a host"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.is_refresher = False
+        self._refresher_fd: Optional[int] = None
+        self._published: Dict[str, Any] = {}
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        # Last batch loaded per key: its string columns are reused for ids the next snapshot still holds
+        self._loaded: Dict[str, DealBatch] = {}
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # Refresher election
+
+    def try_become_refresher(self) -> bool:
+        """Take the refresher lock if no other live worker holds it"""
+        if self.is_refresher:
+            return True
+        if fcntl is None:
+            self.is_refresher = True
+            return True
+        fd = os.open(self.path("refresher.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._refresher_fd = fd
+        self.is_refresher = True
+        return True
+
+    def release_refresher(self):
+        if self._refresher_fd is not None:
+            os.close(self._refresher_fd)  # closing drops the flock
+            self._refresher_fd = None
+        self.is_refresher = False
+
+    def heartbeat(self):
+        """Refresher liveness marker (followers check its age)"""
+        with open(self.path("refresher.heartbeat"), "w") as f:
+            f.write(str(time.time()))
+
+    def refresher_alive(self, max_age: float) -> bool:
+        try:
+            return time.time() - os.stat(self.path("refresher.heartbeat")).st_mtime < max_age
+        except FileNotFoundError:
+            return False
+
+    # Deal store snapshots
+
+    def publish_store(self, key: str, store: DealStore) -> bool:
+        """Write the store as an Arrow IPC file if its version changed since the last publish"""
+        import pyarrow as pa
+
+        batch, version, updated_at = store.snapshot(), store.version, store.updated_at
+        evicted_below = store.evicted_below
+        if self._published.get(key) == version:
+            return False
+        columns = {name: getattr(batch, name) for name in _NUMERIC_COLUMNS}
+        for name in ("providers", "clients", "storage_prices"):
+            columns[name] = pa.array(getattr(batch, name).tolist(), type=pa.string())
+        table = pa.table(
+            columns,
+            metadata={"network": batch.network, "version": str(version), "updated_at": str(updated_at or ""),
+                      "evicted_below": "" if evicted_below is None else str(evicted_below)}
+        )
+        with self._atomic_write(f"deals-{key}.arrow") as tmp:
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        self._published[key] = version
+        return True
+
+    def load_store(self, key: str) -> Optional[Tuple[DealBatch, Optional[float], Optional[int]]]:
+        """
+        Map the published store if it changed since the last call; returns
+        the arguments for DealStore.replace (deals, updated_at, evicted_below).
+        Numeric columns stay zero-copy views of the mapped file; string
+        columns are object arrays, materialised only for ids the previous
+        load didn't have (usually just the newest deals) and reused for the
+        rest.
+        """
+        import pyarrow as pa
+
+        name = f"deals-{key}.arrow"
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        marker = (stat.st_ino, stat.st_mtime_ns)
+        if self._seen.get(name) == marker:
+            return None
+
+        source = pa.memory_map(self.path(name), "r")
+        table = pa.ipc.open_file(source).read_all()
+        metadata = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+        columns = {name: _column_to_numpy(table.column(name)) for name in _NUMERIC_COLUMNS}
+        ids = columns["ids"]
+        previous = self._loaded.get(key)
+        if previous is not None and len(previous):
+            at = np.minimum(np.searchsorted(previous.ids, ids), len(previous) - 1)
+            known = previous.ids[at] == ids
+        else:
+            at, known = np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=bool)
+        missing = np.flatnonzero(~known)
+        for col in ("providers", "clients", "storage_prices"):
+            values = np.empty(len(ids), dtype=object)
+            if previous is not None:
+                values[known] = getattr(previous, col)[at[known]]
+            if len(missing):
+                values[missing] = table.column(col).take(pa.array(missing)).to_pylist()
+            columns[col] = values
+        batch = DealBatch.from_columns(metadata["network"], **columns)
+
+        self._loaded[key] = batch
+        self._seen[name] = marker
+        updated_at = float(metadata["updated_at"]) if metadata.get("updated_at") else None
+        evicted_below = int(metadata["evicted_below"]) if metadata.get("evicted_below") else None
+        return batch, updated_at, evicted_below
+
+    # Upstream payloads
+
+    def write_blob(self, name: str, content: bytes, version: str):
+        header = json.dumps({"version": version, "written_at": time.time()}).encode("utf-8")
+        with self._atomic_write(f"{name}.blob") as tmp:
+            with open(tmp, "wb") as f:
+                f.write(header + b"\n" + content)
+
+    def read_blob(self, name: str, max_age: Optional[float] = None) -> Optional[Tuple[bytes, str]]:
+        """(content, version), or None when missing or older than max_age"""
+        try:
+            with open(self.path(f"{name}.blob"), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        header, _, content = data.partition(b"\n")
+        meta = json.loads(header)
+        if max_age is not None and time.time() - meta["written_at"] > max_age:
+            return None
+        return content, meta["version"]
+
+    def blob_changed(self, name: str) -> bool:
+        """True once per replacement of the blob file (for followers polling it)"""
+        try:
+            stat = os.stat(self.path(f"{name}.blob"))
+        except FileNotFoundError:
+            return False
+        marker = (stat.st_ino, stat.st_mtime_ns)
+        if self._seen.get(name) == marker:
+            return False
+        self._seen[name] = marker
+        return True
+
+    def fetch_blob(self, name: str, fetch: Callable[[], Tuple[bytes, str]], max_age: float) -> Tuple[bytes, str]:
+        """
+        Cross-process single flight: return the shared copy if fresh,
+        otherwise fetch it while holding the blob's lock so other workers
+        wait for this download and then read the result.
+        """
+        cached = self.read_blob(name, max_age)
+        if cached is not None:
+            return cached
+        with self._file_lock(f"{name}.lock"):
+            cached = self.read_blob(name, max_age)
+            if cached is not None:
+                return cached
+            content, version = fetch()
+            self.write_blob(name, content, version)
+            return content, version
+
+    @contextmanager
+    def _atomic_write(self, name: str) -> Iterator[str]:
+        tmp = self.path(f".{name}.{os.getpid()}.tmp")
+        try:
+            yield tmp
+            os.replace(tmp, self.path(name))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    @contextmanager
+    def _file_lock(self, name: str) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.path(name), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+
+def _column_to_numpy(column) -> np.ndarray:
+    import pyarrow as pa
+
+    if column.num_chunks == 1 and not pa.types.is_boolean(column.type):
+        return column.chunk(0).to_numpy(zero_copy_only=True)
+    # Arrow packs booleans as bits, so those (and multi-chunk columns) need a copy
+    return column.to_numpy()
+
+
+class SnapshotSync:
+    """
+    Per-worker loop keeping the deal stores and live feeds in step with the
+    shared directory. The refresher runs the live feeds (the only upstream
+    pollers) and publishes; every other worker loads what it published and
+    re-emits new deals / insights to its own SSE subscribers.
+    """
+
+    def __init__(self, shared: SharedSnapshots, stores: Dict[str, DealStore],
+                 feeds: Dict[str, Any], run_feeds: bool = True):
+        self.shared = shared
+        self.stores = stores
+        self.feeds = feeds
+        self.run_feeds = run_feeds
+        self._insights_published: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.shared.release_refresher()
+
+    async def _run(self):
+        while True:
+            try:
+                if not self.shared.is_refresher and self.shared.try_become_refresher():
+                    logger.info(f"Worker {os.getpid()} is now the snapshot refresher")
+                    if self.run_feeds:
+                        for feed in self.feeds.values():
+                            feed.start()
+                if self.shared.is_refresher:
+                    await asyncio.to_thread(self.publish)
+                else:
+                    await self.follow()
+            except Exception as e:
+                logger.error(f"Shared snapshot sync error: {e}")
+            await asyncio.sleep(SHARED_SNAPSHOT_SYNC_SECONDS)
+
+    def publish(self):
+        self.shared.heartbeat()
+        for key, store in self.stores.items():
+            self.shared.publish_store(key, store)
+        for key, feed in self.feeds.items():
+            event = feed.last_insights
+            if event is not None and self._insights_published.get(key) != event["id"]:
+                self.shared.write_blob(f"insights-{key}", json.dumps(event["data"]).encode("utf-8"),
+                                       str(event["id"]))
+                self._insights_published[key] = event["id"]
+
+    async def follow(self):
+        for key, store in self.stores.items():
+            loaded = await asyncio.to_thread(self.shared.load_store, key)
+            if loaded is not None:
+                # Off the loop: id digest, merge of local deals and listeners (price series, live feed)
+                await asyncio.to_thread(store.replace, *loaded)
+        for key, feed in self.feeds.items():
+            if self.shared.blob_changed(f"insights-{key}"):
+                blob = self.shared.read_blob(f"insights-{key}")
+                if blob is not None:
+                    feed.publish_insights(json.loads(blob[0]))
+
+
+# None unless SHARED_SNAPSHOT_DIR is set (single-worker deployments)
+shared_snapshots = SharedSnapshots(SHARED_SNAPSHOT_DIR) if SHARED_SNAPSHOT_DIR else None
+
+
+def shared_fetch(name: str, fetch: Callable[[], Tuple[bytes, str]], max_age: float) -> Tuple[bytes, str]:
+    """fetch() through the shared directory when enabled, directly otherwise"""
+    if shared_snapshots is None:
+        return fetch()
+    return shared_snapshots.fetch_blob(name, fetch, max_age)
@@ -4,15 +4,17 @@ Testnet/Calibration Filecoin Deal Data Aggregator
 Comprehensive data aggregation for testnet and calibration networks
 """
 
-import requests
 import json
-import pandas as pd
 import io
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import logging
 
+import upstream
+from tracing import traced
+from config import CALIBRATION_EXPLORER_URL, CALIBRATION_RPC_URL, TESTNET_RPC_URL, CALIBRATION_FILFOX_API_URL
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,16 +27,17 @@ class TestnetDealDataAggregator:
     
     def __init__(self):
         # Testnet/Calibration RPC endpoints
-        self.calibration_rpc = "https://api.zondax.ch/fil/node/calibration/rpc/v1"
-        self.testnet_rpc = "https://api.zondax.ch/fil/node/testnet/rpc/v1"
+        self.calibration_rpc = CALIBRATION_RPC_URL
+        self.testnet_rpc = TESTNET_RPC_URL
         
         # Testnet-specific data sources
-        self.testnet_filfox_url = "https://calibration.filfox.info/api/v1"
-        self.testnet_explorer_url = "https://calibration.filfox.info"
+        self.testnet_filfox_url = CALIBRATION_FILFOX_API_URL
+        self.testnet_explorer_url = CALIBRATION_EXPLORER_URL
         
         # Testnet metrics (if available)
         self.testnet_metrics_url = None  # Add if testnet metrics become available
         
+    @traced("source", "chain_info")
     def get_testnet_chain_info(self) -> Dict[str, Any]:
         """
         Get basic chain information from testnet/calibration
@@ -52,9 +55,9 @@ class TestnetDealDataAggregator:
             
             # Try calibration first
             try:
-                resp = requests.post(self.calibration_rpc, data=json.dumps(payload), headers=headers, timeout=10)
+                resp = upstream.post(self.calibration_rpc, data=json.dumps(payload), headers=headers, timeout=10)
                 resp.raise_for_status()
-                data = resp.json()
+                data = upstream.parse_json(resp)
                 network_name = data.get("result", "unknown")
                 
                 # Get chain head
@@ -65,9 +68,9 @@ class TestnetDealDataAggregator:
                     "id": 1
                 }
                 
-                head_resp = requests.post(self.calibration_rpc, data=json.dumps(head_payload), headers=headers, timeout=10)
+                head_resp = upstream.post(self.calibration_rpc, data=json.dumps(head_payload), headers=headers, timeout=10)
                 head_resp.raise_for_status()
-                head_data = head_resp.json()
+                head_data = upstream.parse_json(head_resp)
                 chain_head = head_data.get("result", {})
                 
                 return {
@@ -86,9 +89,9 @@ class TestnetDealDataAggregator:
                 
                 # Try testnet as fallback
                 try:
-                    resp = requests.post(self.testnet_rpc, data=json.dumps(payload), headers=headers, timeout=10)
+                    resp = upstream.post(self.testnet_rpc, data=json.dumps(payload), headers=headers, timeout=10)
                     resp.raise_for_status()
-                    data = resp.json()
+                    data = upstream.parse_json(resp)
                     network_name = data.get("result", "unknown")
                     
                     return {
@@ -105,18 +108,22 @@ class TestnetDealDataAggregator:
             logger.error(f"Error getting testnet chain info: {e}")
             return {"error": str(e)}
     
-    def get_testnet_deals(self, limit: int = 50) -> Dict[str, Any]:
+    @traced("source", "filfox")
+    def get_testnet_deals(self, limit: int = 50, page: int = 0) -> Dict[str, Any]:
         """
         Get recent deals from testnet/calibration network
+        (page > 0: older deals, `limit` per page, newest first)
         """
         try:
             # Try to get deals from testnet Filfox API
             url = f"{self.testnet_filfox_url}/deal/list"
             params = {"limit": limit}
+            if page:
+                params.update({"page": page, "pageSize": limit})
             
-            response = requests.get(url, params=params, timeout=15)
+            response = upstream.get(url, params=params, timeout=15)
             response.raise_for_status()
-            data = response.json()
+            data = upstream.parse_json(response)
             
             deals = data.get("deals", [])
             
@@ -129,7 +136,7 @@ class TestnetDealDataAggregator:
                 "timestamp": datetime.now().isoformat(),
                 "total_deals": len(deals),
                 "total_count": data.get("totalCount", 0),
-                "deals": deals[:10],  # Return first 10 for detailed view
+                "deals": deals,
                 "analytics": analytics
             }
             
@@ -137,6 +144,7 @@ class TestnetDealDataAggregator:
             logger.error(f"Error fetching testnet deals: {e}")
             return {"error": str(e)}
     
+    @traced("analyse")
     def _analyze_testnet_deals(self, deals: List[Dict]) -> Dict[str, Any]:
         """Analyze testnet deals data for insights"""
         if not deals:
@@ -177,6 +185,7 @@ class TestnetDealDataAggregator:
             }
         }
     
+    @traced("source", "network_metrics")
     def get_testnet_network_metrics(self) -> Dict[str, Any]:
         """
         Get network metrics from testnet/calibration
@@ -196,9 +205,9 @@ class TestnetDealDataAggregator:
             }
             
             try:
-                resp = requests.post(self.calibration_rpc, data=json.dumps(power_payload), headers=headers, timeout=10)
+                resp = upstream.post(self.calibration_rpc, data=json.dumps(power_payload), headers=headers, timeout=10)
                 resp.raise_for_status()
-                power_data = resp.json()
+                power_data = upstream.parse_json(resp)
                 metrics["miner_power"] = power_data.get("result", {})
             except Exception as e:
                 logger.warning(f"Could not get miner power: {e}")
@@ -212,9 +221,9 @@ class TestnetDealDataAggregator:
             }
             
             try:
-                resp = requests.post(self.calibration_rpc, data=json.dumps(stats_payload), headers=headers, timeout=10)
+                resp = upstream.post(self.calibration_rpc, data=json.dumps(stats_payload), headers=headers, timeout=10)
                 resp.raise_for_status()
-                stats_data = resp.json()
+                stats_data = upstream.parse_json(resp)
                 metrics["network_version"] = stats_data.get("result", 0)
             except Exception as e:
                 logger.warning(f"Could not get network version: {e}")
@@ -228,9 +237,9 @@ class TestnetDealDataAggregator:
             }
             
             try:
-                resp = requests.post(self.calibration_rpc, data=json.dumps(supply_payload), headers=headers, timeout=10)
+                resp = upstream.post(self.calibration_rpc, data=json.dumps(supply_payload), headers=headers, timeout=10)
                 resp.raise_for_status()
-                supply_data = resp.json()
+                supply_data = upstream.parse_json(resp)
                 metrics["circulating_supply"] = supply_data.get("result", "0")
             except Exception as e:
                 logger.warning(f"Could not get circulating supply: {e}")
@@ -245,6 +254,7 @@ class TestnetDealDataAggregator:
             logger.error(f"Error getting testnet network metrics: {e}")
             return {"error": str(e)}
     
+    @traced("source", "providers")
     def get_testnet_provider_info(self, provider_id: str = None) -> Dict[str, Any]:
         """
         Get information about testnet storage providers
@@ -277,9 +287,9 @@ class TestnetDealDataAggregator:
                 "id": 1
             }
             
-            resp = requests.post(self.calibration_rpc, data=json.dumps(provider_payload), headers=headers, timeout=10)
+            resp = upstream.post(self.calibration_rpc, data=json.dumps(provider_payload), headers=headers, timeout=10)
             resp.raise_for_status()
-            provider_data = resp.json()
+            provider_data = upstream.parse_json(resp)
             
             return {
                 "source": "testnet_rpc",
@@ -337,6 +347,7 @@ class TestnetDealDataAggregator:
         
         return results
     
+    @traced("analyse")
     def _generate_testnet_insights(self, sources: Dict[str, Any]) -> Dict[str, Any]:
         """Generate insights from testnet data sources"""
         insights = {
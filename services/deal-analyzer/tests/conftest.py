@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+# The service is a flat set of modules run from its own directory
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(SERVICE_DIR, "benchmarks")
+for path in (SERVICE_DIR, BENCHMARKS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class FakeFilfox:
+    """Deal list pages, newest first, like Filfox's /deal/list"""
+
+    def __init__(self, total):
+        self.deals = [{"id": i, "provider": "f01000", "client": "f02000", "pieceSize": 1024,
+                       "verifiedDeal": False, "startEpoch": i, "endEpoch": i + 100} for i in range(total, 0, -1)]
+        self.pages = []
+
+    def page(self, limit, page=0):
+        self.pages.append(page)
+        chunk = self.deals[page * limit:(page + 1) * limit]
+        return {"timestamp": "2024-01-01T00:00:00", "total_deals": len(chunk), "deals": chunk, "analytics": {},
+                "network": "calibration"}
+
+    def get_recent_deals_from_filfox(self, limit=100, page=0):
+        return self.page(limit, page)
+
+    def get_testnet_deals(self, limit=50, page=0):
+        return self.page(limit, page)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """The API's aggregators, deal stores and backfills swapped for fresh ones over a fake Filfox"""
+    import main
+    from deal_backfill import DealBackfill
+    from deal_store import DealStore, deal_stores
+
+    fake = FakeFilfox(total=250)
+    monkeypatch.setattr(main, "mainnet_aggregator", lambda: fake)
+    monkeypatch.setattr(main, "testnet_aggregator", lambda: fake)
+    for network, store_network in (("mainnet", "mainnet"), ("testnet", "calibration")):
+        store = DealStore(store_network)
+        monkeypatch.setitem(deal_stores, network, store)
+        monkeypatch.setitem(main.deal_backfills, network,
+                            DealBackfill(store, lambda page, size: fake.page(size, page), page_size=40, max_pages=20))
+    return fake
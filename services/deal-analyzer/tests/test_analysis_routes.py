@@ -0,0 +1,25 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from result_cache import TieredCache
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_mainnet_analysis_wraps_string_recommendations(upstream, monkeypatch, fast):
+    # The mainnet aggregator's insights carry plain-string recommendations
+    analysis = {
+        "timestamp": "2024-01-01T00:00:00",
+        "sources": {"filfox": {"deals": []}},
+        "insights": {"market_health": {"daily_deal_activity": 10},
+                     "recommendations": ["Consider Filecoin Plus", {"category": "Pricing", "priority": "High",
+                                                                    "message": "Prices are rising", "action": "Lock in"}]},
+    }
+    monkeypatch.setattr(upstream, "get_comprehensive_deal_analysis", lambda: analysis, raising=False)
+    monkeypatch.setattr(main, "result_cache", TieredCache(None))
+    response = TestClient(main.app).get("/api/mainnet/analysis", params={"fast": fast})
+    assert response.status_code == 200, response.text
+    assert response.json()["recommendations"] == [
+        {"category": "Network", "priority": "Medium", "message": "Consider Filecoin Plus", "action": ""},
+        {"category": "Pricing", "priority": "High", "message": "Prices are rising", "action": "Lock in"},
+    ]
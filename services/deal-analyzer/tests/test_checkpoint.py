@@ -0,0 +1,41 @@
+import time
+
+from checkpoint import Checkpointer
+from deal_store import DealStore
+from result_cache import LocalRedis, TieredCache
+
+
+def checkpointer(directory, cache, stores=None):
+    return Checkpointer(str(directory), stores or {"mainnet": DealStore("mainnet")}, cache, feeds={})
+
+
+def test_results_are_checkpointed_at_their_full_ttl(tmp_path):
+    cache = TieredCache(LocalRedis(), l1_ttl=1)
+    cache.set("mainnet/market?days=7", {"value": 1}, ttl=3600)
+    cache.l1.invalidate()  # L1 copy already gone; the result is still live in L2
+    store = DealStore("mainnet")
+    store.ingest([{"id": 1, "startEpoch": 1, "endEpoch": 2}])
+    checkpointer(tmp_path, cache, {"mainnet": store}).save()
+
+    # Restart: empty process, and the in-process L2 stand-in is gone too
+    restarted = TieredCache(LocalRedis(), l1_ttl=1)
+    report = checkpointer(tmp_path, restarted).restore()
+    assert report["restored"] is True
+    assert report["cached_results"] == 1
+    assert report["deals"] == {"mainnet": 1}
+    (key, value, expires), = restarted.entries()
+    assert (key, value) == ("mainnet/market?days=7", {"value": 1})
+    assert expires - time.time() > 3000
+    assert restarted.get("mainnet/market?days=7") == {"value": 1}
+
+
+def test_restore_reports_nothing_when_nothing_is_loaded(tmp_path):
+    assert checkpointer(tmp_path, TieredCache()).restore()["restored"] is False
+
+    cache = TieredCache()
+    cache.set("k", {"value": 1}, ttl=1)
+    checkpointer(tmp_path, cache).save()
+    time.sleep(1.1)
+    report = checkpointer(tmp_path, TieredCache()).restore()
+    assert report["restored"] is False
+    assert report["cached_results"] == 0
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+from conftest import SERVICE_DIR
+
+
+def upstream_urls(**env):
+    """Testnet aggregator upstream URLs as resolved in a fresh interpreter with env"""
+    code = ("from testnet_aggregator import TestnetDealDataAggregator as T; t = T(); "
+            "print(t.testnet_filfox_url); print(t.testnet_explorer_url)")
+    clean = {k: v for k, v in os.environ.items() if not k.endswith("_URL")}
+    result = subprocess.run([sys.executable, "-c", code], cwd=SERVICE_DIR, env={**clean, **env},
+                            capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def test_testnet_explorer_url_follows_the_standin_and_overrides():
+    assert upstream_urls()[1] == "https://calibration.filfox.info"
+    assert upstream_urls(UPSTREAM_STANDIN_URL="http://127.0.0.1:8765") == [
+        "http://127.0.0.1:8765/filfox/calibration/api/v1", "http://127.0.0.1:8765/filfox/calibration"]
+    assert upstream_urls(CALIBRATION_EXPLORER_URL="https://explorer.example")[1] == "https://explorer.example"
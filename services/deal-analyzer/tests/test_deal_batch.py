@@ -0,0 +1,35 @@
+import numpy as np
+
+from deal_batch import (MISSING_EPOCH, STATUS_ACTIVE, STATUS_EXPIRED, STATUS_PENDING, STATUS_UNKNOWN, DealBatch,
+                        classify_status)
+
+
+def test_classify_status_matches_per_deal_order():
+    starts = np.array([100, 100, 100, 200, 200])
+    ends = np.array([200, 200, 200, 100, 100])
+    at = np.array([150, 50, 250, 150, 250])
+    codes = [int(classify_status(starts[i:i + 1], ends[i:i + 1], int(at[i]))[0]) for i in range(len(at))]
+    # start > end: not started yet is Pending, past the start is Expired
+    assert codes == [STATUS_ACTIVE, STATUS_PENDING, STATUS_EXPIRED, STATUS_PENDING, STATUS_EXPIRED]
+
+
+def test_missing_epochs_are_unknown_and_null():
+    batch = DealBatch([
+        {"id": 1, "startEpoch": 10, "endEpoch": 20},
+        {"id": 2},
+        {"id": 3, "startEpoch": None, "endEpoch": 5},
+    ])
+    assert batch.start_epochs.tolist() == [10, MISSING_EPOCH, MISSING_EPOCH]
+    assert batch.status_codes(at_epoch=15).tolist() == [STATUS_ACTIVE, STATUS_UNKNOWN, STATUS_UNKNOWN]
+
+    records = batch.to_records(at_epoch=15)
+    assert records[0]["start_time"] is not None and records[0]["status"] == "Active"
+    assert records[1]["start_epoch"] is None and records[1]["duration_days"] is None
+    assert records[1]["start_time"] is None and records[1]["status"] == "Unknown"
+    assert records[2]["end_epoch"] == 5 and records[2]["end_time"] is not None
+
+
+def test_epoch_zero_is_a_real_epoch():
+    batch = DealBatch([{"id": 1, "startEpoch": 0, "endEpoch": 10}])
+    assert batch.status_codes(at_epoch=5).tolist() == [STATUS_ACTIVE]
+    assert batch.to_records(at_epoch=5)[0]["start_epoch"] == 0
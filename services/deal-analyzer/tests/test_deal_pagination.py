@@ -0,0 +1,76 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from deal_backfill import DealBackfill
+from deal_store import deal_stores
+
+
+def walk(client, network, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/api/{network}/deals", params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages.append([deal["id"] for deal in body["deals"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("network", ["mainnet", "testnet"])
+def test_cursor_walks_every_upstream_deal(upstream, network):
+    pages = walk(TestClient(main.app), network, limit=30)
+    ids = [deal_id for page in pages for deal_id in page]
+    assert ids == list(range(250, 0, -1))
+    assert [len(page) for page in pages[:8]] == [30] * 8
+    assert len(pages) >= 9  # page 2 and later come from backfilled upstream pages
+
+
+def test_testnet_first_page_is_not_truncated(upstream):
+    body = TestClient(main.app).get("/api/testnet/deals", params={"limit": 50}).json()
+    assert len(body["deals"]) == 50
+    assert body["next_cursor"] is not None
+
+
+def test_backfill_budget_returns_a_cursor_to_continue(upstream, monkeypatch):
+    store = deal_stores["mainnet"]
+    monkeypatch.setitem(main.deal_backfills, "mainnet",
+                        DealBackfill(store, lambda page, size: upstream.page(size, page), page_size=10, max_pages=2))
+    client = TestClient(main.app)
+    first = client.get("/api/mainnet/deals", params={"limit": 5}).json()
+    # Below the first page the store is empty; 2 pages of 10 per request can't reach id < 100 at once
+    cursor = main.encode_cursor("mainnet", 100)
+    body = client.get("/api/mainnet/deals", params={"limit": 5, "cursor": cursor}).json()
+    assert body["deals"] == [] and body["next_cursor"] is not None
+    ids = [deal_id for page in walk_from(client, body["next_cursor"]) for deal_id in page]
+    assert ids[:5] == [99, 98, 97, 96, 95]
+    assert first["next_cursor"] is not None
+
+
+def walk_from(client, cursor):
+    pages = []
+    while cursor is not None and len(pages) < 50:
+        body = client.get("/api/mainnet/deals", params={"limit": 5, "cursor": cursor}).json()
+        pages.append([deal["id"] for deal in body["deals"]])
+        cursor = body["next_cursor"]
+    return pages
+
+
+def test_upstream_failure_during_backfill_is_a_bad_gateway(upstream, monkeypatch):
+    store = deal_stores["mainnet"]
+    monkeypatch.setitem(main.deal_backfills, "mainnet",
+                        DealBackfill(store, lambda page, size: {"error": "filfox down"}))
+    response = TestClient(main.app).get("/api/mainnet/deals", params={"cursor": main.encode_cursor("mainnet", 50)})
+    assert response.status_code == 502
+    assert "filfox down" in response.json()["detail"]
+
+
+def test_cursor_walk_stops_at_the_store_retention_limit(upstream, monkeypatch):
+    monkeypatch.setattr(deal_stores["mainnet"], "max_deals", 100)
+    pages = walk(TestClient(main.app), "mainnet", limit=30)
+    ids = [deal_id for page in pages for deal_id in page]
+    # The cursor ends (next_cursor None) with the newest 100 deals, the ones the store keeps
+    assert ids == list(range(250, 150, -1))
+    assert deal_stores["mainnet"].evicted_below == 151
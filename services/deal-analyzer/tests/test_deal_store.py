@@ -0,0 +1,99 @@
+import numpy as np
+
+from deal_store import DealStore
+
+
+def deals(ids):
+    return [{"id": i, "provider": f"f0{i}", "startEpoch": i, "endEpoch": i + 10} for i in ids]
+
+
+def test_ingest_keeps_ids_unique_and_sorted():
+    store = DealStore("mainnet")
+    assert len(store.ingest(deals([5, 3, 9]))) == 3
+    assert len(store.ingest(deals([12, 10, 11]))) == 3  # appended after the maximum
+    new = store.ingest(deals([1, 7, 9, 4, 20, 7]))  # older, duplicate and newer ids mixed
+    assert new.ids.tolist() == [1, 4, 7, 20]
+    snapshot = store.snapshot()
+    assert snapshot.ids.tolist() == [1, 3, 4, 5, 7, 9, 10, 11, 12, 20]
+    # Every column moved with its id
+    assert snapshot.providers.tolist() == [f"f0{i}" for i in snapshot.ids.tolist()]
+    assert np.array_equal(snapshot.end_epochs, snapshot.ids + 10)
+    # The version follows the id set, not the number of ingests
+    same = DealStore("mainnet")
+    same.ingest(deals(snapshot.ids.tolist()))
+    assert store.version == same.version != 0
+
+
+def test_ingest_of_known_deals_is_a_no_op():
+    store = DealStore("mainnet")
+    store.ingest(deals([1, 2, 3]))
+    version = store.version
+    assert not len(store.ingest(deals([2, 3])))
+    assert store.version == version
+
+
+def test_page_before_walks_back_by_id():
+    store = DealStore("mainnet")
+    store.ingest(deals(range(1, 26)))
+    first = store.page_before(None, 10)
+    assert first.ids.tolist() == list(range(25, 15, -1))
+    second = store.page_before(int(first.ids[-1]), 10)
+    assert second.ids.tolist() == list(range(15, 5, -1))
+
+
+def test_appends_do_not_change_earlier_snapshots():
+    store = DealStore("mainnet")
+    store.ingest(deals([1, 2]))
+    before = store.snapshot()
+    store.ingest(deals([3, 4]))
+    store.ingest(deals([0]))  # merged into new buffers
+    store.ingest(deals([5]))
+    assert before.ids.tolist() == [1, 2]
+    assert store.snapshot().ids.tolist() == [0, 1, 2, 3, 4, 5]
+    assert store.snapshot().providers.tolist() == [f"f0{i}" for i in range(6)]
+
+
+def test_follower_keeps_its_own_deals_across_snapshot_loads():
+    refresher, follower = DealStore("mainnet"), DealStore("mainnet")
+    refresher.ingest(deals([1, 2, 3]))
+    follower.ingest(deals([3, 50]))  # e.g. a route-level fetch or backfill on the follower
+    assert follower.version != refresher.version
+
+    new = follower.replace(refresher.snapshot())
+    assert new.ids.tolist() == [1, 2]
+    assert follower.snapshot().ids.tolist() == [1, 2, 3, 50]
+    assert follower.snapshot().providers.tolist() == ["f01", "f02", "f03", "f050"]
+
+    refresher.ingest(deals([50]))
+    follower.replace(refresher.snapshot())
+    assert follower.version == refresher.version
+
+
+def test_retention_trims_the_oldest_deals():
+    store = DealStore("mainnet", max_deals=5)
+    store.ingest(deals([1, 2, 3]))
+    before = store.snapshot()
+    new = store.ingest(deals([4, 5, 6, 7]))
+    assert new.ids.tolist() == [4, 5, 6, 7]
+    assert store.snapshot().ids.tolist() == [3, 4, 5, 6, 7]
+    assert store.evicted_below == 3
+    assert before.ids.tolist() == [1, 2, 3]  # earlier snapshots are unaffected
+    # Deals older than what is kept are not added (or announced)
+    assert len(store.ingest(deals([1, 2]))) == 0
+    assert store.ingest(deals([0, 8])).ids.tolist() == [8]
+    assert store.snapshot().ids.tolist() == [4, 5, 6, 7, 8]
+    assert store.snapshot().providers.tolist() == [f"f0{i}" for i in range(4, 9)]
+    # The version matches a store that only ever held the kept deals
+    same = DealStore("mainnet", max_deals=0)
+    same.ingest(deals([4, 5, 6, 7, 8]))
+    assert store.version == same.version
+
+
+def test_retention_over_many_appends_reuses_buffers():
+    store = DealStore("mainnet", max_deals=100)
+    for start in range(0, 5000, 50):
+        store.ingest(deals(range(start, start + 50)))
+    snapshot = store.snapshot()
+    assert snapshot.ids.tolist() == list(range(4900, 5000))
+    assert np.array_equal(snapshot.end_epochs, snapshot.ids + 10)
+    assert store.evicted_below == 4900
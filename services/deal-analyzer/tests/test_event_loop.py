@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+@pytest.mark.parametrize("path", ["/api/mainnet/deals", "/api/testnet/deals"])
+def test_first_page_fetch_runs_off_the_event_loop(upstream, monkeypatch, path):
+    seen = []
+    page = upstream.page
+    monkeypatch.setattr(upstream, "page", lambda limit, page_no=0: seen.append(_on_event_loop()) or page(limit, page_no))
+    response = TestClient(main.app).get(path, params={"limit": 10})
+    assert response.status_code == 200
+    assert seen == [False]
+
+
+def test_testnet_chain_info_runs_off_the_event_loop(upstream, monkeypatch):
+    seen = []
+
+    def chain_info():
+        seen.append(_on_event_loop())
+        return {"network": "calibration", "status": "connected", "chain_head": {"height": 1}}
+
+    monkeypatch.setattr(upstream, "get_testnet_chain_info", chain_info, raising=False)
+    response = TestClient(main.app).get("/api/testnet/network")
+    assert response.status_code == 200
+    assert seen == [False]
@@ -0,0 +1,62 @@
+import io
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_aggregator import FilecoinDealDataAggregator
+from forecast import forecast_prices, theil_sen
+from user_storage_advisor import FilecoinStorageAdvisor
+
+
+def daily_metrics(days=400):
+    """Prices rising ~0.2%/day over the year but dipping over the last week"""
+    dates = pd.date_range(end=datetime.now().date(), periods=days, freq="D")
+    rng = np.random.default_rng(7)
+    prices = 1e-8 * np.exp(0.002 * np.arange(days) + rng.normal(0, 0.01, days))
+    prices[-7:] *= 0.9
+    return pd.DataFrame({
+        "date": dates, "deals": 60000, "verified_deals": 45000, "regular_deals": 15000,
+        "unique_piece_cids": 50000, "onboarded_data_pibs": 1.5, "deal_storage_cost_fil": prices,
+    })
+
+
+def check_pricing(result):
+    pricing = result["market_insights"]["pricing"]
+    forecast = pricing["forecast"]
+    assert forecast is not None
+    assert pricing["price_trend"] == forecast["trend"]
+    assert pricing["price_change_percent"] == forecast["expected_change_percent"]
+    # The trend's sign matches the change it reports
+    sign = {"increasing": 1, "decreasing": -1}.get(pricing["price_trend"])
+    if sign is not None:
+        assert np.sign(pricing["price_change_percent"]) == sign
+
+
+@pytest.mark.parametrize("days", [7, 30])
+def test_mainnet_market_carries_the_forecast(days):
+    buffer = io.BytesIO()
+    daily_metrics().to_parquet(buffer)
+    result = FilecoinDealDataAggregator().analyze_parquet(buffer.getvalue(), days, f"mainnet-v{days}")
+    check_pricing(result)
+
+
+def test_advisor_trend_and_change_come_from_the_forecast():
+    result = FilecoinStorageAdvisor().analyze_frame(daily_metrics(), 30, "advisor-v1")
+    check_pricing(result)
+    assert result["market_insights"]["pricing"]["price_trend"] == "increasing"
+
+
+def test_theil_sen_skips_pairs_with_equal_dates():
+    t = np.array([0.0, 1.0, 1.0, 2.0])
+    with np.errstate(all="raise"):  # a 0/0 pair would raise here
+        assert theil_sen(t, 3 * t + 1) == pytest.approx(3.0)
+        assert theil_sen(np.zeros(3), np.arange(3.0)) == 0.0
+
+
+def test_duplicate_dates_give_a_finite_forecast():
+    dates = np.repeat(np.arange("2024-01-01", "2024-01-21", dtype="datetime64[D]"), 2)
+    forecast = forecast_prices(dates, np.full(len(dates), 1e-8), horizon=7)
+    assert np.isfinite(forecast["expected_change_percent"])
+    assert np.isfinite([point["expected"] for point in forecast["path"]]).all()
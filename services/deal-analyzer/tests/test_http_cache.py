@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+
+import main
+from deal_store import deal_stores
+
+
+def test_etag_is_weak_and_shared_across_codings(upstream):
+    client = TestClient(main.app)
+    plain = client.get("/api/mainnet/deals", params={"limit": 100}, headers={"Accept-Encoding": "identity"})
+    packed = client.get("/api/mainnet/deals", params={"limit": 100}, headers={"Accept-Encoding": "gzip"})
+    assert plain.headers["ETag"].startswith('W/"')
+    assert packed.headers["ETag"] == plain.headers["ETag"]
+    again = client.get("/api/mainnet/deals", params={"limit": 100},
+                       headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_first_page_revalidates_without_calling_filfox(upstream):
+    client = TestClient(main.app)
+    etag = client.get("/api/mainnet/deals", params={"limit": 20}).headers["ETag"]
+    calls = len(upstream.pages)
+    response = client.get("/api/mainnet/deals", params={"limit": 20}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(upstream.pages) == calls
+
+
+def test_stale_store_is_checked_against_filfox_first(upstream):
+    client = TestClient(main.app)
+    etag = client.get("/api/mainnet/deals", params={"limit": 20}).headers["ETag"]
+    deal_stores["mainnet"].checked_at -= 10 * main.LIVE_FEED_POLL_SECONDS
+    calls = len(upstream.pages)
+    response = client.get("/api/mainnet/deals", params={"limit": 20}, headers={"If-None-Match": etag})
+    assert len(upstream.pages) == calls + 1
+    assert response.status_code == 304  # Filfox had nothing new, so the store version is unchanged
+
+
+def test_cursor_page_revalidates_before_backfilling(upstream):
+    client = TestClient(main.app)
+    cursor = main.encode_cursor("mainnet", 120)
+    etag = client.get("/api/mainnet/deals", params={"limit": 20, "cursor": cursor}).headers["ETag"]
+    calls = len(upstream.pages)
+    response = client.get("/api/mainnet/deals", params={"limit": 20, "cursor": cursor},
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(upstream.pages) == calls
@@ -0,0 +1,33 @@
+import asyncio
+
+from deal_store import DealStore
+from live_feed import DealFeed
+
+
+def deals(ids):
+    return [{"id": i, "provider": "f01000", "startEpoch": i, "endEpoch": i + 10} for i in ids]
+
+
+def test_deals_ingested_by_any_path_reach_subscribers():
+    async def scenario():
+        store = DealStore("mainnet")
+        polls = iter([{"deals": deals([1, 2])}])
+        feed = DealFeed("mainnet", store, fetch_deals=lambda: next(polls, {"deals": []}))
+        subscriber = feed.subscribe()
+
+        # A route or the backfill ingesting from a worker thread between polls
+        await asyncio.to_thread(store.ingest, deals([5, 4]))
+        event = await subscriber.get(timeout=1)
+        assert event["event"] == "deals"
+        assert [d["id"] for d in event["data"]["deals"]] == [5, 4]
+
+        # The feed's own poll (ingested off the loop) publishes through the same listener
+        feed.start()
+        event = await subscriber.get(timeout=1)
+        await feed.stop()
+        assert [d["id"] for d in event["data"]["deals"]] == [2, 1]
+        # Deals already stored are not published again
+        store.ingest(deals([1, 5]))
+        assert await subscriber.get(timeout=0.1) is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+
+import main
+from deal_batch import DealBatch, current_epoch
+from deal_store import DealStore, deal_stores
+from placement import optimize_placement
+from reputation import ReputationScorer
+
+
+def deals():
+    """Providers f00..f05, f0k charging (k + 1) x 1000; f00 and f01 serve the same clients"""
+    now = current_epoch("mainnet")
+    clients = {0: "f1a", 1: "f1a", 2: "f1b", 3: "f1c", 4: "f1d", 5: "f1e"}
+    return [{"id": i, "provider": f"f0{i % 6}", "client": clients[i % 6], "pieceSize": 2 ** 30,
+             "verifiedDeal": False, "startEpoch": now - i, "endEpoch": now + 10 ** 6,
+             "stroagePrice": str(1000 * (1 + i % 6))} for i in range(1, 61)]
+
+
+def test_cheapest_providers_with_disjoint_clients():
+    batch = DealBatch(deals(), network="mainnet")
+    result = optimize_placement(batch, replicas=3, size_tib=1, days=365, max_client_overlap=0.2)
+    assert [p["provider"] for p in result["placement"]] == ["f00", "f02", "f03"]
+    assert result["max_pairwise_client_overlap"] == 0
+    assert result["lower_bound_cost_fil"] < result["expected_cost_fil"]
+    assert not {"reputation", "durability", "meets_durability"} & (set(result) | set(result["placement"][0]))
+
+
+def test_placement_route(monkeypatch):
+    store = DealStore("mainnet")
+    store.ingest(deals())
+    monkeypatch.setitem(deal_stores, "mainnet", store)
+    client = TestClient(main.app)
+    response = client.get("/api/mainnet/placement", params={"replicas": 2, "size_tib": 1, "min_deals": 10})
+    assert response.status_code == 200
+    assert [p["provider"] for p in response.json()["placement"]] == ["f00", "f01"]
+    too_many = client.get("/api/mainnet/placement", params={"replicas": 7})
+    assert too_many.status_code == 404
+
+
+def test_reputation_constraints_are_opt_in():
+    batch = DealBatch(deals(), network="mainnet")
+    scorer = ReputationScorer()
+    scorer.scores.update({"f00": 99, "f02": 10})
+    result = optimize_placement(batch, replicas=2, size_tib=1, days=365, max_client_overlap=0.2,
+                                min_reputation=40, scorer=scorer)
+    assert [p["provider"] for p in result["placement"]] == ["f00", "f03"]  # f02 is below min_reputation
+    assert [p["reputation"] for p in result["placement"]] == [99, 50]
+    assert result["meets_durability"] is None
+    # The durability target trades cost for a more reliable provider
+    scorer.scores.update({"f00": 10})
+    result = optimize_placement(batch, replicas=1, size_tib=1, days=365, min_durability=0.4, scorer=scorer)
+    assert [p["provider"] for p in result["placement"]] == ["f01"]
+    assert result["durability"] == 0.5 and result["meets_durability"] is True
+    # With the constant default scores, min_reputation above 50 excludes everyone
+    assert "error" in optimize_placement(batch, replicas=1, size_tib=1, days=365, min_reputation=60)
@@ -0,0 +1,136 @@
+import threading
+import time
+
+from result_cache import KEY_PREFIX, LocalRedis, TieredCache
+
+
+class Compute:
+    """Counts calls; each call sleeps then returns a fresh result"""
+
+    def __init__(self, seconds=0.0):
+        self.seconds = seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.seconds)
+        return {"value": 42}
+
+
+def test_l1_hit_skips_compute():
+    cache, compute = TieredCache(), Compute()
+    assert cache.get_or_compute("k", compute, ttl=60) == {"value": 42}
+    assert cache.get_or_compute("k", compute, ttl=60) == {"value": 42}
+    assert compute.calls == 1
+
+
+def test_l1_keeps_full_ttl_without_l2():
+    cache = TieredCache(l1_ttl=1)
+    cache.get_or_compute("k", Compute(), ttl=3600)
+    (_, _, expires), = cache.l1.entries()
+    assert expires - time.time() > 3000
+
+
+def test_l1_is_capped_with_l2_and_refilled_from_it():
+    redis = LocalRedis()
+    cache, compute = TieredCache(redis, l1_ttl=1), Compute()
+    cache.get_or_compute("k", compute, ttl=3600)
+    (_, _, expires), = cache.l1.entries()
+    assert expires - time.time() <= 1
+    cache.l1.invalidate()
+    assert cache.get_or_compute("k", compute, ttl=3600) == {"value": 42}
+    assert compute.calls == 1
+
+
+def test_replica_reads_l2_instead_of_computing():
+    redis = LocalRedis()
+    compute = Compute()
+    TieredCache(redis).get_or_compute("k", compute, ttl=60)
+    assert TieredCache(redis).get_or_compute("k", compute, ttl=60) == {"value": 42}
+    assert compute.calls == 1
+
+
+def test_errors_are_not_cached():
+    cache = TieredCache(LocalRedis())
+    assert cache.get_or_compute("k", lambda: {"error": "down"}, ttl=60) == {"error": "down"}
+    assert cache.get("k") is None
+
+
+def run_concurrently(caches, compute, threads_per_cache=4):
+    results = []
+    threads = [threading.Thread(target=lambda c=cache: results.append(c.get_or_compute("k", compute, ttl=60)))
+               for cache in caches for _ in range(threads_per_cache)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_stampede_computes_once_across_threads_and_replicas():
+    redis = LocalRedis()
+    compute = Compute(seconds=0.3)
+    results = run_concurrently([TieredCache(redis), TieredCache(redis), TieredCache(redis)], compute)
+    assert compute.calls == 1
+    assert results == [{"value": 42}] * 12
+
+
+def test_lock_is_renewed_while_a_slow_compute_runs():
+    redis = LocalRedis()
+    compute = Compute(seconds=1.0)  # over three times the lock expiry
+    caches = [TieredCache(redis, lock_seconds=0.3, wait_seconds=5) for _ in range(2)]
+    results = run_concurrently(caches, compute, threads_per_cache=2)
+    assert compute.calls == 1
+    assert results == [{"value": 42}] * 4
+    assert redis.get(f"{KEY_PREFIX}lock:k") is None  # released by the holder
+
+
+def test_expired_lock_of_a_crashed_replica_lets_another_compute():
+    redis = LocalRedis()
+    redis.set(f"{KEY_PREFIX}lock:k", "crashed", nx=True, ex=0.3)  # never released, never renewed
+    cache, compute = TieredCache(redis, lock_seconds=0.3, wait_seconds=5), Compute()
+    started = time.time()
+    assert cache.get_or_compute("k", compute, ttl=60) == {"value": 42}
+    assert compute.calls == 1
+    assert 0.2 < time.time() - started < 2
+
+
+class ScriptedRedis:
+    """A LocalRedis that only answers the lock scripts through EVAL, like a real Redis client"""
+
+    def __init__(self):
+        self.local = LocalRedis()
+        self.scripts = []
+
+    def __getattr__(self, name):
+        return getattr(self.local, name)
+
+    def eval(self, script, numkeys, key, token, *args):
+        self.scripts.append(script)
+        with self.local._lock:
+            entry = self.local._live(key)
+            if entry is None or entry[0] != token.encode():
+                return 0
+            if "pexpire" in script:
+                self.local._data[key] = (entry[0], time.time() + int(args[0]) / 1000)
+            else:
+                del self.local._data[key]
+            return 1
+
+
+def test_lock_is_renewed_and_released_by_compare_and_act_scripts():
+    redis = ScriptedRedis()
+    cache = TieredCache(redis, lock_seconds=0.3, wait_seconds=5)
+    assert cache.get_or_compute("k", Compute(seconds=0.5), ttl=60) == {"value": 42}
+    assert any("pexpire" in script for script in redis.scripts)
+    assert "del" in redis.scripts[-1]
+    assert redis.get(f"{KEY_PREFIX}lock:k") is None
+
+
+def test_release_leaves_a_lock_retaken_by_another_replica():
+    redis = ScriptedRedis()
+    redis.set(f"{KEY_PREFIX}lock:k", "other", nx=True, ex=60)
+    TieredCache(redis)._release_l2_lock("k", "ours")
+    assert redis.get(f"{KEY_PREFIX}lock:k") == b"other"
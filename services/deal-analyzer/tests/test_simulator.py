@@ -0,0 +1,44 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import simulator
+from admission import AdmissionMiddleware
+from config import ADMISSION_LIMITS, SIMULATION_MAX_DRAWS
+from deal_batch import DealBatch, current_epoch
+from simulator import simulate_storage_cost
+
+
+@pytest.fixture(scope="module")
+def deals():
+    now = current_epoch("mainnet")
+    return DealBatch([{"id": i, "provider": f"f0{i % 50}", "client": f"f1{i % 7}", "pieceSize": 2 ** 30,
+                       "verifiedDeal": False, "startEpoch": now - i, "endEpoch": now + 10 ** 6,
+                       "stroagePrice": str(1000 * (1 + i % 50))} for i in range(5000)], network="mainnet")
+
+
+def test_chunked_trials_cover_every_trial(deals, monkeypatch):
+    monkeypatch.setattr(simulator, "CHUNK_DRAWS", 999)  # 333 trials per chunk, last one partial
+    result = simulate_storage_cost(deals, 1, 365, replicas=3, trials=10_000, seed=1)
+    whole = simulate_storage_cost(deals, 1, 365, replicas=3, trials=10_000, seed=1)
+    assert result["trials"] == 10_000
+    assert result["sample"]["distinct_replica_providers"] is True
+    cost = result["cost_fil"]
+    assert 0 < cost["p5"] <= cost["p50"] <= cost["p95"] <= cost["max"]
+    # Same distribution whichever way the trials are chunked
+    assert cost["mean"] == pytest.approx(whole["cost_fil"]["mean"], rel=0.05)
+
+
+def test_draw_budget_is_enforced(deals):
+    trials = SIMULATION_MAX_DRAWS // 20 + 1
+    assert "error" in simulate_storage_cost(deals, 1, 365, replicas=20, trials=trials)
+    response = TestClient(main.app).get("/api/mainnet/simulate/storage-cost",
+                                        params={"size_tib": 1, "replicas": 20, "trials": trials})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/api/mainnet/simulate/storage-cost", "/api/testnet/placement"])
+def test_simulation_routes_are_admission_limited(path):
+    limiter = AdmissionMiddleware(app=None).limiter_for(path)
+    assert limiter is not None
+    assert (limiter.limit, limiter.queue) == ADMISSION_LIMITS["simulation"]
@@ -0,0 +1,27 @@
+from deal_store import DealStore
+from snapshot_store import SharedSnapshots
+
+
+def deals(ids):
+    return [{"id": i, "provider": f"f0{i}", "client": f"f1{i}", "stroagePrice": str(i * 10),
+             "startEpoch": i, "endEpoch": i + 10} for i in ids]
+
+
+def test_follower_loads_reuse_strings_of_deals_it_already_has(tmp_path):
+    refresher, follower = SharedSnapshots(str(tmp_path)), SharedSnapshots(str(tmp_path))
+    store = DealStore("mainnet")
+    store.ingest(deals(range(1, 6)))
+    refresher.publish_store("mainnet", store)
+    first, _, _ = follower.load_store("mainnet")
+
+    store.ingest(deals([0, 8, 9]))  # an older id merged in and newer ones appended
+    refresher.publish_store("mainnet", store)
+    second, _, _ = follower.load_store("mainnet")
+
+    assert second.ids.tolist() == [0, 1, 2, 3, 4, 5, 8, 9]
+    assert second.providers.tolist() == [f"f0{i}" for i in second.ids.tolist()]
+    assert second.clients.tolist() == [f"f1{i}" for i in second.ids.tolist()]
+    assert second.storage_prices.tolist() == [str(i * 10) for i in second.ids.tolist()]
+    # Rows the follower already had are the same objects, not re-decoded
+    assert second.providers[1] is first.providers[0]
+    assert follower.load_store("mainnet") is None  # unchanged file
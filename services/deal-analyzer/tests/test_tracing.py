@@ -0,0 +1,13 @@
+from fastapi.testclient import TestClient
+
+import main
+from metrics import REQUESTS
+
+
+def test_debug_timing_requests_keep_their_route_label(upstream):
+    counter = REQUESTS.labels("/api/mainnet/deals", "GET", "200")
+    before = counter._value.get()
+    response = TestClient(main.app).get("/api/mainnet/deals", params={"limit": 5, "debug_timing": 1})
+    assert response.status_code == 200
+    assert "debug_timing" in response.json()
+    assert counter._value.get() == before + 1
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Request Tracing
+Lightweight spans through the aggregator stages of a request: fetch
+(per upstream source), decompress, parse, analyse, compute and serialise.
+
+A request is traced when it is sampled (TRACE_SAMPLE_RATE, only with an
+exporter configured), when the caller sent a sampled W3C traceparent, or
+when it asks for ?debug_timing=1. The last one returns the per-stage
+breakdown in the response: a "debug_timing" field on JSON objects and a
+Server-Timing header.
+
+Finished traces are exported as OTLP/JSON (OpenTelemetry's wire format)
+to TRACE_OTLP_ENDPOINT (a collector's /v1/traces) and/or appended to
+TRACE_EXPORT_FILE, from a background thread so requests never wait on it.
+
+Outside a traced request span() is a context-variable read. Spans opened
+in CPU worker processes are collected there and re-parented here (see
+workers.py).
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from config import TRACE_EXPORT_FILE, TRACE_OTLP_ENDPOINT, TRACE_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "deal-analyzer"
+EXPORT_QUEUE_SIZE = 1000
+EXPORT_BATCH_SIZE = 50
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "stage", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, stage: str,
+                 attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.stage = stage
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+
+class Trace:
+    """Finished spans of one request (appended from any thread the request hops to)"""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans: List[Span] = []
+
+
+# (trace, innermost open span) for the running request; None when not tracing
+_current: contextvars.ContextVar[Optional[Tuple[Trace, Span]]] = contextvars.ContextVar("trace", default=None)
+
+
+class _SpanScope:
+    __slots__ = ("stage", "detail", "attributes", "trace", "span", "token")
+
+    def __init__(self, stage: str, detail: str, attributes: Dict[str, Any]):
+        self.stage = stage
+        self.detail = detail
+        self.attributes = attributes
+        self.span: Optional[Span] = None
+
+    def __enter__(self) -> "_SpanScope":
+        current = _current.get()
+        if current is not None:
+            self.trace, parent = current
+            name = f"{self.stage} {self.detail}" if self.detail else self.stage
+            self.span = Span(self.trace.trace_id, parent.span_id, name, self.stage, self.attributes)
+            self.token = _current.set((self.trace, self.span))
+        return self
+
+    def set(self, **attributes: Any):
+        """Attach attributes known only once the work is done (status, sizes)"""
+        if self.span is not None:
+            self.span.attributes.update(attributes)
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        if span is not None:
+            span.end_ns = time.time_ns()
+            if exc is not None:
+                span.error = f"{exc_type.__name__}: {exc}"
+            _current.reset(self.token)
+            self.trace.spans.append(span)
+        return False
+
+
+def span(stage: str, detail: str = "", **attributes: Any) -> _SpanScope:
+    """Time a block as one stage of the current request's trace (no-op when untraced)"""
+    return _SpanScope(stage, detail, attributes)
+
+
+def traced(stage: str, detail: Optional[str] = None) -> Callable:
+    """Decorator form of span(); detail defaults to the function's name"""
+    def decorate(fn: Callable) -> Callable:
+        name = detail or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with _SpanScope(stage, name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def active() -> bool:
+    return _current.get() is not None
+
+
+@contextmanager
+def collect():
+    """Trace the block under a placeholder root and yield the finished spans (CPU workers)"""
+    trace = Trace()
+    root = Span(trace.trace_id, None, "worker", "worker", {})
+    token = _current.set((trace, root))
+    try:
+        yield trace.spans
+    finally:
+        _current.reset(token)
+
+
+def adopt(spans: List[Span]):
+    """Attach spans collected in a worker under the current span"""
+    current = _current.get()
+    if current is None or not spans:
+        return
+    trace, parent = current
+    worker_ids = {s.span_id for s in spans}
+    for s in spans:
+        s.trace_id = trace.trace_id
+        if s.parent_id not in worker_ids:
+            s.parent_id = parent.span_id
+        trace.spans.append(s)
+
+
+# Request scope
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled) from a W3C traceparent header"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def exporting() -> bool:
+    return bool(TRACE_OTLP_ENDPOINT or TRACE_EXPORT_FILE)
+
+
+def should_sample(traceparent: Optional[Tuple[str, str, bool]]) -> bool:
+    if not exporting():
+        return False
+    if traceparent is not None:
+        return traceparent[2]
+    return TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+
+
+@contextmanager
+def request_trace(name: str, traceparent: Optional[Tuple[str, str, bool]] = None, **attributes: Any):
+    """Root span for one request; yields (trace, root span)"""
+    trace = Trace(traceparent[0] if traceparent else None)
+    root = Span(trace.trace_id, traceparent[1] if traceparent else None, name, "request", attributes)
+    token = _current.set((trace, root))
+    try:
+        yield trace, root
+    finally:
+        root.end_ns = time.time_ns()
+        _current.reset(token)
+        trace.spans.append(root)
+
+
+def breakdown(trace: Trace, root: Span) -> Dict[str, Any]:
+    """Per-stage timing of a trace so far: totals per stage plus the span list"""
+    end_ns = root.end_ns or time.time_ns()
+    spans = sorted((s for s in trace.spans if s is not root), key=lambda s: s.start_ns)
+    parents = {s.span_id: s for s in spans}
+
+    def depth(s: Span) -> int:
+        d = 0
+        while s.parent_id in parents:
+            s = parents[s.parent_id]
+            d += 1
+        return d
+
+    def nested_in_same_stage(s: Span) -> bool:
+        parent = parents.get(s.parent_id)
+        while parent is not None:
+            if parent.stage == s.stage:
+                return True
+            parent = parents.get(parent.parent_id)
+        return False
+
+    by_stage: Dict[str, float] = {}
+    for s in spans:
+        if not nested_in_same_stage(s):
+            by_stage[s.stage] = by_stage.get(s.stage, 0.0) + (s.end_ns - s.start_ns) / 1e6
+    return {
+        "trace_id": trace.trace_id,
+        "total_ms": round((end_ns - root.start_ns) / 1e6, 3),
+        "by_stage_ms": {stage: round(ms, 3) for stage, ms in by_stage.items()},
+        "spans": [{
+            "name": s.name,
+            "stage": s.stage,
+            "depth": depth(s),
+            "start_ms": round((s.start_ns - root.start_ns) / 1e6, 3),
+            "duration_ms": round((s.end_ns - s.start_ns) / 1e6, 3),
+            **({"error": s.error} if s.error else {}),
+        } for s in spans],
+    }
+
+
+def server_timing(summary: Dict[str, Any]) -> str:
+    """Server-Timing header value from breakdown()"""
+    entries = [f"{stage};dur={ms}" for stage, ms in summary["by_stage_ms"].items()]
+    entries.append(f"total;dur={summary['total_ms']}")
+    return ", ".join(entries)
+
+
+# OTLP/JSON export
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """ExportTraceServiceRequest (OTLP/JSON) for finished traces"""
+    spans = []
+    for trace in traces:
+        for s in trace.spans:
+            otlp_span = {
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 2 if s.stage == "request" else 1,  # SERVER / INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [_attribute("stage", s.stage)] + [_attribute(k, v) for k, v in s.attributes.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 0},
+            }
+            if s.parent_id:
+                otlp_span["parentSpanId"] = s.parent_id
+            spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+        "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": spans}],
+    }]}
+
+
+class TraceExporter:
+    """Background batch export; drops traces rather than blocking when the queue is full"""
+
+    def __init__(self, endpoint: str = TRACE_OTLP_ENDPOINT, path: str = TRACE_EXPORT_FILE):
+        self.endpoint = endpoint
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, trace: Trace):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.export(batch)
+
+    def export(self, batch: List[Trace]):
+        payload = json.dumps(to_otlp(batch), separators=(",", ":"))
+        if self.path:
+            try:
+                with open(self.path, "a") as f:
+                    f.write(payload + "\n")
+            except OSError as e:
+                logger.error(f"Trace export to {self.path} failed: {e}")
+        if self.endpoint:
+            try:
+                requests.post(self.endpoint, data=payload, headers={"Content-Type": "application/json"}, timeout=5)
+            except requests.RequestException as e:
+                logger.error(f"Trace export to {self.endpoint} failed: {e}")
+
+
+exporter = TraceExporter() if exporting() else None
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware opening the request's root span. For ?debug_timing=1
+    it also disables response compression (so the body can be amended) and
+    adds the breakdown as a Server-Timing header and a "debug_timing" field.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        query = scope.get("query_string", b"")
+        debug = b"debug_timing=" in query and _debug_requested(query)
+        traceparent = None
+        if exporting():
+            for key, value in scope["headers"]:
+                if key == b"traceparent":
+                    traceparent = parse_traceparent(value.decode("latin-1"))
+        if not debug and not should_sample(traceparent):
+            await self.app(scope, receive, send)
+            return
+
+        if debug:
+            # In place, not a copy: outer middlewares (metrics) read the route the router sets on this dict
+            scope["headers"] = [(k, v) for k, v in scope["headers"] if k != b"accept-encoding"]
+        with request_trace(f"{scope['method']} {scope['path']}", traceparent,
+                           **{"http.method": scope["method"], "http.target": scope["path"]}) as (trace, root):
+            if debug:
+                await self.app(scope, receive, _DebugTimingSender(send, trace, root))
+            else:
+                await self.app(scope, receive, send)
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+        if exporter is not None:
+            exporter.submit(trace)
+
+
+def _debug_requested(query: bytes) -> bool:
+    for pair in query.split(b"&"):
+        key, _, value = pair.partition(b"=")
+        if key == b"debug_timing":
+            return value.lower() in (b"1", b"true", b"yes")
+    return False
+
+
+class _DebugTimingSender:
+    """
+    Buffers a JSON response to add the timing breakdown before it goes out;
+    other responses (streams, exports) only get the Server-Timing header
+    """
+
+    def __init__(self, send, trace: Trace, root: Span):
+        self.send = send
+        self.trace = trace
+        self.root = root
+        self.start: Optional[Dict[str, Any]] = None
+        self.body: List[bytes] = []
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            if dict(message["headers"]).get(b"content-type", b"").startswith(b"application/json"):
+                self.start = message
+                return
+            timing = server_timing(breakdown(self.trace, self.root)).encode("latin-1")
+            message = {**message, "headers": [*message["headers"], (b"server-timing", timing)]}
+        if message["type"] != "http.response.body" or self.start is None:
+            await self.send(message)
+            return
+        self.body.append(message.get("body", b""))
+        if message.get("more_body", False):
+            return
+
+        summary = breakdown(self.trace, self.root)
+        body = b"".join(self.body)
+        headers = [(k, v) for k, v in self.start["headers"] if k != b"content-length"]
+        try:
+            payload = json.loads(body)
+            if isinstance(payload, dict):
+                payload["debug_timing"] = summary
+                body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        except ValueError:
+            pass
+        headers.append((b"server-timing", server_timing(summary).encode("latin-1")))
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await self.send({**self.start, "headers": headers})
+        await self.send({"type": "http.response.body", "body": body, "more_body": False})
@@ -4,19 +4,31 @@ Unified Filecoin Deal Data Aggregator
 Handles both mainnet and testnet data sources
 """
 
-import requests
 import json
-import pandas as pd
 import io
 import time
+import hashlib
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable
+from threading import Lock
 import logging
 
+from cache import SimpleCache
+import upstream
+from metrics import cache_counters, parse_timer
+from tracing import span, traced
+from workers import run_cpu_bound_sync
+from snapshot_store import shared_fetch
+from config import (CACHE_TTL, UNIFIED_SOURCE_TTLS, UNIFIED_ERROR_TTL, SHARED_PARQUET_MAX_AGE,
+                    FILFOX_API_URL, CALIBRATION_FILFOX_API_URL, TESTNET_FILFOX_API_URL,
+                    DAILY_METRICS_PARQUET_URL, DUNE_API_URL, CALIBRATION_RPC_URL, TESTNET_RPC_URL)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_source_hit, _source_miss = cache_counters("unified_sources")
+
 class UnifiedFilecoinAggregator:
     """
     Unified aggregator for both mainnet and testnet Filecoin data
@@ -33,20 +45,52 @@ class UnifiedFilecoinAggregator:
         
         # Mainnet data sources (reliable APIs)
         self.mainnet_sources = {
-            "filfox": "https://filfox.info/api/v1",
-            "parquet": "https://data.filecoindataportal.xyz/filecoin_daily_metrics.parquet",
+            "filfox": FILFOX_API_URL,
+            "parquet": DAILY_METRICS_PARQUET_URL,
             "dune_api_key": "yUFhkcCEsErWy5fZ8XQLt8tsKlSG4I0q",
             "dune_query_id": 3302707
         }
         
         # Testnet data sources
         self.testnet_sources = {
-            "calibration_rpc": "https://api.zondax.ch/fil/node/calibration/rpc/v1",
-            "testnet_rpc": "https://api.zondax.ch/fil/node/testnet/rpc/v1",
-            "calibration_filfox": "https://calibration.filfox.info/api/v1",
-            "testnet_filfox": "https://testnet.filfox.info/api/v1"
+            "calibration_rpc": CALIBRATION_RPC_URL,
+            "testnet_rpc": TESTNET_RPC_URL,
+            "calibration_filfox": CALIBRATION_FILFOX_API_URL,
+            "testnet_filfox": TESTNET_FILFOX_API_URL
         }
+        
+        # Memoised sub-source results, each expiring with its source's freshness
+        self._cache = SimpleCache(ttl=CACHE_TTL)
+        self._analysis = None
+        self._analysis_sources = None
+    
+    def _memoised(self, source: str, fetch: Callable[[], Dict[str, Any]], key: Any = None) -> Dict[str, Any]:
+        """Return the cached result for a sub-source, fetching it once it has gone stale"""
+        cache_key = (source, key)
+        result = self._cache.get(cache_key)
+        (_source_miss if result is None else _source_hit).inc()
+        if result is None:
+            result = fetch()
+            ttl = UNIFIED_ERROR_TTL if "error" in result else UNIFIED_SOURCE_TTLS.get(source, CACHE_TTL)
+            self._cache.set(cache_key, result, ttl=ttl)
+        return result
+    
+    def invalidate(self, source: Optional[str] = None):
+        """Force a refetch of one sub-source (or all of them) on next use"""
+        if source is None:
+            self._cache.invalidate()
+        else:
+            for cache_key in [k for k in list(self._cache.data) if k[0] == source]:
+                self._cache.invalidate(cache_key)
     
+    def cache_entries(self):
+        """Memoised sources as (key, value, expires) triples (for warm-start checkpoints)"""
+        return self._cache.entries()
+    
+    def restore_cache(self, entries) -> int:
+        return self._cache.restore(entries)
+    
+    @traced("source", "network_info")
     def get_network_info(self) -> Dict[str, Any]:
         """Get basic network information"""
         if self.network == "mainnet":
@@ -69,10 +113,10 @@ class UnifiedFilecoinAggregator:
                 
                 # Try calibration first
                 try:
-                    resp = requests.post(self.testnet_sources["calibration_rpc"], 
+                    resp = upstream.post(self.testnet_sources["calibration_rpc"], 
                                        data=json.dumps(payload), headers=headers, timeout=10)
                     resp.raise_for_status()
-                    data = resp.json()
+                    data = upstream.parse_json(resp)
                     network_name = data.get("result", "calibration")
                     
                     return {
@@ -84,10 +128,10 @@ class UnifiedFilecoinAggregator:
                     }
                 except:
                     # Try testnet as fallback
-                    resp = requests.post(self.testnet_sources["testnet_rpc"], 
+                    resp = upstream.post(self.testnet_sources["testnet_rpc"], 
                                        data=json.dumps(payload), headers=headers, timeout=10)
                     resp.raise_for_status()
-                    data = resp.json()
+                    data = upstream.parse_json(resp)
                     network_name = data.get("result", "testnet")
                     
                     return {
@@ -107,6 +151,7 @@ class UnifiedFilecoinAggregator:
                     "error": str(e)
                 }
     
+    @traced("source", "deals")
     def get_recent_deals(self, limit: int = 50) -> Dict[str, Any]:
         """Get recent deals from the specified network"""
         if self.network == "mainnet":
@@ -120,9 +165,9 @@ class UnifiedFilecoinAggregator:
             url = f"{self.mainnet_sources['filfox']}/deal/list"
             params = {"limit": limit}
             
-            response = requests.get(url, params=params, timeout=15)
+            response = upstream.get(url, params=params, timeout=15)
             response.raise_for_status()
-            data = response.json()
+            data = upstream.parse_json(response)
             
             deals = data.get("deals", [])
             analytics = self._analyze_deals(deals)
@@ -149,9 +194,9 @@ class UnifiedFilecoinAggregator:
                 url = f"{self.testnet_sources['calibration_filfox']}/deal/list"
                 params = {"limit": limit}
                 
-                response = requests.get(url, params=params, timeout=15)
+                response = upstream.get(url, params=params, timeout=15)
                 response.raise_for_status()
-                data = response.json()
+                data = upstream.parse_json(response)
                 
                 deals = data.get("deals", [])
                 analytics = self._analyze_deals(deals)
@@ -173,9 +218,9 @@ class UnifiedFilecoinAggregator:
                 url = f"{self.testnet_sources['testnet_filfox']}/deal/list"
                 params = {"limit": limit}
                 
-                response = requests.get(url, params=params, timeout=15)
+                response = upstream.get(url, params=params, timeout=15)
                 response.raise_for_status()
-                data = response.json()
+                data = upstream.parse_json(response)
                 
                 deals = data.get("deals", [])
                 analytics = self._analyze_deals(deals)
@@ -194,6 +239,7 @@ class UnifiedFilecoinAggregator:
             logger.error(f"Error fetching testnet deals: {e}")
             return {"error": str(e)}
     
+    @traced("analyse")
     def _analyze_deals(self, deals: List[Dict]) -> Dict[str, Any]:
         """Analyze deals data for insights"""
         if not deals:
@@ -234,44 +280,62 @@ class UnifiedFilecoinAggregator:
             }
         }
     
+    @traced("source", "historical")
     def get_historical_metrics(self, days: int = 30) -> Dict[str, Any]:
         """Get historical metrics (mainnet only)"""
         if self.network != "mainnet":
             return {"error": "Historical metrics only available for mainnet"}
         
         try:
-            response = requests.get(self.mainnet_sources["parquet"], timeout=30)
-            response.raise_for_status()
-            
-            df = pd.read_parquet(io.BytesIO(response.content))
-            df["date"] = pd.to_datetime(df["date"])
-            
-            # Filter for recent days
-            cutoff_date = datetime.now() - timedelta(days=days)
-            recent_df = df[df["date"] >= cutoff_date].copy()
-            
-            if recent_df.empty:
-                return {"error": "No recent data available"}
+            content, _ = shared_fetch("daily_metrics.parquet", self._download_parquet, SHARED_PARQUET_MAX_AGE)
             
-            # Get latest data
-            latest = recent_df.iloc[-1]
-            
-            return {
-                "source": "mainnet_parquet",
-                "network": "mainnet",
-                "timestamp": datetime.now().isoformat(),
-                "analysis_period_days": days,
-                "metrics": {
-                    "daily_new_deals": int(latest['deals']),
-                    "verified_deals_percentage": float((latest['verified_deals'] / latest['deals']) * 100) if latest['deals'] > 0 else 0,
-                    "data_stored_pibs": float(latest['data_on_active_deals_pibs']) if 'data_on_active_deals_pibs' in latest else 0,
-                    "unique_data_ratio": float(latest['unique_data_onboarded_ratio']) if 'unique_data_onboarded_ratio' in latest else 0
-                }
-            }
+            # Decoding and analysis go to the CPU worker pool when one is running
+            return run_cpu_bound_sync(self._analyze_historical_parquet, content, days)
             
         except Exception as e:
             return {"error": f"Failed to fetch historical data: {e}"}
     
+    def _download_parquet(self):
+        response = upstream.get(self.mainnet_sources["parquet"], timeout=30)
+        response.raise_for_status()
+        data_version = (response.headers.get("ETag") or response.headers.get("Last-Modified")
+                        or hashlib.sha1(response.content).hexdigest())
+        return response.content, data_version
+    
+    @staticmethod
+    @traced("analyse")
+    def _analyze_historical_parquet(content: bytes, days: int) -> Dict[str, Any]:
+        """CPU-bound stage: decode the parquet and summarise the latest day (static so it pickles without the cache)"""
+        import pandas as pd  # deferred: only the parquet stages need it
+        
+        with parse_timer("parquet", "parquet"), span("parse", "parquet", format="parquet"):
+            df = pd.read_parquet(io.BytesIO(content))
+        df["date"] = pd.to_datetime(df["date"])
+        
+        # Filter for recent days
+        cutoff_date = datetime.now() - timedelta(days=days)
+        recent_df = df[df["date"] >= cutoff_date].copy()
+        
+        if recent_df.empty:
+            return {"error": "No recent data available"}
+        
+        # Get latest data
+        latest = recent_df.iloc[-1]
+        
+        return {
+            "source": "mainnet_parquet",
+            "network": "mainnet",
+            "timestamp": datetime.now().isoformat(),
+            "analysis_period_days": days,
+            "metrics": {
+                "daily_new_deals": int(latest['deals']),
+                "verified_deals_percentage": float((latest['verified_deals'] / latest['deals']) * 100) if latest['deals'] > 0 else 0,
+                "data_stored_pibs": float(latest['data_on_active_deals_pibs']) if 'data_on_active_deals_pibs' in latest else 0,
+                "unique_data_ratio": float(latest['unique_data_onboarded_ratio']) if 'unique_data_onboarded_ratio' in latest else 0
+            }
+        }
+    
+    @traced("source", "network_metrics")
     def get_network_metrics(self) -> Dict[str, Any]:
         """Get network metrics"""
         if self.network == "mainnet":
@@ -288,27 +352,28 @@ class UnifiedFilecoinAggregator:
             }
             
             # Start execution
-            start_url = f"https://api.dune.com/api/v1/query/{self.mainnet_sources['dune_query_id']}/execute"
-            resp = requests.post(start_url, headers=headers, timeout=30)
+            start_url = f"{DUNE_API_URL}/query/{self.mainnet_sources['dune_query_id']}/execute"
+            resp = upstream.post(start_url, headers=headers, timeout=30)
             resp.raise_for_status()
-            execution_id = resp.json()["execution_id"]
+            execution_id = upstream.parse_json(resp)["execution_id"]
             
             # Poll for completion
             max_attempts = 30
             for attempt in range(max_attempts):
-                status_url = f"https://api.dune.com/api/v1/execution/{execution_id}/status"
-                status = requests.get(status_url, headers=headers).json()
+                status_url = f"{DUNE_API_URL}/execution/{execution_id}/status"
+                status = upstream.parse_json(upstream.get(status_url, headers=headers))
                 
                 if status["state"] == "QUERY_STATE_COMPLETED":
                     break
                 elif status["state"].startswith("QUERY_STATE_FAILED"):
                     raise Exception("Dune query failed")
                 
-                time.sleep(2)
+                with span("wait", "dune"):
+                    time.sleep(2)
             
             # Fetch results
-            results_url = f"https://api.dune.com/api/v1/execution/{execution_id}/results"
-            results = requests.get(results_url, headers=headers).json()
+            results_url = f"{DUNE_API_URL}/execution/{execution_id}/results"
+            results = upstream.parse_json(upstream.get(results_url, headers=headers))
             rows = results["result"]["rows"]
             
             if not rows:
@@ -352,10 +417,10 @@ class UnifiedFilecoinAggregator:
             
             # Try calibration first
             try:
-                resp = requests.post(self.testnet_sources["calibration_rpc"], 
+                resp = upstream.post(self.testnet_sources["calibration_rpc"], 
                                    data=json.dumps(head_payload), headers=headers, timeout=10)
                 resp.raise_for_status()
-                head_data = resp.json()
+                head_data = upstream.parse_json(resp)
                 chain_head = head_data.get("result", {})
                 
                 return {
@@ -373,10 +438,10 @@ class UnifiedFilecoinAggregator:
                 logger.warning(f"Calibration RPC failed: {e}")
                 
                 # Try testnet as fallback
-                resp = requests.post(self.testnet_sources["testnet_rpc"], 
+                resp = upstream.post(self.testnet_sources["testnet_rpc"], 
                                    data=json.dumps(head_payload), headers=headers, timeout=10)
                 resp.raise_for_status()
-                head_data = resp.json()
+                head_data = upstream.parse_json(resp)
                 chain_head = head_data.get("result", {})
                 
                 return {
@@ -395,45 +460,58 @@ class UnifiedFilecoinAggregator:
             return {"error": str(e)}
     
     def get_comprehensive_analysis(self) -> Dict[str, Any]:
-        """Get comprehensive analysis for the specified network"""
-        logger.info(f"Starting comprehensive {self.network} analysis...")
-        
-        results = {
-            "timestamp": datetime.now().isoformat(),
-            "network": self.network,
-            "sources": {}
-        }
+        """
+        Get comprehensive analysis for the specified network.
+        Sub-sources are memoised; when none of them has been refetched the
+        previous analysis is returned as is.
+        """
+        sources = {}
         
         # Get network info
-        results["sources"]["network_info"] = self.get_network_info()
+        sources["network_info"] = self._memoised("network_info", self.get_network_info)
         
         # Get recent deals
         try:
-            results["sources"]["deals"] = self.get_recent_deals()
+            sources["deals"] = self._memoised("deals", self.get_recent_deals, key=50)
         except Exception as e:
             logger.error(f"Deals error: {e}")
-            results["sources"]["deals"] = {"error": str(e)}
+            sources["deals"] = {"error": str(e)}
         
         # Get network metrics
         try:
-            results["sources"]["network_metrics"] = self.get_network_metrics()
+            sources["network_metrics"] = self._memoised("network_metrics", self.get_network_metrics)
         except Exception as e:
             logger.error(f"Network metrics error: {e}")
-            results["sources"]["network_metrics"] = {"error": str(e)}
+            sources["network_metrics"] = {"error": str(e)}
         
         # Get historical metrics (mainnet only)
         if self.network == "mainnet":
             try:
-                results["sources"]["historical"] = self.get_historical_metrics()
+                sources["historical"] = self._memoised("historical", self.get_historical_metrics)
             except Exception as e:
                 logger.error(f"Historical error: {e}")
-                results["sources"]["historical"] = {"error": str(e)}
+                sources["historical"] = {"error": str(e)}
+        
+        # Same source objects as last time: nothing to recompute
+        source_ids = {name: id(result) for name, result in sources.items()}
+        if self._analysis is not None and source_ids == self._analysis_sources:
+            return self._analysis
+        
+        logger.info(f"Building comprehensive {self.network} analysis...")
+        results = {
+            "timestamp": datetime.now().isoformat(),
+            "network": self.network,
+            "sources": sources
+        }
         
         # Generate insights
         results["insights"] = self._generate_insights(results["sources"])
         
+        self._analysis = results
+        self._analysis_sources = source_ids
         return results
     
+    @traced("analyse")
     def _generate_insights(self, sources: Dict[str, Any]) -> Dict[str, Any]:
         """Generate insights from data sources"""
         insights = {
@@ -474,6 +552,22 @@ class UnifiedFilecoinAggregator:
         
         return insights
 
+# Long-lived per-network instances shared by the API
+_aggregators: Dict[str, UnifiedFilecoinAggregator] = {}
+_aggregators_lock = Lock()
+
+def get_unified_aggregator(network: str) -> UnifiedFilecoinAggregator:
+    """Return the shared aggregator for a network, creating it on first use"""
+    with _aggregators_lock:
+        if network not in _aggregators:
+            _aggregators[network] = UnifiedFilecoinAggregator(network)
+        return _aggregators[network]
+
+def active_unified_aggregators() -> Dict[str, UnifiedFilecoinAggregator]:
+    """The aggregators created so far, by network"""
+    with _aggregators_lock:
+        return dict(_aggregators)
+
 # Example usage
 if __name__ == "__main__":
     print("=== Unified Filecoin Deal Data Aggregator ===\n")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Upstream HTTP Calls
+Drop-in wrappers for requests.get / requests.post that record latency,
+outcome and bytes downloaded per upstream source (and a "fetch" trace
+span), plus parse_json() which times decoding. The source is identified
+from the configured base URLs, so every Filfox network, the parquet, Dune
+and each RPC endpoint get their own series.
+"""
+
+import time
+from typing import Any
+
+import requests
+
+from config import (CALIBRATION_FILFOX_API_URL, CALIBRATION_RPC_URL, DAILY_METRICS_PARQUET_URL, DUNE_API_URL,
+                    FILFOX_API_URL, TESTNET_FILFOX_API_URL, TESTNET_RPC_URL)
+from metrics import parse_timer, record_upstream
+from tracing import span
+
+# Longest prefix first, so overlapping base URLs resolve to the most specific source
+SOURCES = sorted([
+    ("filfox_mainnet", FILFOX_API_URL),
+    ("filfox_calibration", CALIBRATION_FILFOX_API_URL),
+    ("filfox_testnet", TESTNET_FILFOX_API_URL),
+    ("parquet", DAILY_METRICS_PARQUET_URL),
+    ("dune", DUNE_API_URL),
+    ("rpc_calibration", CALIBRATION_RPC_URL),
+    ("rpc_testnet", TESTNET_RPC_URL),
+], key=lambda source: len(source[1]), reverse=True)
+
+
+def source_for(url: str) -> str:
+    for name, base in SOURCES:
+        if url.startswith(base):
+            return name
+    return "other"
+
+
+def request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    source = source_for(url)
+    start = time.perf_counter()
+    with span("fetch", source, **{"http.method": method}) as scope:
+        try:
+            response = requests.request(method, url, **kwargs)
+        except requests.RequestException:
+            record_upstream(source, "error", time.perf_counter() - start, 0)
+            raise
+        # Non-streamed bodies are already read, so this times the full download
+        size = int(response.headers.get("Content-Length") or 0) if kwargs.get("stream") else len(response.content)
+        record_upstream(source, f"{response.status_code // 100}xx", time.perf_counter() - start, size)
+        scope.set(**{"http.status_code": response.status_code, "bytes": size})
+    return response
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def parse_json(response: requests.Response) -> Any:
+    """response.json(), timed per source"""
+    source = source_for(response.url)
+    with parse_timer(source, "json"), span("parse", source, format="json"):
+        return response.json()
@@ -4,11 +4,22 @@ Filecoin Storage Advisor for Users
 Helps users make informed decisions about storing data on Filecoin
 """
 
-import requests
-import pandas as pd
 import io
+import hashlib
 from datetime import datetime, timedelta
 import json
+from typing import TYPE_CHECKING
+
+import upstream
+from forecast import apply_forecast, cached_forecast
+from metrics import parse_timer
+from tracing import span, traced
+from workers import run_cpu_bound_sync
+from snapshot_store import shared_fetch
+from config import SHARED_PARQUET_MAX_AGE, DAILY_METRICS_PARQUET_URL, SIMULATION_MAX_DRAWS
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported lazily where used
 
 class FilecoinStorageAdvisor:
     """
@@ -17,41 +28,74 @@ class FilecoinStorageAdvisor:
     """
     
     def __init__(self):
-        self.parquet_url = "https://data.filecoindataportal.xyz/filecoin_daily_metrics.parquet"
+        self.parquet_url = DAILY_METRICS_PARQUET_URL
         
     def get_market_analysis(self, days: int = 30):
         """Get comprehensive market analysis for storage decisions"""
         try:
-            import sys
-            # Don't print to stdout when called from API (stderr is fine)
-            print("Fetching Filecoin storage market data...", file=sys.stderr)
-            response = requests.get(self.parquet_url, timeout=30)
-            response.raise_for_status()
-            
-            df = pd.read_parquet(io.BytesIO(response.content))
-            df["date"] = pd.to_datetime(df["date"])
-            
-            # Get recent data
-            cutoff_date = datetime.now() - timedelta(days=days)
-            recent_df = df[df["date"] >= cutoff_date].copy()
-            
-            if recent_df.empty:
-                return {"error": "No recent data available"}
-            
-            # Calculate key metrics for users
-            analysis = self._analyze_for_users(recent_df)
-            
-            return {
-                "timestamp": datetime.now().isoformat(),
-                "analysis_period_days": days,
-                "market_insights": analysis,
-                "recommendations": self._generate_recommendations(analysis)
-            }
+            content, data_version = self.fetch_parquet()
+            # Decoding and analysis go to the CPU worker pool when one is running
+            return run_cpu_bound_sync(self.analyze_parquet, content, days, data_version)
             
         except Exception as e:
             return {"error": f"Failed to fetch market data: {e}"}
     
-    def _analyze_for_users(self, df: pd.DataFrame):
+    def fetch_parquet(self):
+        """Daily metrics parquet as (content, data_version), downloaded once per host when workers share snapshots"""
+        return shared_fetch("daily_metrics.parquet", self._download_parquet, SHARED_PARQUET_MAX_AGE)
+    
+    def _download_parquet(self):
+        import sys
+        # Don't print to stdout when called from API (stderr is fine)
+        print("Fetching Filecoin storage market data...", file=sys.stderr)
+        response = upstream.get(self.parquet_url, timeout=30)
+        response.raise_for_status()
+        # Identifies this parquet snapshot (used for HTTP ETags)
+        data_version = (response.headers.get("ETag") or response.headers.get("Last-Modified")
+                        or hashlib.sha1(response.content).hexdigest())
+        return response.content, data_version
+    
+    @traced("analyse")
+    def analyze_parquet(self, content: bytes, days: int, data_version: str):
+        """CPU-bound stage: decode the parquet and analyse the last `days` days"""
+        return self.analyze_frame(self.load_parquet(content), days, data_version)
+    
+    def load_parquet(self, content: bytes) -> "pd.DataFrame":
+        """Decode the daily metrics parquet"""
+        import pandas as pd  # deferred: only the parquet stages need it
+        
+        with parse_timer("parquet", "parquet"), span("parse", "parquet", format="parquet"):
+            df = pd.read_parquet(io.BytesIO(content))
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+    
+    def analyze_frame(self, df: "pd.DataFrame", days: int, data_version: str):
+        """Analyse the last `days` days of a decoded parquet"""
+        # Get recent data
+        cutoff_date = datetime.now() - timedelta(days=days)
+        recent_df = df[df["date"] >= cutoff_date].copy()
+        
+        if recent_df.empty:
+            return {"error": "No recent data available"}
+        
+        # Calculate key metrics for users
+        analysis = self._analyze_for_users(recent_df)
+        
+        # Forecast from the full history, fitted once per parquet version
+        if "deal_storage_cost_fil" in df.columns:
+            forecast = cached_forecast(data_version, df["date"].to_numpy(), df["deal_storage_cost_fil"].to_numpy())
+            if forecast is not None:
+                apply_forecast(analysis["pricing"], forecast)
+        
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "data_version": data_version,
+            "analysis_period_days": days,
+            "market_insights": analysis,
+            "recommendations": self._generate_recommendations(analysis)
+        }
+    
+    def _analyze_for_users(self, df: "pd.DataFrame"):
         """Analyze data from a user's perspective"""
         
         # Get latest data
@@ -129,7 +173,11 @@ class FilecoinStorageAdvisor:
         activity = analysis.get("market_activity", {})
         
         # Pricing recommendations
-        if pricing.get("price_trend") == "increasing":
+        forecast = pricing.get("forecast")
+        if forecast:
+            if forecast["decision"] != "neutral":
+                recommendations.append(self._forecast_recommendation(forecast))
+        elif pricing.get("price_trend") == "increasing":
             recommendations.append({
                 "category": "Pricing",
                 "priority": "High",
@@ -177,6 +225,48 @@ class FilecoinStorageAdvisor:
         
         return recommendations
     
+    def _forecast_recommendation(self, forecast: dict) -> dict:
+        """Pricing recommendation from the price forecast's wait / buy-now call"""
+        outlook = (f"Storage costs are forecast to move {forecast['expected_change_percent']:+.1f}% "
+                   f"over the next {forecast['horizon_days']} days")
+        lower = forecast["probability_lower_at_horizon"]
+        if forecast["decision"] == "buy_now":
+            return {
+                "category": "Pricing",
+                "priority": "High",
+                "message": f"{outlook} ({1 - lower:.0%} chance that waiting costs more). "
+                           "Consider making deals soon to lock in current rates.",
+                "action": "Act quickly to secure current pricing"
+            }
+        return {
+            "category": "Pricing",
+            "priority": "Medium",
+            "message": f"{outlook} ({lower:.0%} chance of a lower price by then). "
+                       "You might get better rates by waiting.",
+            "action": "Monitor prices for optimal timing"
+        }
+    
+    def simulate_storage_cost(self, size_tib: float, days: int, replicas: int = 1, trials: int = 100_000,
+                              verified=None, deals=None):
+        """Monte Carlo cost percentiles; samples `deals` (a DealBatch) or the latest Filfox deals"""
+        from simulator import simulate_storage_cost
+        
+        if deals is None:
+            deals = self.fetch_recent_deals()
+            if isinstance(deals, dict):
+                return deals
+        return simulate_storage_cost(deals, size_tib, days, replicas, trials, verified, lookback_days=0)
+    
+    def fetch_recent_deals(self):
+        """Latest Filfox deals as a DealBatch, or an error dict"""
+        from data_aggregator import FilecoinDealDataAggregator
+        from deal_batch import DealBatch
+        
+        page = FilecoinDealDataAggregator().get_recent_deals_from_filfox(limit=100)
+        if "error" in page:
+            return {"error": f"Failed to fetch deals: {page['error']}"}
+        return DealBatch(page.get("deals", []), network="mainnet")
+    
     def get_storage_decision_framework(self):
         """Provide a framework for making storage decisions"""
         return {
@@ -237,6 +327,173 @@ class FilecoinStorageAdvisor:
             ]
         }
 
+SCENARIO_DEFAULTS = {"days": 365, "replicas": 1, "trials": 100_000, "verified": None}
+
+
+def _json_report(advisor: FilecoinStorageAdvisor, analysis: dict) -> dict:
+    """--json output for one analysis"""
+    return {
+        "market_insights": analysis["market_insights"],
+        "recommendations": analysis["recommendations"],
+        "decision_framework": advisor.get_storage_decision_framework(),
+        "timestamp": analysis["timestamp"],
+        "analysis_period_days": analysis["analysis_period_days"]
+    }
+
+
+def _print_console_report(advisor: FilecoinStorageAdvisor, analysis: dict, simulations: list, out=None):
+    """Console output for one analysis and its (scenario, simulation) pairs"""
+    insights = analysis["market_insights"]
+    recommendations = analysis["recommendations"]
+    
+    print("\n📈 Current Market Overview:", file=out)
+    print(f"   Daily new deals: {insights['current_market']['daily_new_deals']:,}", file=out)
+    print(f"   Verified deals: {insights['current_market']['verified_deals_percentage']:.1f}%", file=out)
+    print(f"   Market activity: {insights['market_activity']['market_activity_level']}", file=out)
+    
+    print(f"\n💰 Pricing Information:", file=out)
+    print(f"   Current cost: {insights['pricing']['current_storage_cost']:.2e} attoFIL", file=out)
+    print(f"   Price trend: {insights['pricing']['price_trend']}", file=out)
+    print(f"   Price change: {insights['pricing']['price_change_percent']:+.1f}%", file=out)
+    forecast = insights["pricing"].get("forecast")
+    if forecast:
+        print(f"   {forecast['horizon_days']}-day forecast: {forecast['expected_change_percent']:+.1f}% "
+              f"(P(lower) {forecast['probability_lower_at_horizon']:.0%}, {forecast['decision'].replace('_', ' ')})",
+              file=out)
+    
+    print(f"\n📊 Data Efficiency:", file=out)
+    print(f"   Unique data ratio: {insights['data_efficiency']['unique_data_ratio']:.1%}", file=out)
+    print(f"   Efficiency level: {insights['data_efficiency']['data_deduplication_efficiency']}", file=out)
+    
+    for scenario, simulation in simulations:
+        print(f"\n🎲 Cost Simulation ({scenario['size_tib']:g} TiB, {scenario['days']} days, "
+              f"{scenario['replicas']} replica(s)):", file=out)
+        if "error" in simulation:
+            print(f"   ❌ {simulation['error']}", file=out)
+        else:
+            cost = simulation["cost_fil"]
+            print(f"   Median: {cost['p50']:.4f} FIL   (p5 {cost['p5']:.4f} – p95 {cost['p95']:.4f} FIL)", file=out)
+            print(f"   Mean: {cost['mean']:.4f} FIL, chance of free storage: {simulation['probability_free']:.0%}",
+                  file=out)
+            print(f"   Sampled {simulation['sample']['deals']} deals from {simulation['sample']['providers']} providers, "
+                  f"{simulation['trials']:,} trials in {simulation['elapsed_ms']:.0f} ms", file=out)
+    
+    print(f"\n💡 Recommendations:", file=out)
+    for i, rec in enumerate(recommendations, 1):
+        print(f"   {i}. [{rec['priority']}] {rec['message']}", file=out)
+        print(f"      Action: {rec['action']}", file=out)
+    
+    print(f"\n🎯 Decision Framework:", file=out)
+    framework = advisor.get_storage_decision_framework()
+    for factor, details in framework["decision_factors"].items():
+        print(f"   {factor.title()}: {details['description']} ({details['importance']} priority)", file=out)
+    
+    print(f"\n✅ Decision Checklist:", file=out)
+    for i, item in enumerate(framework["decision_checklist"], 1):
+        print(f"   {i}. {item}", file=out)
+
+
+def _parse_query(raw, default_days: int) -> dict:
+    """Validate one batch query line (already JSON-decoded); raises ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError("query must be a JSON object")
+    days = raw.get("days", default_days)
+    if not isinstance(days, int) or isinstance(days, bool) or days < 1:
+        raise ValueError("days must be a positive integer")
+    output = raw.get("format", "json")
+    if output not in ("json", "console"):
+        raise ValueError("format must be 'json' or 'console'")
+    scenarios = raw.get("scenarios", [])
+    if not isinstance(scenarios, list):
+        raise ValueError("scenarios must be a list")
+    parsed = []
+    for scenario in scenarios:
+        if not isinstance(scenario, dict) or "size_tib" not in scenario:
+            raise ValueError("each scenario needs size_tib")
+        unknown = set(scenario) - set(SCENARIO_DEFAULTS) - {"size_tib"}
+        if unknown:
+            raise ValueError(f"unknown scenario fields: {', '.join(sorted(unknown))}")
+        scenario = {**SCENARIO_DEFAULTS, **scenario}
+        if not isinstance(scenario["size_tib"], (int, float)) or scenario["size_tib"] <= 0:
+            raise ValueError("size_tib must be a positive number")
+        for field in ("days", "replicas", "trials"):
+            if not isinstance(scenario[field], int) or isinstance(scenario[field], bool) or scenario[field] < 1:
+                raise ValueError(f"{field} must be a positive integer")
+        if scenario["trials"] * scenario["replicas"] > SIMULATION_MAX_DRAWS:
+            raise ValueError(f"trials x replicas must be at most {SIMULATION_MAX_DRAWS:,}")
+        if scenario["verified"] not in (None, True, False):
+            raise ValueError("verified must be true, false or null")
+        parsed.append(scenario)
+    return {"id": raw.get("id"), "days": days, "format": output, "scenarios": parsed}
+
+
+def run_batch(advisor: FilecoinStorageAdvisor, source, default_days: int, out=None) -> int:
+    """
+    Evaluate queries (one JSON object per line) from `source`, writing one JSON
+    result line per query to `out` as soon as it is ready. The parquet is
+    downloaded and decoded once, recent deals are fetched once (only if a
+    query has cost scenarios). Returns the number of failed queries.
+    """
+    import sys
+    import time
+    out = out or sys.stdout
+    
+    def emit(record: dict):
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+    
+    try:
+        content, data_version = advisor.fetch_parquet()
+        frame = advisor.load_parquet(content)
+    except Exception as e:
+        emit({"error": f"Failed to fetch market data: {e}"})
+        return 1
+    
+    deals = None
+    failures = 0
+    for line_number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        started = time.perf_counter()
+        try:
+            query = _parse_query(json.loads(line), default_days)
+        except ValueError as e:
+            failures += 1
+            emit({"line": line_number, "error": f"Invalid query: {e}"})
+            continue
+        
+        record = {"line": line_number, "id": query["id"], "days": query["days"], "format": query["format"]}
+        analysis = advisor.analyze_frame(frame, query["days"], data_version)
+        if "error" in analysis:
+            failures += 1
+            emit({**record, "error": analysis["error"]})
+            continue
+        
+        simulations = []
+        for scenario in query["scenarios"]:
+            if deals is None:
+                deals = advisor.fetch_recent_deals()
+            if isinstance(deals, dict):
+                simulation = deals
+            else:
+                simulation = advisor.simulate_storage_cost(scenario["size_tib"], scenario["days"], scenario["replicas"],
+                                                           scenario["trials"], scenario["verified"], deals=deals)
+            simulations.append((scenario, simulation))
+        
+        if query["format"] == "json":
+            record["result"] = _json_report(advisor, analysis)
+            if simulations:
+                record["result"]["cost_simulations"] = [simulation for _, simulation in simulations]
+        else:
+            text = io.StringIO()
+            _print_console_report(advisor, analysis, simulations, out=text)
+            record["text"] = text.getvalue().lstrip("\n")
+        record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        emit(record)
+    return failures
+
+
 def main():
     """Demo the storage advisor"""
     import argparse
@@ -244,11 +501,26 @@ def main():
     
     parser = argparse.ArgumentParser(description='Filecoin Storage Advisor')
     parser.add_argument('--days', type=int, default=7, help='Days of data to analyze')
+    parser.add_argument('--simulate-tib', type=float, default=None,
+                        help='Also simulate the cost of storing this many TiB (Monte Carlo over recent deals)')
+    parser.add_argument('--simulate-days', type=int, default=365, help='Storage duration for --simulate-tib')
+    parser.add_argument('--replicas', type=int, default=1, help='Copies for --simulate-tib, on distinct providers')
+    parser.add_argument('--trials', type=int, default=100_000, help='Monte Carlo trials for --simulate-tib')
     parser.add_argument('--json', action='store_true', help='Output in JSON format')
+    parser.add_argument('--batch', metavar='FILE', default=None,
+                        help='Evaluate the JSON-lines queries in FILE ("-" for stdin), streaming JSON-lines results')
     args = parser.parse_args()
     
     advisor = FilecoinStorageAdvisor()
     
+    if args.batch is not None:
+        if args.batch == "-":
+            failures = run_batch(advisor, sys.stdin, args.days)
+        else:
+            with open(args.batch) as source:
+                failures = run_batch(advisor, source, args.days)
+        sys.exit(1 if failures else 0)
+    
     if not args.json:
         print("🔍 Filecoin Storage Advisor for Users")
         print("=" * 50)
@@ -263,49 +535,23 @@ def main():
             print(f"❌ Error: {analysis['error']}")
         return
     
+    simulations = []
+    if args.simulate_tib is not None:
+        scenario = {"size_tib": args.simulate_tib, "days": args.simulate_days, "replicas": args.replicas,
+                    "trials": args.trials, "verified": None}
+        simulation = advisor.simulate_storage_cost(args.simulate_tib, args.simulate_days, args.replicas, args.trials)
+        simulations.append((scenario, simulation))
+    
     if args.json:
         # Output JSON for API consumption
-        output = {
-            "market_insights": analysis["market_insights"],
-            "recommendations": analysis["recommendations"],
-            "decision_framework": advisor.get_storage_decision_framework(),
-            "timestamp": analysis["timestamp"],
-            "analysis_period_days": analysis["analysis_period_days"]
-        }
+        output = _json_report(advisor, analysis)
+        if simulations:
+            output["cost_simulation"] = simulations[0][1]
         print(json.dumps(output, indent=2))
         return
     
     # Original console output for CLI usage
-    insights = analysis["market_insights"]
-    recommendations = analysis["recommendations"]
-    
-    print("\n📈 Current Market Overview:")
-    print(f"   Daily new deals: {insights['current_market']['daily_new_deals']:,}")
-    print(f"   Verified deals: {insights['current_market']['verified_deals_percentage']:.1f}%")
-    print(f"   Market activity: {insights['market_activity']['market_activity_level']}")
-    
-    print(f"\n💰 Pricing Information:")
-    print(f"   Current cost: {insights['pricing']['current_storage_cost']:.2e} attoFIL")
-    print(f"   Price trend: {insights['pricing']['price_trend']}")
-    print(f"   Price change: {insights['pricing']['price_change_percent']:+.1f}%")
-    
-    print(f"\n📊 Data Efficiency:")
-    print(f"   Unique data ratio: {insights['data_efficiency']['unique_data_ratio']:.1%}")
-    print(f"   Efficiency level: {insights['data_efficiency']['data_deduplication_efficiency']}")
-    
-    print(f"\n💡 Recommendations:")
-    for i, rec in enumerate(recommendations, 1):
-        print(f"   {i}. [{rec['priority']}] {rec['message']}")
-        print(f"      Action: {rec['action']}")
-    
-    print(f"\n🎯 Decision Framework:")
-    framework = advisor.get_storage_decision_framework()
-    for factor, details in framework["decision_factors"].items():
-        print(f"   {factor.title()}: {details['description']} ({details['importance']} priority)")
-    
-    print(f"\n✅ Decision Checklist:")
-    for i, item in enumerate(framework["decision_checklist"], 1):
-        print(f"   {i}. {item}")
+    _print_console_report(advisor, analysis, simulations)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Event-Loop Watchdog
+Finds the code that blocks the event loop (a synchronous requests call or
+time.sleep inside an async handler, a large json encode, ...):
+
+- a heartbeat callback on the loop re-arms itself every threshold / 2;
+  when it runs late by at least the threshold, the loop was blocked
+- a watchdog thread notices the missing heartbeat while the stall is still
+  in progress and captures the loop thread's stack (sys._current_frames)
+
+Each stall is counted per call site (the innermost analyzer frame, as
+file:function) in deal_analyzer_event_loop_blocks_total, and logged with
+the captured stack the first time a site is seen and then at most once a
+minute per site. The latest stalls are kept for /api/admin/blocking.
+Several shorter callbacks that together hold the loop past the threshold
+are attributed to whichever one was running when the stack was taken.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from config import LOOP_BLOCK_THRESHOLD_SECONDS
+from metrics import LOOP_BLOCKED_SECONDS, LOOP_BLOCKS
+
+logger = logging.getLogger(__name__)
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Wrappers that sit between the blocking call and the code that made it
+PASS_THROUGH = {"upstream.py", "tracing.py", "metrics.py"}
+LOG_EVERY_SECONDS = 60
+
+
+def _is_analyzer_frame(frame: traceback.FrameSummary) -> bool:
+    return (frame.filename.startswith(SERVICE_DIR) and "site-packages" not in frame.filename
+            and os.path.basename(frame.filename) not in PASS_THROUGH)
+
+
+def _site(stack: Optional[traceback.StackSummary]) -> str:
+    """file:function of the innermost analyzer frame (or innermost frame) of a captured stack"""
+    if not stack:
+        return "unknown"
+    frame = next((frame for frame in reversed(stack) if _is_analyzer_frame(frame)), stack[-1])
+    return f"{os.path.basename(frame.filename)}:{frame.name}"
+
+
+def _trim(stack: traceback.StackSummary) -> traceback.StackSummary:
+    """Drop the event loop / ASGI framing above the outermost analyzer frame (usually the route handler)"""
+    start = next((i for i, frame in enumerate(stack) if _is_analyzer_frame(frame)), 0)
+    return traceback.StackSummary.from_list(stack[start:])
+
+
+class LoopWatchdog:
+    """Detects event-loop stalls and attributes them to the blocking call site"""
+
+    def __init__(self, threshold: float = LOOP_BLOCK_THRESHOLD_SECONDS, history: int = 50):
+        self.threshold = threshold
+        self.interval = threshold / 2
+        self.sites: Counter = Counter()
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._beat = 0.0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        # (heartbeat the stall started after, loop thread stack) for the stall in progress
+        self._captured: Optional[Tuple[float, traceback.StackSummary]] = None
+        self._logged: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Call from the event loop to watch"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._handle = self._loop.call_later(self.interval, self._heartbeat)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _heartbeat(self):
+        now = time.monotonic()
+        previous, self._beat = self._beat, now
+        late = now - previous - self.interval
+        if late >= self.threshold:
+            self._record(previous, late)
+        self._handle = self._loop.call_later(self.interval, self._heartbeat)
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 4):
+            beat = self._beat
+            if time.monotonic() - beat - self.interval < self.threshold:
+                continue
+            if self._captured is not None and self._captured[0] == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self._captured = (beat, _trim(traceback.extract_stack(frame)))
+
+    def _record(self, beat: float, blocked: float):
+        captured, self._captured = self._captured, None
+        stack = captured[1] if captured is not None and captured[0] == beat else None
+        site = _site(stack)
+        LOOP_BLOCKS.labels(site).inc()
+        LOOP_BLOCKED_SECONDS.observe(blocked)
+        self.sites[site] += 1
+        self.recent.append({
+            "at": datetime.now().isoformat(),
+            "blocked_ms": round(blocked * 1000, 1),
+            "site": site,
+            "stack": [f"{os.path.basename(f.filename)}:{f.lineno} in {f.name}" for f in stack or []],
+        })
+
+        now = time.monotonic()
+        if now - self._logged.get(site, -LOG_EVERY_SECONDS) >= LOG_EVERY_SECONDS:
+            self._logged[site] = now
+            where = "".join(traceback.format_list(stack)) if stack else "  (stack not captured)\n"
+            logger.warning(f"Event loop blocked for {blocked * 1000:.0f} ms at {site} "
+                           f"({self.sites[site]} times so far):\n{where.rstrip()}")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "sites": dict(self.sites.most_common()),
+            "recent": list(reversed(self.recent)),
+        }
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+CPU Worker Pool
+Process pool for CPU-bound stages (parquet decoding, pd.to_datetime,
+daily-metrics analytics) so they neither block the event loop nor hold the
+GIL. Only raw parquet bytes go in and small result dicts come back, so no
+DataFrame is ever pickled across the process boundary. Metric samples
+and trace spans recorded in a worker travel back with its result.
+
+Lifecycle: start_worker_pool() on app startup, stop_worker_pool() on shutdown.
+Without a running pool (CLI, tests) work runs inline.
+"""
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+import metrics
+import tracing
+from config import CPU_WORKER_PROCESSES
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _warm_worker():
+    """Pay the heavy imports once per worker instead of on the first request"""
+    import pandas  # noqa: F401
+    import pyarrow.parquet  # noqa: F401
+    metrics.buffer_worker_samples()
+
+
+def _call_with_samples(fn: Callable, traced: bool, *args: Any):
+    """Runs in the worker: fn's result plus the metric samples (and spans) it recorded"""
+    if not traced:
+        return fn(*args), metrics.drain_worker_samples(), []
+    with tracing.collect() as spans:
+        result = fn(*args)
+    return result, metrics.drain_worker_samples(), spans
+
+
+def _unpack(outcome) -> Any:
+    result, samples, spans = outcome
+    metrics.replay_worker_samples(samples)
+    tracing.adopt(spans)
+    return result
+
+
+def start_worker_pool(processes: int = CPU_WORKER_PROCESSES):
+    global _pool
+    if _pool is not None or processes <= 0:
+        return
+    # spawn: forking a process that already runs threads (uvicorn, feeds) is unsafe
+    _pool = ProcessPoolExecutor(max_workers=processes,
+                                mp_context=multiprocessing.get_context("spawn"),
+                                initializer=_warm_worker)
+    logger.info(f"Started CPU worker pool with {processes} processes")
+
+
+def stop_worker_pool():
+    global _pool
+    if _pool is None:
+        return
+    pool, _pool = _pool, None
+    pool.shutdown(wait=True, cancel_futures=True)
+    logger.info("Stopped CPU worker pool")
+
+
+def run_cpu_bound_sync(fn: Callable, *args: Any) -> Any:
+    """Run fn in the pool and wait for it (for code already off the event loop)"""
+    if _pool is None:
+        return fn(*args)
+    # The span covers queueing and IPC; the worker's own spans nest inside it
+    with tracing.span("worker", fn.__name__):
+        return _unpack(_pool.submit(_call_with_samples, fn, tracing.active(), *args).result())
+
@@ -5,6 +5,7 @@ import (
 	"io"
 	"log"
 	"net/http"
+	"net/url"
 	"os"
 	"os/signal"
 	"syscall"
@@ -46,30 +47,12 @@ func main() {
 
 	// Proxy /api/mainnet/deals to deal-analyzer
 	r.GET("/api/mainnet/deals", func(c *gin.Context) {
-		limit := c.DefaultQuery("limit", "100")
-		resp, err := http.Get("http://deal-analyzer:8000/api/mainnet/deals?limit=" + limit)
-		if err != nil {
-			log.Printf("Error connecting to deal-analyzer: %v", err)
-			c.JSON(500, gin.H{"error": "Failed to fetch from deal-analyzer", "details": err.Error()})
-			return
-		}
-		defer resp.Body.Close()
-		body, _ := io.ReadAll(resp.Body)
-		c.Data(resp.StatusCode, resp.Header.Get("Content-Type"), body)
+		proxyToDealAnalyzer(c, "http://deal-analyzer:8000/api/mainnet/deals?"+dealListQuery(c))
 	})
 
 	// Proxy /api/testnet/deals to deal-analyzer
 	r.GET("/api/testnet/deals", func(c *gin.Context) {
-		limit := c.DefaultQuery("limit", "100")
-		resp, err := http.Get("http://deal-analyzer:8000/api/testnet/deals?limit=" + limit)
-		if err != nil {
-			log.Printf("Error connecting to deal-analyzer: %v", err)
-			c.JSON(500, gin.H{"error": "Failed to fetch from deal-analyzer", "details": err.Error()})
-			return
-		}
-		defer resp.Body.Close()
-		body, _ := io.ReadAll(resp.Body)
-		c.Data(resp.StatusCode, resp.Header.Get("Content-Type"), body)
+		proxyToDealAnalyzer(c, "http://deal-analyzer:8000/api/testnet/deals?"+dealListQuery(c))
 	})
 
 	// Create HTTP server
@@ -102,3 +85,47 @@ func main() {
 
 	log.Println("Server exiting")
 }
+
+// dealListQuery builds the deal-analyzer query for the deal list routes:
+// limit (default 100) plus the pagination cursor and fast flag when given.
+func dealListQuery(c *gin.Context) string {
+	query := url.Values{}
+	query.Set("limit", c.DefaultQuery("limit", "100"))
+	for _, name := range []string{"cursor", "fast"} {
+		if value, ok := c.GetQuery(name); ok {
+			query.Set(name, value)
+		}
+	}
+	return query.Encode()
+}
+
+// proxyToDealAnalyzer forwards a GET to the deal-analyzer and passes ETag
+// validators through, so polls of an unchanged snapshot come back as 304.
+func proxyToDealAnalyzer(c *gin.Context, target string) {
+	req, err := http.NewRequest(http.MethodGet, target, nil)
+	if err != nil {
+		c.JSON(500, gin.H{"error": "Failed to build deal-analyzer request", "details": err.Error()})
+		return
+	}
+	if inm := c.GetHeader("If-None-Match"); inm != "" {
+		req.Header.Set("If-None-Match", inm)
+	}
+
+	resp, err := http.DefaultClient.Do(req)
+	if err != nil {
+		log.Printf("Error connecting to deal-analyzer: %v", err)
+		c.JSON(500, gin.H{"error": "Failed to fetch from deal-analyzer", "details": err.Error()})
+		return
+	}
+	defer resp.Body.Close()
+
+	if etag := resp.Header.Get("ETag"); etag != "" {
+		c.Header("ETag", etag)
+	}
+	if resp.StatusCode == http.StatusNotModified {
+		c.Status(http.StatusNotModified)
+		return
+	}
+	body, _ := io.ReadAll(resp.Body)
+	c.Data(resp.StatusCode, resp.Header.Get("Content-Type"), body)
+}